@@ -1,7 +1,87 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F
+from django.utils.functional import cached_property
 
 from .models import Author, Genre, Book
 
-admin.site.register(Author)
-admin.site.register(Genre)
-admin.site.register(Book)
+# Таблицы меньше этого размера считаются точно: COUNT(*) по ним дешёвый
+EXACT_COUNT_LIMIT = 10000
+
+
+def estimated_count(model, using):
+    """Оценка числа строк из статистики PostgreSQL (pg_class.reltuples) или None."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    # -1 — таблицу ещё не анализировали
+    return row[0] if row and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Для списка без фильтров и поиска берёт число строк из статистики PostgreSQL
+    вместо COUNT(*) по всей таблице; отфильтрованные выборки считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Иначе при поиске и фильтрах админка делает ещё и COUNT(*) всей таблицы
+    show_full_result_count = False
+
+
+@admin.register(Author)
+class AuthorAdmin(ScalableAdmin):
+    list_display = ('name', 'date_of_birth', 'date_of_death', 'updated_at')
+    ordering = ('name',)
+    # icontains по имени обслуживает триграммный индекс books_author_name_trgm (миграция 0002)
+    search_fields = ('name',)
+
+
+@admin.register(Genre)
+class GenreAdmin(ScalableAdmin):
+    list_display = ('name', 'updated_at')
+    ordering = ('name',)
+    search_fields = ('name',)
+
+
+@admin.register(Book)
+class BookAdmin(ScalableAdmin):
+    list_display = ('title', 'author_names', 'genre_names', 'publish_date', 'updated_at')
+    # Порядок обслуживает индекс book_publish_date_id_idx
+    ordering = ('-publish_date', '-id')
+    # Только название: триграммный индекс books_book_title_trgm, без JOIN и DISTINCT по связям
+    search_fields = ('title',)
+    autocomplete_fields = ('authors', 'genres')
+
+    def get_queryset(self, request):
+        # Имена авторов и жанров берутся из проекции BookReadModel тем же запросом, что и книги
+        return super().get_queryset(request).defer('search_vector').annotate(
+            author_names=F('read_model__authors'), genre_names=F('read_model__genres'),
+        )
+
+    @staticmethod
+    def join_names(items):
+        return ', '.join(item['name'] for item in items or [])
+
+    @admin.display(description='Авторы')
+    def author_names(self, obj):
+        return self.join_names(obj.author_names)
+
+    @admin.display(description='Жанры')
+    def genre_names(self, obj):
+        return self.join_names(obj.genre_names)
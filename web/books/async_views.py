@@ -0,0 +1,117 @@
+"""
+Асинхронные представления чтения для режима ASGI (``SERVER_MODE=asgi``).
+
+DRF 3.14 не умеет async-представления, поэтому это обычные ``View`` с
+``async def get``: запросы к БД идут через асинхронный ORM (``acount``, ``aget``,
+``aiterator``), и пока база отвечает, воркер обслуживает другие соединения.
+Разбор параметров (``?fields=``, ``?expand=``, фильтры, поиск, ``?page=``),
+сериализаторы и формат ответа те же, что у синхронных эндпоинтов, поэтому
+ответы совпадают байт в байт. Курсорная пагинация и кэш ответов здесь не
+поддерживаются: кэш синхронный и в async-коде стоил бы лишнего перехода в поток.
+"""
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+
+from .filters import BookFilter
+from .models import Author, Book, Genre
+from .renderers import FastJSONRenderer
+from .serializers import AuthorSerializer, BookSerializer, GenreSerializer, ReadModelSerializer, ValuesSerializer
+from .views import filter_books
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """PageNumberPagination с асинхронным COUNT и выборкой страницы."""
+
+    async def apaginate_queryset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        # Paginator только считает страницы по готовому COUNT, строки выбираются срезом queryset
+        paginator = self.django_paginator_class([], page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.request = request
+        offset = (self.page.number - 1) * page_size
+        return [row async for row in queryset[offset:offset + page_size].aiterator()]
+
+
+class AsyncReadView(View):
+    model = None
+    serializer_class = None
+    values_serializer_class = ValuesSerializer
+    ordering = ('id',)
+    pagination_class = AsyncPageNumberPagination
+    renderer_class = FastJSONRenderer
+
+    async def get(self, request, *args, **kwargs):
+        # Request из DRF нужен ради query_params и build_absolute_uri, которые ждут сериализаторы и пагинатор
+        request = Request(request)
+        try:
+            if 'pk' in kwargs:
+                data = await self.retrieve(request, kwargs['pk'])
+            else:
+                data = await self.list(request)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.render(detail, exc.status_code)
+        return self.render(data)
+
+    def render(self, data, status=200):
+        return HttpResponse(
+            self.renderer_class().render(data), status=status, content_type=self.renderer_class.media_type,
+        )
+
+    def get_values_serializer(self, request):
+        serializer = self.serializer_class(context={'request': request})
+        return self.values_serializer_class(serializer)
+
+    def get_queryset(self, request):
+        return self.model.objects.order_by(*self.ordering)
+
+    async def list(self, request):
+        values_serializer = self.get_values_serializer(request)
+        queryset = values_serializer.values(self.get_queryset(request))
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request)
+        if page is None:
+            return await values_serializer.ato_representation([row async for row in queryset.aiterator()])
+        return paginator.get_paginated_response(await values_serializer.ato_representation(page)).data
+
+    async def retrieve(self, request, pk):
+        values_serializer = self.get_values_serializer(request)
+        try:
+            row = await values_serializer.values(self.model.objects.filter(pk=pk)).aget()
+        except self.model.DoesNotExist:
+            raise NotFound()
+        return (await values_serializer.ato_representation([row]))[0]
+
+
+class AsyncAuthorView(AsyncReadView):
+    model = Author
+    serializer_class = AuthorSerializer
+    ordering = ('name',)
+
+
+class AsyncGenreView(AsyncReadView):
+    model = Genre
+    serializer_class = GenreSerializer
+    ordering = ('name',)
+
+
+class AsyncBookView(AsyncReadView):
+    model = Book
+    serializer_class = BookSerializer
+    values_serializer_class = ReadModelSerializer
+
+    def get_queryset(self, request):
+        return filter_books(Book.objects.all(), request.query_params, BookFilter.from_request(request))
@@ -0,0 +1,152 @@
+"""
+Нагрузочные сценарии API внутри процесса (django.test.Client) и сравнение
+результатов между коммитами.
+
+Результат — JSON со сводкой по сценариям (запросов в секунду, перцентили
+задержки, SQL-запросов на запрос) и описанием окружения. ``compare_results``
+считает регрессией рост p50/p95 или падение пропускной способности больше
+порога и любой рост числа SQL-запросов.
+"""
+import math
+import platform
+import random
+import subprocess
+import time
+
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.settings import api_settings
+
+from .ids import uuid7
+from .models import Author, Book, Genre
+
+SCENARIOS = ('list', 'detail', 'search', 'create')
+# p99 на сотнях запросов определяется парой замеров и слишком шумный для порога, он только выводится
+COMPARED_LATENCIES = ('p50_ms', 'p95_ms')
+# Выборка id и названий, из которой берутся запросы detail и search
+SAMPLE_SIZE = 1000
+# Сценарий list листает первые страницы списка
+LIST_PAGES = 5
+
+
+def percentile(sorted_values, share):
+    if not sorted_values:
+        return 0
+    return sorted_values[max(math.ceil(share * len(sorted_values)) - 1, 0)]
+
+
+def summarize(latencies, elapsed, errors, queries):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0,
+        'queries': queries,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class ApiBenchmark:
+    """
+    Прогоняет сценарии через полный стек Django (middleware, представления,
+    рендеринг) без сети. Перед замером каждый сценарий выполняется ``warmup``
+    раз; на прогреве же считается число SQL-запросов, чтобы CaptureQueriesContext
+    не влиял на замер времени.
+    """
+
+    def __init__(self, requests=200, warmup=20, seed=0):
+        self.requests = requests
+        self.warmup = max(warmup, 1)
+        self.rng = random.Random(seed)
+        self.client = Client()
+
+    def prepare(self):
+        sample = list(Book.objects.order_by('id').values_list('id', 'title')[:SAMPLE_SIZE])
+        self.book_ids = [pk for pk, _ in sample]
+        self.search_words = sorted({title.split()[0] for _, title in sample})
+        self.author_names = list(Author.objects.order_by('name').values_list('name', flat=True)[:50])
+        self.genre_names = list(Genre.objects.order_by('name').values_list('name', flat=True)[:20])
+        self.list_pages = min(LIST_PAGES, math.ceil(len(self.book_ids) / api_settings.PAGE_SIZE))
+        return bool(self.book_ids)
+
+    def request(self, scenario):
+        if scenario == 'list':
+            return self.client.get(reverse('book-list'), {'page': self.rng.randint(1, self.list_pages)})
+        if scenario == 'detail':
+            return self.client.get(reverse('book-detail', args=[self.rng.choice(self.book_ids)]))
+        if scenario == 'search':
+            return self.client.get(reverse('book-list'), {'search': self.rng.choice(self.search_words)})
+        data = {
+            'title': f'Benchmark {uuid7().hex}',
+            'publish_date': '2023-01-01',
+            'authors': self.rng.sample(self.author_names, min(2, len(self.author_names))),
+            'genres': self.rng.sample(self.genre_names, min(1, len(self.genre_names))),
+        }
+        return self.client.post(reverse('book-list'), data, content_type='application/json')
+
+    def run_scenario(self, scenario):
+        queries = 0
+        for _ in range(self.warmup):
+            with CaptureQueriesContext(connection) as captured:
+                self.request(scenario)
+            queries = max(queries, len(captured))
+
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            request_started = time.perf_counter()
+            response = self.request(scenario)
+            latencies.append(time.perf_counter() - request_started)
+            errors += response.status_code >= 400
+        return summarize(latencies, time.perf_counter() - started, errors, queries)
+
+    def run(self, scenarios=SCENARIOS):
+        return {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'commit': git_commit(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'catalog': {
+                'books': Book.objects.count(),
+                'authors': Author.objects.count(),
+                'genres': Genre.objects.count(),
+            },
+            'settings': {'requests': self.requests, 'warmup': self.warmup},
+            'scenarios': {scenario: self.run_scenario(scenario) for scenario in scenarios},
+        }
+
+
+def compare_results(baseline, current, threshold):
+    """Список описаний регрессий ``current`` относительно ``baseline``; пустой — регрессий нет."""
+    regressions = []
+    for scenario, before in baseline['scenarios'].items():
+        after = current['scenarios'].get(scenario)
+        if after is None:
+            continue
+        for key in COMPARED_LATENCIES:
+            if before[key] and after[key] > before[key] * (1 + threshold):
+                regressions.append(f'{scenario}: {key} {before[key]} -> {after[key]}')
+        if before['rps'] and after['rps'] < before['rps'] * (1 - threshold):
+            regressions.append(f'{scenario}: rps {before["rps"]} -> {after["rps"]}')
+        if after['queries'] > before['queries']:
+            regressions.append(f'{scenario}: queries {before["queries"]} -> {after["queries"]}')
+    return regressions
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+AUTHOR_LIST = 'author-list'
+GENRE_LIST = 'genre-list'
+BOOK_LIST = 'book-list'
+# Результаты поиска зависят от названий и имён, поэтому сбрасываются при любом их изменении
+BOOK_SEARCH = 'book-search'
+
+
+def author_tag(pk):
+    return f'author:{pk}'
+
+
+def genre_tag(pk):
+    return f'genre:{pk}'
+
+
+def book_tag(pk):
+    return f'book:{pk}'
+
+
+class ResponseCache:
+    """
+    Кэш данных ответов с инвалидацией по тегам.
+
+    Каждый тег хранит случайную версию. Запись помнит версии своих тегов на момент
+    чтения данных и считается устаревшей, если хотя бы одна из них изменилась, поэтому
+    инвалидация тега — одна запись в кэш, без перебора ключей.
+
+    Версии снимаются до обращения к БД (``snapshot``): иначе запись, завершившаяся
+    между чтением данных и ``set``, сохранила бы старые данные под новой версией.
+    Теги элементов известны только после чтения, поэтому вместе с ними снимается
+    и поколение — его меняет каждая инвалидация, и ``set`` не сохраняет ответ,
+    если поколение сдвинулось.
+    """
+    prefix = 'api'
+
+    def __init__(self, alias='default', timeout=300):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, kind, raw):
+        return f'{self.prefix}:{kind}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+    def response_key(self, request):
+        params = sorted(request.query_params.lists())
+        return self.make_key('response', f'{request.get_host()}{request.path}?{params}')
+
+    def tag_key(self, tag):
+        return f'{self.prefix}:tag:{tag}'
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        versions, data = entry
+        if self.cache.get_many(list(versions)) != versions:
+            return None
+        return data
+
+    def generation_key(self):
+        return f'{self.prefix}:generation'
+
+    def snapshot(self, tags):
+        """Версии известных заранее тегов и поколение инвалидаций до чтения данных."""
+        return self.cache.get_many([self.tag_key(tag) for tag in tags] + [self.generation_key()])
+
+    def set(self, key, data, tags, snapshot):
+        generation_key = self.generation_key()
+        tag_keys = [self.tag_key(tag) for tag in tags]
+        current = self.cache.get_many(tag_keys + [generation_key])
+        if current.get(generation_key) != snapshot.get(generation_key):
+            # Пока данные читались, прошла инвалидация: они могли устареть
+            return
+        versions = {tag_key: snapshot.get(tag_key, current.get(tag_key)) for tag_key in tag_keys}
+        for tag_key in [tag_key for tag_key, version in versions.items() if version is None]:
+            self.cache.add(tag_key, uuid.uuid4().hex, timeout=None)
+            versions[tag_key] = self.cache.get(tag_key)
+        self.cache.set(key, (versions, data), timeout=self.timeout)
+
+    def invalidate(self, tags):
+        if tags:
+            # Поколение меняется раньше тегов: set, увидевший новую версию тега,
+            # увидит и новое поколение
+            self.cache.set(self.generation_key(), uuid.uuid4().hex, timeout=None)
+            self.cache.set_many({self.tag_key(tag): uuid.uuid4().hex for tag in tags}, timeout=None)
+
+
+response_cache = ResponseCache(
+    alias=getattr(settings, 'API_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'API_CACHE_TIMEOUT', 300),
+)
+
+
+def invalidate(*tags):
+    # Сбрасываем сразу и ещё раз после коммита: иначе параллельный запрос может
+    # закэшировать старые данные до фиксации транзакции
+    tags = set(tags)
+    response_cache.invalidate(tags)
+    transaction.on_commit(lambda: response_cache.invalidate(tags))
+
+
+def data_digest(data):
+    return hashlib.sha1(json.dumps(data, cls=JSONEncoder, sort_keys=True).encode()).hexdigest()
+
+
+def latest_update(data):
+    if isinstance(data, dict):
+        values = [latest_update(value) for key, value in data.items() if key != 'updated_at']
+        if data.get('updated_at'):
+            values.append(parse_datetime(data['updated_at']))
+    elif isinstance(data, list):
+        values = [latest_update(value) for value in data]
+    else:
+        return None
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+class CachedResponseMixin:
+    """
+    Кэширует ответы list/retrieve; теги берутся из сериализованных данных.
+
+    Вместе с данными хранятся ETag (хэш данных) и Last-Modified, поэтому условный
+    GET по действительной записи отвечает 304 без обращения к БД и сериализатору.
+    Last-Modified детального ответа — самый поздний updated_at в данных, списка —
+    время сохранения записи: удаление элемента не оставляет следа в updated_at.
+    Без ``last_modified_from_data`` и детальный ответ берёт время сохранения записи.
+    """
+    cache_list_tags = ()
+    last_modified_from_data = True
+
+    def get_list_cache_tags(self):
+        return set(self.cache_list_tags)
+
+    def get_item_cache_tags(self, item):
+        return set()
+
+    def get_cache_key(self, request):
+        return response_cache.response_key(request)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, request, *args, many=True, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, request, *args, many=False, **kwargs)
+
+    def cached_response(self, request, render, *args, many, **kwargs):
+        key = self.get_cache_key(request)
+        entry = response_cache.get(key)
+        response = None
+        if entry is None:
+            snapshot = response_cache.snapshot(self.get_list_cache_tags() if many else ())
+            response = render(*args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = {
+                'data': response.data,
+                'digest': data_digest(response.data),
+                'last_modified': (
+                    latest_update(response.data) if self.last_modified_from_data and not many else timezone.now()
+                ),
+            }
+            response_cache.set(key, entry, self.collect_cache_tags(response.data, many), snapshot)
+
+        # Представление зависит от рендерера, поэтому формат входит в сильный ETag
+        etag = quote_etag(f'{entry["digest"]}-{request.accepted_renderer.format}')
+        last_modified = int(entry['last_modified'].timestamp()) if entry['last_modified'] else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if response is None:
+            response = Response(entry['data'], headers={'X-Cache': 'HIT'})
+        else:
+            response['X-Cache'] = 'MISS'
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def collect_cache_tags(self, data, many):
+        if not many:
+            items = [data]
+        elif isinstance(data, dict):
+            items = data['results']
+        else:
+            items = data
+        tags = self.get_list_cache_tags() if many else set()
+        for item in items:
+            tags |= self.get_item_cache_tags(item)
+        return tags
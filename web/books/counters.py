@@ -0,0 +1,92 @@
+"""
+Счётчики книг ``Author.book_count`` и ``Genre.book_count``.
+
+Согласованность:
+
+* счётчики меняются приращением (``book_count = book_count + n``) в той же
+  транзакции, что и связи: сигналы m2m_changed и удаления книги (books.signals),
+  запись разницы связей в BookService и массовые операции, которые сигналов не
+  отправляют (BookService.bulk_create_or_update_books, import_catalog, seed_catalog);
+* приращение атомарно в БД, поэтому параллельные транзакции не теряют изменения;
+  сами приращения BookService считает от связей, прочитанных под блокировкой
+  строки книги, поэтому две записи одной книги не применяют одну разницу дважды;
+* изменения связей в обход ORM счётчики не обновляют — после них нужен
+  ``manage.py reconcile_book_counts``.
+
+Счётчик не входит в представление книги (вложенные авторы и жанры), иначе каждая
+новая книга меняла бы проекции всех книг того же автора.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .cache import AUTHOR_LIST, GENRE_LIST, author_tag, genre_tag, invalidate
+from .models import Author, Book
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def relation_for(model):
+    m2m_field = Book._meta.get_field('authors' if model is Author else 'genres')
+    return m2m_field.remote_field.through, f'{m2m_field.m2m_reverse_field_name()}_id'
+
+
+def count_tags(model, ids):
+    if model is Author:
+        return AUTHOR_LIST, *map(author_tag, ids)
+    return GENRE_LIST, *map(genre_tag, ids)
+
+
+def change_book_counts(model, deltas, using='default'):
+    """
+    Прибавляет к счётчикам ``deltas`` ({id: приращение}) одним UPDATE: ветка CASE
+    на каждое различное приращение, а не на каждого автора или жанр.
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+    if not by_delta:
+        return
+    ids = [pk for pks in by_delta.values() for pk in pks]
+    if len(by_delta) == 1:
+        (delta,) = by_delta
+        increment = Value(delta)
+    else:
+        increment = Case(*(When(pk__in=pks, then=Value(delta)) for delta, pks in by_delta.items()), default=Value(0))
+    model.objects.using(using).filter(pk__in=ids).update(book_count=F('book_count') + increment)
+    invalidate(*count_tags(model, ids))
+
+
+def count_links(links):
+    """Приращения по списку связей (book_id, related_id)."""
+    return Counter(related_id for _, related_id in links)
+
+
+def actual_book_count(model):
+    through, target = relation_for(model)
+    counts = through.objects.filter(**{target: OuterRef('pk')}).order_by().values(target).annotate(
+        total=Count('*'),
+    ).values('total')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def reconcile_book_counts(model, using='default', fix=True, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Сверяет счётчики с промежуточной таблицей. Возвращает расхождения
+    [(id, было, стало)] и при ``fix`` исправляет их пересчётом в БД.
+    """
+    drift = list(
+        model.objects.using(using).annotate(actual=actual_book_count(model)).exclude(
+            book_count=F('actual'),
+        ).order_by('pk').values_list('pk', 'book_count', 'actual')
+    )
+    if fix:
+        for start in range(0, len(drift), batch_size):
+            ids = [pk for pk, _, _ in drift[start:start + batch_size]]
+            # Пересчёт, а не сохранённое значение: связи могли измениться после сверки
+            model.objects.using(using).filter(pk__in=ids).update(book_count=actual_book_count(model))
+        if drift:
+            invalidate(*count_tags(model, [pk for pk, _, _ in drift]))
+    return drift
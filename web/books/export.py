@@ -0,0 +1,98 @@
+import csv
+import io
+import itertools
+import zlib
+
+from .models import Book
+from .streaming import dumps
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ['id', 'title', 'description', 'publish_date', 'authors', 'genres']
+# Тот же разделитель, что по умолчанию ожидает import_catalog
+LIST_SEPARATOR = '|'
+
+
+def related_names(book_ids, using='default'):
+    """Имена авторов и жанров книг {id: (авторы, жанры)} из промежуточных таблиц."""
+    names = {pk: ([], []) for pk in book_ids}
+    for position, relation, name_field in ((0, 'authors', 'author__name'), (1, 'genres', 'genre__name')):
+        links = getattr(Book, relation).through.objects.using(using).filter(book_id__in=book_ids)
+        for book_id, name in links.values_list('book_id', name_field):
+            names[book_id][position].append(name)
+    return names
+
+
+def iter_catalog(chunk_size=EXPORT_CHUNK_SIZE, using='default'):
+    # Книги читаются серверным курсором по индексу (publish_date, id), авторы и жанры —
+    # из проекции BookReadModel в том же запросе. У книг без строки проекции (записанных
+    # в обход сервисов или до rebuild_read_models) они дочитываются из промежуточных
+    # таблиц: выгрузка не должна молча терять книги
+    rows = Book.objects.using(using).order_by('publish_date', 'id').values_list(
+        'id', 'title', 'description', 'publish_date', 'read_model__authors', 'read_model__genres',
+    ).iterator(chunk_size=chunk_size)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        missing = [row[0] for row in chunk if row[4] is None]
+        fallback = related_names(missing, using) if missing else {}
+        for book_id, title, description, publish_date, authors, genres in chunk:
+            if authors is None:
+                author_names, genre_names = fallback[book_id]
+            else:
+                author_names, genre_names = [author['name'] for author in authors], [genre['name'] for genre in genres]
+            yield {
+                'id': book_id,
+                'title': title,
+                'description': description,
+                'publish_date': publish_date,
+                'authors': sorted(author_names),
+                'genres': sorted(genre_names),
+            }
+
+
+def render_ndjson(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        yield ''.join(dumps(row) + '\n' for row in chunk)
+
+
+def render_csv(rows, chunk_size=EXPORT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        writer.writerows(
+            [
+                row['id'], row['title'], row['description'], row['publish_date'],
+                LIST_SEPARATOR.join(row['authors']), LIST_SEPARATOR.join(row['genres']),
+            ]
+            for row in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def encode(chunks):
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', render_ndjson),
+    'csv': ('text/csv', render_csv),
+}
+
+
+def export_catalog(export_format, compress=False, rows=None, using='default'):
+    _, render = EXPORT_FORMATS[export_format]
+    chunks = encode(render(iter_catalog(using=using) if rows is None else rows))
+    return gzip_stream(chunks) if compress else chunks
@@ -0,0 +1,49 @@
+from django.db.models import Count, IntegerField
+from django.db.models.functions import Cast, ExtractYear
+
+from .models import Book
+
+FACETS = ('genres', 'authors', 'decades', 'years')
+TOP_AUTHORS = 10
+MAX_TOP_AUTHORS = 100
+
+
+def relation_facet(through, target, book_ids, limit=None):
+    # GROUP BY по промежуточной таблице; без фильтров — без подзапроса по книгам
+    links = through.objects.all() if book_ids is None else through.objects.filter(book_id__in=book_ids)
+    rows = links.values(f'{target}_id', f'{target}__name').annotate(count=Count('book_id')).order_by(
+        '-count', f'{target}__name',
+    )
+    if limit is not None:
+        rows = rows[:limit]
+    return [{'id': row[f'{target}_id'], 'name': row[f'{target}__name'], 'count': row['count']} for row in rows]
+
+
+def date_facet(books, name, expression):
+    rows = books.values(**{name: expression}).annotate(count=Count('id')).order_by(name)
+    return [{name: row[name], 'count': row['count']} for row in rows]
+
+
+def publish_year():
+    # EXTRACT в PostgreSQL 14+ возвращает numeric, а десятилетию нужно целочисленное деление
+    return Cast(ExtractYear('publish_date'), IntegerField())
+
+
+def book_facets(books, facets=FACETS, top_authors=TOP_AUTHORS):
+    """
+    Счётчики по жанрам, авторам (top_authors самых частых), десятилетиям и годам
+    для отфильтрованного queryset книг: один сгруппированный запрос на фасет и
+    один COUNT.
+    """
+    books = books.order_by()
+    book_ids = books.values('id') if books.query.has_filters() else None
+    data = {'count': books.count()}
+    if 'genres' in facets:
+        data['genres'] = relation_facet(Book.genres.through, 'genre', book_ids)
+    if 'authors' in facets:
+        data['authors'] = relation_facet(Book.authors.through, 'author', book_ids, limit=top_authors)
+    if 'decades' in facets:
+        data['decades'] = date_facet(books, 'decade', publish_year() / 10 * 10)
+    if 'years' in facets:
+        data['years'] = date_facet(books, 'year', publish_year())
+    return data
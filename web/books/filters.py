@@ -0,0 +1,122 @@
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import Book
+
+# Ключи сортировки списка книг; каждый уникален и обслуживается индексом, поэтому
+# годится и для курсорной пагинации
+BOOK_ORDERINGS = {
+    'publish_date': ('publish_date', 'id'),
+    '-publish_date': ('-publish_date', '-id'),
+    'title': ('title',),
+    '-title': ('-title',),
+}
+DEFAULT_BOOK_ORDERING = 'publish_date'
+# Сортировки списков авторов и жанров; по числу книг их обслуживает индекс (-book_count, name),
+# по возрастанию он читается в обратном порядке
+NAME_ORDERINGS = {
+    'name': ('name',),
+    '-name': ('-name',),
+    '-book_count': ('-book_count', 'name'),
+    'book_count': ('book_count', '-name'),
+}
+DEFAULT_NAME_ORDERING = 'name'
+FILTER_PARAMS = ('author', 'genre', 'publish_date_from', 'publish_date_to')
+
+
+def parse_ordering(params, orderings, default):
+    ordering = params.get('ordering') or default
+    if ordering not in orderings:
+        raise ValidationError({'detail': f'Неизвестная сортировка. Допустимые: {", ".join(orderings)}'})
+    return ordering
+
+
+def split_values(params, name):
+    # ?author=a&author=b и ?author=a,b равнозначны
+    return [value.strip() for raw in params.getlist(name) for value in raw.split(',') if value.strip()]
+
+
+class BookFilter:
+    """
+    Фильтры списка книг: ``?author=`` и ``?genre=`` (id или название, несколько
+    значений — любое из них), ``?publish_date_from=``/``?publish_date_to=``
+    (включительно) и ``?ordering=``. Разные фильтры объединяются через AND.
+
+    Авторы и жанры проверяются подзапросом к промежуточной таблице по индексу
+    (author_id, book_id)/(genre_id, book_id) из миграции 0006, диапазон дат —
+    по индексу book_publish_date_id_idx.
+    """
+
+    def __init__(self, authors=(), genres=(), date_from=None, date_to=None, ordering=DEFAULT_BOOK_ORDERING):
+        self.authors = authors
+        self.genres = genres
+        self.date_from = date_from
+        self.date_to = date_to
+        self.ordering = ordering
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        ordering = parse_ordering(params, BOOK_ORDERINGS, DEFAULT_BOOK_ORDERING)
+        return cls(
+            authors=split_values(params, 'author'),
+            genres=split_values(params, 'genre'),
+            date_from=cls.parse_date_param(params, 'publish_date_from'),
+            date_to=cls.parse_date_param(params, 'publish_date_to'),
+            ordering=ordering,
+        )
+
+    @staticmethod
+    def parse_date_param(params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({'detail': f'Параметр "{name}" должен быть датой в формате ГГГГ-ММ-ДД'})
+        return parsed
+
+    def signature(self):
+        # Нормализованный набор условий без сортировки: от неё не зависят, например, фасеты
+        return (
+            tuple(sorted(set(self.authors))), tuple(sorted(set(self.genres))),
+            self.date_from and self.date_from.isoformat(), self.date_to and self.date_to.isoformat(),
+        )
+
+    @property
+    def order_by(self):
+        return BOOK_ORDERINGS[self.ordering]
+
+    def filter(self, queryset):
+        if self.authors:
+            queryset = queryset.filter(pk__in=self.linked_books(Book.authors.through, 'author', self.authors))
+        if self.genres:
+            queryset = queryset.filter(pk__in=self.linked_books(Book.genres.through, 'genre', self.genres))
+        if self.date_from:
+            queryset = queryset.filter(publish_date__gte=self.date_from)
+        if self.date_to:
+            queryset = queryset.filter(publish_date__lte=self.date_to)
+        return queryset
+
+    @staticmethod
+    def linked_books(through, target, values):
+        ids, names = [], []
+        for value in values:
+            try:
+                ids.append(uuid.UUID(value))
+            except ValueError:
+                names.append(value)
+        # Имена сводятся к id подзапросом, чтобы оба условия шли по индексу (target_id, book_id)
+        condition = Q()
+        if ids:
+            condition |= Q(**{f'{target}_id__in': ids})
+        if names:
+            related_model = through._meta.get_field(target).related_model
+            condition |= Q(**{f'{target}_id__in': related_model.objects.filter(name__in=names).values('id')})
+        return through.objects.filter(condition).values('book_id')
@@ -0,0 +1,68 @@
+"""
+Идентификаторы UUIDv7 (RFC 9562): 48 бит миллисекунд Unix-времени в начале,
+поэтому новые ключи растут и вставляются в конец B-дерева, а не в случайное
+место, как UUID1 с младшими битами времени впереди.
+"""
+import os
+import threading
+import time
+import uuid
+
+# Смещение между эпохой UUID1 (15.10.1582) и Unix-эпохой в 100-нс интервалах
+UUID1_EPOCH_OFFSET = 0x01B21DD213814000
+TICKS_PER_MS = 10_000
+
+_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+
+
+def build_uuid7(unix_ms, rand_a, rand_b):
+    value = (unix_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76 | (rand_a & 0xFFF) << 64
+    value |= 0b10 << 62 | (rand_b & 0x3FFFFFFFFFFFFFFF)
+    return uuid.UUID(int=value)
+
+
+def uuid7():
+    """
+    Новый UUIDv7. В пределах одной миллисекунды rand_a — счётчик, начатый со
+    случайного значения, так что ключи процесса строго возрастают.
+    """
+    global _last_ms, _sequence
+    with _lock:
+        unix_ms = time.time_ns() // 1_000_000
+        if unix_ms > _last_ms:
+            _last_ms = unix_ms
+            _sequence = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            _sequence += 1
+            if _sequence > 0xFFF:
+                # Счётчик исчерпан — занимаем следующую миллисекунду
+                _last_ms += 1
+                _sequence = 0
+        unix_ms, sequence = _last_ms, _sequence
+    return build_uuid7(unix_ms, sequence, int.from_bytes(os.urandom(8), 'big'))
+
+
+def uuid1_to_uuid7(value):
+    """
+    Перевод существующего UUID1 в UUIDv7 с тем же моментом времени. Доли
+    миллисекунды (14 бит) занимают rand_a и старшие биты rand_b, дальше идут
+    младшие 12 из 14 бит clock_seq и node, так что порядок по времени
+    сохраняется. Всё не помещается в 74 бита UUIDv7: UUID1 одного узла с одним
+    временем, у которых clock_seq различается только старшими битами, совпадут —
+    такие совпадения разводит миграция 0007 (``distinct_uuid7``). Остальные
+    версии возвращаются без изменений.
+    """
+    if value.version != 1:
+        return value
+    ticks = value.time - UUID1_EPOCH_OFFSET
+    unix_ms, sub_ms = divmod(ticks, TICKS_PER_MS)
+    rand_b = (sub_ms & 0x3) << 60 | (value.clock_seq & 0xFFF) << 48 | value.node
+    return build_uuid7(unix_ms, sub_ms >> 2, rand_b)
+
+
+def distinct_uuid7(value):
+    """UUIDv7 с тем же временем и rand_a, что у ``value``, и случайным rand_b."""
+    return build_uuid7(value.int >> 80, value.int >> 64, int.from_bytes(os.urandom(8), 'big'))
@@ -0,0 +1,78 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from books.benchmark import SCENARIOS, ApiBenchmark, compare_results
+from books.cache import response_cache
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет list, detail, search и create внутри процесса и сохраняет пропускную способность, '
+        'перцентили задержки и число SQL-запросов в JSON; с --baseline сравнивает с прошлым прогоном. '
+        'Каталог готовит seed_catalog, созданные книги откатываются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Замеряемых запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--scenario', action='append', dest='scenarios', choices=SCENARIOS)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--with-cache', action='store_true', help='Не отключать кэш ответов API')
+        parser.add_argument('--output', help='Куда сохранить результаты (JSON)')
+        parser.add_argument('--baseline', help='Результаты прошлого прогона для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Допустимое ухудшение, доля: 0.2 — 20%%')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as source:
+                    baseline = json.load(source)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Не удалось прочитать {options["baseline"]}: {exc}')
+
+        benchmark = ApiBenchmark(options['requests'], options['warmup'], options['seed'])
+        timeout = response_cache.timeout
+        if not options['with_cache']:
+            # Записи с нулевым временем жизни сразу устаревают: каждый запрос доходит до БД
+            response_cache.timeout = 0
+        # Число SQL-запросов попадает в результаты, предупреждения о бюджете на каждый запрос не нужны
+        performance_logger = logging.getLogger('library.performance')
+        performance_logger.disabled = True
+        try:
+            with transaction.atomic():
+                if not benchmark.prepare():
+                    raise CommandError('Каталог пуст, сначала выполните seed_catalog')
+                results = benchmark.run(options['scenarios'] or SCENARIOS)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            response_cache.timeout = timeout
+            performance_logger.disabled = False
+        results['settings']['cache'] = options['with_cache']
+
+        for scenario, summary in results['scenarios'].items():
+            self.stdout.write(
+                f'{scenario:<7} {summary["rps"]:>8.1f} запросов/с  p50 {summary["p50_ms"]:.1f} мс  '
+                f'p95 {summary["p95_ms"]:.1f} мс  p99 {summary["p99_ms"]:.1f} мс  '
+                f'SQL {summary["queries"]}  ошибок {summary["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                json.dump(results, target, ensure_ascii=False, indent=2)
+
+        if baseline is not None:
+            if baseline.get('catalog') != results['catalog']:
+                self.stderr.write(f'Каталоги различаются: {baseline.get("catalog")} и {results["catalog"]}')
+            regressions = compare_results(baseline, results, options['threshold'])
+            if regressions:
+                raise CommandError('Регрессии относительно базового прогона:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'Регрессий нет (порог {options["threshold"]:.0%})'))
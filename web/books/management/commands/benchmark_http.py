@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import os
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.benchmark import percentile
+
+# Один и тот же список книг через uWSGI и через ASGI (обе ветки проксирует nginx)
+DEFAULT_URLS = (
+    'http://localhost:8888/api/v1/books/',
+    'http://localhost:8888/api/v1/async/books/',
+)
+# У синхронного списка есть кэш ответов (books.cache), у асинхронного нет. Уникальный
+# параметр в каждом запросе делает ключ кэша новым, и обе стороны читают из БД
+CACHE_BUSTER = '_nocache'
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    return status, headers
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест чтения: N одновременных keep-alive соединений к каждому URL, '
+        'запросов в секунду, p50 и p99 задержки. По умолчанию сравнивает список книг '
+        'через uWSGI и через ASGI, в обход кэша ответов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls', help='Можно указать несколько раз')
+        parser.add_argument('--connections', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=2000, help='Всего запросов к каждому URL')
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument(
+            '--cached', action='store_true',
+            help='Не обходить кэш ответов: сравнение sync и async тогда включает разницу кэширования',
+        )
+
+    def handle(self, *args, **options):
+        for url in options['urls'] or DEFAULT_URLS:
+            parts = urlsplit(url)
+            if parts.scheme != 'http':
+                raise CommandError(f'Поддерживается только http: {url}')
+            bust_cache = not options['cached']
+            asyncio.run(self.run(parts, options['connections'], options['warmup'], bust_cache))
+            elapsed, latencies, state = asyncio.run(
+                self.run(parts, options['connections'], options['requests'], bust_cache)
+            )
+            latencies.sort()
+            self.stdout.write(
+                f'{url}: {len(latencies) / elapsed if elapsed else 0:.0f} запросов/с, '
+                f'p50 {percentile(latencies, 0.5) * 1000:.1f} мс, p99 {percentile(latencies, 0.99) * 1000:.1f} мс, '
+                f'ошибок {state["errors"]}, из кэша {state["cache_hits"]}'
+            )
+
+    async def run(self, parts, connections, total, bust_cache):
+        path = parts.path or '/'
+        if parts.query:
+            path += f'?{parts.query}'
+        # Префикс прогона: записи кэша от прошлых запусков не совпадут
+        run_id = os.urandom(4).hex()
+        numbers = itertools.count()
+
+        def build_request():
+            target = path
+            if bust_cache:
+                target += f'{"&" if "?" in path else "?"}{CACHE_BUSTER}={run_id}-{next(numbers)}'
+            return f'GET {target} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: application/json\r\n\r\n'.encode()
+
+        state = {'remaining': total, 'errors': 0, 'cache_hits': 0}
+        latencies = []
+
+        async def client():
+            reader = writer = None
+            while state['remaining'] > 0:
+                state['remaining'] -= 1
+                started = time.perf_counter()
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+                    writer.write(build_request())
+                    await writer.drain()
+                    status, headers = await read_response(reader)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    state['errors'] += 1
+                    writer = None
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    state['errors'] += 1
+                if headers.get('x-cache') == 'HIT':
+                    state['cache_hits'] += 1
+                if headers.get('connection') == 'close':
+                    writer.close()
+                    writer = None
+            if writer is not None:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(connections)))
+        return time.perf_counter() - started, latencies, state
@@ -0,0 +1,83 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+
+from books.ids import UUID1_EPOCH_OFFSET, build_uuid7
+
+
+def uuid1_at(unix_ns):
+    ticks = unix_ns // 100 + UUID1_EPOCH_OFFSET
+    clock_seq = random.getrandbits(14)
+    return uuid.UUID(fields=(
+        ticks & 0xFFFFFFFF, ticks >> 32 & 0xFFFF, ticks >> 48 & 0x0FFF | 0x1000,
+        clock_seq >> 8 | 0x80, clock_seq & 0xFF, random.getrandbits(48),
+    ))
+
+
+def uuid7_at(unix_ns):
+    return build_uuid7(unix_ns // 1_000_000, random.getrandbits(12), random.getrandbits(62))
+
+
+SCHEMES = {
+    'uuid1': uuid1_at,
+    'uuid7': uuid7_at,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает вставку ключей UUID1 и UUIDv7 во временную таблицу с первичным ключом: '
+        'скорость, долю вставок в конец индекса и (на PostgreSQL) размер индекса'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Для оценки на больших объёмах: 10000000')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='Период, за который «созданы» строки: младшие биты времени UUID1 повторяются каждые ~7 минут',
+        )
+
+    def handle(self, *args, **options):
+        id_field = models.UUIDField()
+        batch_size = min(options['batch_size'], connection.ops.bulk_batch_size([id_field], range(options['batch_size'])))
+        rows = options['rows']
+        step_ns = options['days'] * 86400 * 10 ** 9 // max(rows, 1)
+        started_ns = time.time_ns() - options['days'] * 86400 * 10 ** 9
+        for scheme, generate in SCHEMES.items():
+            self.run(scheme, generate, rows, batch_size, id_field, started_ns, step_ns)
+
+    def run(self, scheme, generate, rows, batch_size, id_field, started_ns, step_ns):
+        table = f'benchmark_ids_{scheme}'
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} (id {id_field.db_type(connection)} PRIMARY KEY)')
+            try:
+                # Вставка «в конец» — ключ больше всех предыдущих: страница индекса справа уже в памяти
+                appended, last = 0, None
+                started = time.perf_counter()
+                for start in range(0, rows, batch_size):
+                    ids = [generate(started_ns + i * step_ns) for i in range(start, min(start + batch_size, rows))]
+                    for value in ids:
+                        if last is None or value.bytes > last:
+                            appended += 1
+                            last = value.bytes
+                    placeholders = ', '.join(['(%s)'] * len(ids))
+                    cursor.execute(
+                        f'INSERT INTO {table} (id) VALUES {placeholders}',
+                        [id_field.get_db_prep_value(value, connection) for value in ids],
+                    )
+                elapsed = time.perf_counter() - started
+
+                line = (
+                    f'{scheme}: {rows} строк за {elapsed:.1f} с, {rows / elapsed if elapsed else 0:.0f} строк/с, '
+                    f'вставок в конец индекса {appended / rows if rows else 0:.1%}'
+                )
+                if connection.vendor == 'postgresql':
+                    cursor.execute('SELECT pg_indexes_size(%s)', [table])
+                    line += f', размер индекса {cursor.fetchone()[0] / 1024 / 1024:.1f} МБ'
+                self.stdout.write(line)
+            finally:
+                cursor.execute(f'DROP TABLE {table}')
@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from books.models import Author, Book, Genre
+from books.renderers import FastJSONRenderer, orjson
+from books.serializers import BookSerializer, ValuesSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает ModelSerializer + JSONRenderer с ValuesSerializer + FastJSONRenderer на синтетических книгах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['books'])
+                self.run(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        authors = Author.objects.bulk_create([Author(name=f'Benchmark author {i}') for i in range(max(count // 10, 1))])
+        genres = Genre.objects.bulk_create([Genre(name=f'Benchmark genre {i}') for i in range(20)])
+        books = Book.objects.bulk_create([
+            Book(title=f'Benchmark book {i}', description='Описание ' * 20, publish_date='2000-01-01')
+            for i in range(count)
+        ])
+        Book.authors.through.objects.bulk_create([
+            Book.authors.through(book_id=book.id, author_id=authors[(i + shift) % len(authors)].id)
+            for i, book in enumerate(books) for shift in range(2)
+        ], ignore_conflicts=True)
+        Book.genres.through.objects.bulk_create([
+            Book.genres.through(book_id=book.id, genre_id=genres[i % len(genres)].id) for i, book in enumerate(books)
+        ])
+
+    def run(self, repeat):
+        queryset = Book.objects.filter(title__startswith='Benchmark book').order_by('publish_date', 'id')
+
+        def model_path():
+            data = BookSerializer(BookSerializer.setup_eager_loading(queryset), many=True).data
+            return JSONRenderer().render(data)
+
+        def values_path():
+            values_serializer = ValuesSerializer(BookSerializer())
+            data = values_serializer.to_representation(list(values_serializer.values(queryset)))
+            return FastJSONRenderer().render(data)
+
+        baseline = self.measure(model_path, repeat)
+        fast = self.measure(values_path, repeat)
+        self.stdout.write(f'orjson: {"да" if orjson else "нет"}')
+        self.stdout.write(f'ModelSerializer + JSONRenderer:      {baseline * 1000:.1f} мс')
+        self.stdout.write(f'ValuesSerializer + FastJSONRenderer: {fast * 1000:.1f} мс')
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: {baseline / fast:.1f}x'))
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
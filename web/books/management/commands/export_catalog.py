@@ -0,0 +1,42 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.export import EXPORT_FORMATS, export_catalog, iter_catalog
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка каталога книг в NDJSON или CSV (с --gzip или путём *.gz — сжатая)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл для записи или "-" для stdout')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--gzip', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        compress = options['gzip'] or path.endswith('.gz')
+        started = time.monotonic()
+        self.rows = 0
+        written = 0
+
+        target = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        try:
+            for chunk in export_catalog(options['format'], compress, rows=self.count(iter_catalog())):
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Выгружено {self.rows} книг ({written} байт) за {elapsed:.1f} с, '
+            f'{self.rows / elapsed if elapsed else 0:.0f} строк/с'
+        )
+
+    def count(self, rows):
+        for row in rows:
+            self.rows += 1
+            yield row
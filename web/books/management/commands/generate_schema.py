@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.schema import build_schema, code_fingerprint, read_stored, schema_drift, schema_path, write_stored
+
+
+class Command(BaseCommand):
+    help = (
+        'Построение схемы OpenAPI по текущим представлениям и сохранение в OPENAPI_SCHEMA_PATH. '
+        'С --check только сравнивает сохранённую схему с текущей и завершается ошибкой при расхождении'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Не сохранять, а проверить сохранённую схему')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        spec = build_schema()
+        elapsed = time.monotonic() - started
+
+        if options['check']:
+            stored = read_stored()
+            if stored is None:
+                raise CommandError(f'Сохранённой схемы нет: {schema_path()}')
+            drift = schema_drift(stored['schema'], spec)
+            if drift:
+                raise CommandError('Сохранённая схема расходится с представлениями:\n' + '\n'.join(drift))
+            if stored['fingerprint'] != code_fingerprint():
+                # Схема та же, но код менялся: при запуске она будет построена заново
+                self.stdout.write('Схема совпадает, но отпечаток кода устарел — выполните generate_schema')
+            self.stdout.write(self.style.SUCCESS('Сохранённая схема совпадает с представлениями'))
+            return
+
+        write_stored(code_fingerprint(), spec)
+        self.stdout.write(self.style.SUCCESS(
+            f'Схема сохранена в {schema_path()}: {len(spec.get("paths", {}))} путей, построена за {elapsed * 1000:.0f} мс'
+        ))
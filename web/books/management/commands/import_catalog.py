@@ -0,0 +1,200 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from books.cache import AUTHOR_LIST, BOOK_LIST, BOOK_SEARCH, GENRE_LIST, invalidate
+from books.counters import change_book_counts, count_links
+from books.models import Author, Book, Genre
+from books.read_model import refresh_read_models
+from books.search import update_search_vectors
+
+FORMATS = ('csv', 'jsonl')
+
+
+def open_source(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise CommandError('Не удалось определить формат файла, укажите --format')
+
+
+def read_csv(source, delimiter, list_separator):
+    for line_number, row in enumerate(csv.DictReader(source, delimiter=delimiter), start=2):
+        for field in ('authors', 'genres'):
+            row[field] = (row.get(field) or '').split(list_separator)
+        yield line_number, row
+
+
+def read_jsonl(source, errors):
+    for line_number, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            errors.append((line_number, str(exc)))
+
+
+def clean_names(names, model, label):
+    # Пустые имена пропускаются (в CSV это пустая колонка или лишний разделитель), остальное
+    # проверяется так же, как название: одна неверная строка не должна срывать COPY всей пачки
+    if names is None:
+        return []
+    if not isinstance(names, list):
+        raise ValueError(f'{label}: ожидается список имён')
+    max_length = model._meta.get_field('name').max_length
+    cleaned = set()
+    for name in names:
+        if not isinstance(name, str):
+            raise ValueError(f'{label}: имя должно быть строкой')
+        name = name.strip()
+        if len(name) > max_length:
+            raise ValueError(f'{label}: слишком длинное имя')
+        if name:
+            cleaned.add(name)
+    return sorted(cleaned)
+
+
+def clean_rows(rows, errors):
+    for line_number, row in rows:
+        try:
+            title = (row.get('title') or '').strip()
+            if not title or len(title) > Book._meta.get_field('title').max_length:
+                raise ValueError('пустое или слишком длинное название')
+            yield {
+                'title': title,
+                'description': row.get('description') or None,
+                'publish_date': date.fromisoformat(str(row.get('publish_date') or '')),
+                'authors': clean_names(row.get('authors'), Author, 'авторы'),
+                'genres': clean_names(row.get('genres'), Genre, 'жанры'),
+            }
+        except (AttributeError, TypeError, ValueError) as exc:
+            errors.append((line_number, str(exc)))
+
+
+def batched(rows, size):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт каталога книг из CSV или JSONL (в том числе .gz)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--delimiter', default=',', help='Разделитель колонок CSV')
+        parser.add_argument('--list-separator', default='|', help='Разделитель авторов и жанров в CSV')
+        parser.add_argument('--no-copy', action='store_true', help='Не использовать COPY даже на PostgreSQL')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or detect_format(path)
+        self.use_copy = not options['no_copy'] and connection.vendor == 'postgresql'
+        # Справочники имя -> id растут только с числом авторов и жанров, а не строк
+        self.author_ids = {}
+        self.genre_ids = {}
+        errors = []
+        imported = skipped = 0
+        started = time.monotonic()
+
+        try:
+            with open_source(path) as source:
+                if file_format == 'csv':
+                    rows = read_csv(source, options['delimiter'], options['list_separator'])
+                else:
+                    rows = read_jsonl(source, errors)
+                for batch in batched(clean_rows(rows, errors), options['batch_size']):
+                    created = self.import_batch(batch)
+                    imported += created
+                    skipped += len(batch) - created
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'Импортировано {imported}, пропущено {skipped}, '
+                        f'{(imported + skipped) / elapsed if elapsed else 0:.0f} строк/с'
+                    )
+                    self.report_errors(errors)
+        except (OSError, UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f'Ошибка чтения {path}: {exc}')
+        self.report_errors(errors)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: импортировано {imported}, пропущено {skipped} за {time.monotonic() - started:.1f} с'
+        ))
+
+    def report_errors(self, errors):
+        for line_number, message in errors:
+            self.stderr.write(f'Строка {line_number}: {message}')
+        errors.clear()
+
+    def import_batch(self, batch):
+        with transaction.atomic():
+            self.resolve_names(Author, self.author_ids, {name for row in batch for name in row['authors']})
+            self.resolve_names(Genre, self.genre_ids, {name for row in batch for name in row['genres']})
+
+            existing = set(Book.objects.filter(title__in=[row['title'] for row in batch]).values_list('title', flat=True))
+            books = []
+            for row in batch:
+                if row['title'] in existing:
+                    continue
+                existing.add(row['title'])
+                books.append((Book(title=row['title'], description=row['description'], publish_date=row['publish_date']), row))
+
+            author_links = [(book.id, self.author_ids[name]) for book, row in books for name in row['authors']]
+            genre_links = [(book.id, self.genre_ids[name]) for book, row in books for name in row['genres']]
+            if self.use_copy:
+                now = timezone.now()
+                with connection.cursor() as cursor:
+                    copy_rows(cursor, Book._meta.db_table, ['id', 'title', 'description', 'publish_date', 'updated_at'], [
+                        (book.id, book.title, book.description, book.publish_date, now) for book, _ in books
+                    ])
+                    copy_rows(cursor, Book.authors.through._meta.db_table, ['book_id', 'author_id'], author_links)
+                    copy_rows(cursor, Book.genres.through._meta.db_table, ['book_id', 'genre_id'], genre_links)
+            else:
+                Book.objects.bulk_create([book for book, _ in books])
+                Book.authors.through.objects.bulk_create(
+                    [Book.authors.through(book_id=book_id, author_id=author_id) for book_id, author_id in author_links]
+                )
+                Book.genres.through.objects.bulk_create(
+                    [Book.genres.through(book_id=book_id, genre_id=genre_id) for book_id, genre_id in genre_links]
+                )
+            change_book_counts(Author, count_links(author_links))
+            change_book_counts(Genre, count_links(genre_links))
+            update_search_vectors([book.id for book, _ in books])
+            refresh_read_models([book.id for book, _ in books])
+            invalidate(AUTHOR_LIST, GENRE_LIST, BOOK_LIST, BOOK_SEARCH)
+        return len(books)
+
+    def resolve_names(self, model, ids, names):
+        missing = names - ids.keys()
+        if not missing:
+            return
+        ids.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+        new = [model(name=name) for name in missing - ids.keys()]
+        model.objects.bulk_create(new)
+        ids.update((obj.name, obj.id) for obj in new)
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def mb(kb):
+    return '—' if kb is None else f'{kb / 1024:.1f} МБ'
+
+
+class Command(BaseCommand):
+    help = (
+        'Время до первого ответа и память воркеров, форкнутых от мастера без предзагрузки '
+        'приложения и с ней (library.boot). Каждый вариант запускается в отдельном процессе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/v1/books/', help='Первый запрос каждого воркера')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError('Замер требует fork() и /proc, то есть Linux')
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'PYTHONPATH': os.pathsep.join(sys.path)}
+        results = []
+        for preload in ('off', 'on'):
+            completed = subprocess.run(
+                [sys.executable, '-m', 'library.boot', '--path', options['path'],
+                 '--workers', str(options['workers']), '--preload', preload],
+                capture_output=True, text=True, env=env,
+            )
+            if completed.returncode:
+                raise CommandError(f'Замер с предзагрузкой {preload} завершился ошибкой:\n{completed.stderr}')
+            result = json.loads(completed.stdout)
+            results.append(result)
+
+            self.stdout.write(
+                f'Предзагрузка {preload}: мастер готов за {result["master_ready_ms"]} мс, '
+                f'RSS мастера {mb(result["master"]["rss_kb"])}'
+            )
+            for number, worker in enumerate(result['workers'], start=1):
+                if 'error' in worker:
+                    raise CommandError(f'Воркер {number}: {worker["error"]}')
+                self.stdout.write(
+                    f'  воркер {number}: первый ответ {worker["status"]} за {worker["first_request_ms"]} мс, '
+                    f'RSS {mb(worker["rss_kb"])}, собственная память {mb(worker["private_kb"])}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
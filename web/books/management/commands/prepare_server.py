@@ -0,0 +1,63 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+# Отпечаток исходной статики, для которой последний раз выполнялся collectstatic
+STATIC_STAMP = '.collectstatic-fingerprint'
+# Те же шаблоны, что collectstatic пропускает по умолчанию
+STATIC_IGNORE_PATTERNS = ['CVS', '.*', '*~']
+
+
+def static_fingerprint():
+    entries = []
+    for finder in get_finders():
+        for path, storage in finder.list(STATIC_IGNORE_PATTERNS):
+            stat = os.stat(storage.path(path))
+            entries.append(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}')
+    return hashlib.sha1('\n'.join(sorted(entries)).encode()).hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        'Подготовка к запуску сервера в одном процессе: migrate — только если есть '
+        'непримененные миграции, collectstatic — только если изменилась исходная статика'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Выполнить migrate и collectstatic без проверок')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        force = options['force']
+
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if plan or force:
+            call_command('migrate', interactive=False, verbosity=options['verbosity'])
+            self.stdout.write(f'Применено миграций: {len(plan)}')
+        else:
+            self.stdout.write('Миграции: изменений нет')
+
+        stamp_path = os.path.join(settings.STATIC_ROOT, STATIC_STAMP)
+        fingerprint = static_fingerprint()
+        try:
+            with open(stamp_path) as stamp:
+                collected = stamp.read().strip()
+        except OSError:
+            collected = None
+        if fingerprint != collected or force:
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with open(stamp_path, 'w') as stamp:
+                stamp.write(fingerprint)
+            self.stdout.write('Статика собрана')
+        else:
+            self.stdout.write('Статика: изменений нет')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово за {time.monotonic() - started:.2f} с'))
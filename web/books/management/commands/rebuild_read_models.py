@@ -0,0 +1,29 @@
+import itertools
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.models import Book, BookReadModel
+from books.read_model import READ_MODEL_BATCH_SIZE, refresh_read_models
+
+
+class Command(BaseCommand):
+    help = 'Перестроение проекции BookReadModel по основным таблицам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=READ_MODEL_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        total = 0
+
+        book_ids = Book.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size)
+        while batch := list(itertools.islice(book_ids, batch_size)):
+            total += refresh_read_models(batch, batch_size=batch_size)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Перестроено {total} строк проекции из {BookReadModel.objects.count()} за {elapsed:.1f} с, '
+            f'{total / elapsed if elapsed else 0:.0f} строк/с'
+        )
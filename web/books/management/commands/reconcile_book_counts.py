@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books.counters import RECONCILE_BATCH_SIZE, reconcile_book_counts
+from books.models import Author, Genre
+
+
+class Command(BaseCommand):
+    help = 'Сверка счётчиков книг у авторов и жанров с промежуточными таблицами и исправление расхождений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только вывести расхождения, ничего не менять')
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE)
+        parser.add_argument('--show', type=int, default=20, help='Сколько расхождений вывести по каждой модели')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        for model in (Author, Genre):
+            drift = reconcile_book_counts(model, fix=not options['dry_run'], batch_size=options['batch_size'])
+            for pk, stored, actual in drift[:options['show']]:
+                self.stdout.write(f'{model._meta.model_name} {pk}: {stored} -> {actual}')
+            verb = 'найдено' if options['dry_run'] else 'исправлено'
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {verb} расхождений {len(drift)}')
+        self.stdout.write(self.style.SUCCESS(f'Готово за {time.monotonic() - started:.1f} с'))
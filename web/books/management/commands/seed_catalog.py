@@ -0,0 +1,167 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from books.cache import AUTHOR_LIST, BOOK_LIST, BOOK_SEARCH, GENRE_LIST, invalidate
+from books.management.commands.import_catalog import copy_rows
+from books.counters import change_book_counts, count_links
+from books.models import Author, Book, BookReadModel, Genre
+from books.read_model import refresh_read_models
+from books.search import update_search_vectors
+
+FIRST_NAMES = (
+    'Анна', 'Борис', 'Вера', 'Григорий', 'Дарья', 'Евгений', 'Жанна', 'Иван', 'Ксения', 'Лев',
+    'Мария', 'Николай', 'Ольга', 'Пётр', 'Раиса', 'Сергей', 'Татьяна', 'Фёдор', 'Юлия', 'Ярослав',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов', 'Новиков', 'Фёдоров',
+    'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Козлов', 'Степанов', 'Николаев',
+)
+GENRES = (
+    'Роман', 'Фантастика', 'Фэнтези', 'Детектив', 'Триллер', 'Поэзия', 'Драма', 'История', 'Биография',
+    'Приключения', 'Философия', 'Психология', 'Наука', 'Публицистика', 'Сказки', 'Мемуары', 'Ужасы',
+    'Юмор', 'Эссе', 'Классика',
+)
+TITLE_WORDS = (
+    'Тихий', 'Последний', 'Северный', 'Забытый', 'Золотой', 'Тайный', 'Долгий', 'Белый', 'Далёкий', 'Старый',
+)
+TITLE_NOUNS = (
+    'город', 'берег', 'сад', 'путь', 'дом', 'ветер', 'остров', 'лес', 'мост', 'свет', 'архив', 'край',
+)
+SENTENCES = (
+    'История о людях, которые меняют мир вокруг себя.',
+    'Книга, написанная на основе реальных событий.',
+    'Путешествие, которое начинается с одного письма.',
+    'Семейная сага длиною в целый век.',
+    'Неожиданный взгляд на привычные вещи.',
+    'Сборник, вошедший в школьную программу.',
+)
+EARLIEST_DATE = datetime.date(1900, 1, 1)
+LATEST_DATE = datetime.date(2023, 12, 31)
+
+
+def unique_name(index, *parts):
+    # Все сочетания частей по одному разу, дальше — с номером круга: имена уникальны без проверок
+    name, rest = [], index
+    for words in parts:
+        rest, position = divmod(rest, len(words))
+        name.append(words[position])
+    name = ' '.join(name)
+    return f'{name} {rest + 1}' if rest else name
+
+
+def pick_skewed(rng, items, count, skew):
+    # Популярные (первые) элементы выбираются чаще: степенное распределение индекса
+    picked = {}
+    for _ in range(count * 3):
+        item = items[int(len(items) * rng.random() ** skew)]
+        picked[item.id] = item
+        if len(picked) == count:
+            break
+    return list(picked.values())
+
+
+class Command(BaseCommand):
+    help = (
+        'Синтетический каталог для нагрузочных тестов: книги, авторы, жанры и связи вставляются '
+        'пакетами (COPY на PostgreSQL), проекция и поисковые векторы строятся для каждого пакета'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--genres', type=int, default=20)
+        parser.add_argument('--authors-per-book', type=float, default=1.5, help='Среднее число авторов у книги')
+        parser.add_argument('--genres-per-book', type=float, default=2, help='Среднее число жанров у книги')
+        parser.add_argument('--skew', type=float, default=2.0, help='1 — равномерно, больше — сильнее перекос к популярным')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Одинаковый seed даёт одинаковый каталог')
+        parser.add_argument('--clear', action='store_true', help='Удалить книги, авторов и жанры перед генерацией')
+        parser.add_argument('--no-copy', action='store_true', help='Не использовать COPY даже на PostgreSQL')
+
+    def handle(self, *args, **options):
+        if options['books'] < 0 or options['authors'] < 1 or options['genres'] < 1:
+            raise CommandError('Нужен хотя бы один автор и один жанр')
+        self.rng = random.Random(options['seed'])
+        self.use_copy = not options['no_copy'] and connection.vendor == 'postgresql'
+        started = time.monotonic()
+
+        if options['clear']:
+            self.clear()
+        try:
+            authors = self.create_names(Author, options['authors'], (FIRST_NAMES, LAST_NAMES))
+            genres = self.create_names(Genre, options['genres'], (GENRES,))
+            created = 0
+            while created < options['books']:
+                size = min(options['batch_size'], options['books'] - created)
+                self.create_books(created, size, authors, genres, options)
+                created += size
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'Создано книг: {created}, {created / elapsed if elapsed else 0:.0f} книг/с')
+        except IntegrityError as exc:
+            raise CommandError(f'Каталог уже содержит такие названия или имена, запустите с --clear: {exc}')
+        invalidate(AUTHOR_LIST, GENRE_LIST, BOOK_LIST, BOOK_SEARCH)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {options["books"]} книг, {len(authors)} авторов, {len(genres)} жанров '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
+
+    def clear(self):
+        models = (BookReadModel, Book.authors.through, Book.genres.through, Book, Author, Genre)
+        tables = [model._meta.db_table for model in models]
+        # Как flush: TRUNCATE на PostgreSQL, DELETE на прочих СУБД, без сигналов на каждую строку
+        connection.ops.execute_sql_flush(connection.ops.sql_flush(no_style(), tables))
+
+    def create_names(self, model, count, parts):
+        objects = [model(name=unique_name(i, *parts)) for i in range(count)]
+        model.objects.bulk_create(objects, batch_size=5000)
+        return objects
+
+    def create_books(self, offset, size, authors, genres, options):
+        rng = self.rng
+        days = (LATEST_DATE - EARLIEST_DATE).days
+        books, author_links, genre_links = [], [], []
+        for i in range(offset, offset + size):
+            book = Book(
+                title=unique_name(i, TITLE_WORDS, TITLE_NOUNS),
+                description=None if rng.random() < 0.1 else ' '.join(rng.sample(SENTENCES, rng.randint(1, 3))),
+                publish_date=EARLIEST_DATE + datetime.timedelta(days=rng.randrange(days)),
+            )
+            books.append(book)
+            for author in pick_skewed(rng, authors, self.fan_out(options['authors_per_book']), options['skew']):
+                author_links.append((book.id, author.id))
+            for genre in pick_skewed(rng, genres, self.fan_out(options['genres_per_book']), options['skew']):
+                genre_links.append((book.id, genre.id))
+
+        with transaction.atomic():
+            if self.use_copy:
+                now = timezone.now()
+                with connection.cursor() as cursor:
+                    copy_rows(cursor, Book._meta.db_table, ['id', 'title', 'description', 'publish_date', 'updated_at'], [
+                        (book.id, book.title, book.description, book.publish_date, now) for book in books
+                    ])
+                    copy_rows(cursor, Book.authors.through._meta.db_table, ['book_id', 'author_id'], author_links)
+                    copy_rows(cursor, Book.genres.through._meta.db_table, ['book_id', 'genre_id'], genre_links)
+            else:
+                Book.objects.bulk_create(books)
+                Book.authors.through.objects.bulk_create(
+                    [Book.authors.through(book_id=book_id, author_id=author_id) for book_id, author_id in author_links]
+                )
+                Book.genres.through.objects.bulk_create(
+                    [Book.genres.through(book_id=book_id, genre_id=genre_id) for book_id, genre_id in genre_links]
+                )
+            change_book_counts(Author, count_links(author_links))
+            change_book_counts(Genre, count_links(genre_links))
+            book_ids = [book.id for book in books]
+            update_search_vectors(book_ids)
+            refresh_read_models(book_ids)
+
+    def fan_out(self, mean):
+        # Равномерно от 1 до 2 * mean - 1: среднее равно mean
+        return max(1, round(self.rng.uniform(1, 2 * mean - 1)))
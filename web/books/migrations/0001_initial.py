@@ -0,0 +1,46 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:15
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid1, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('date_of_birth', models.DateField(blank=True, null=True)),
+                ('date_of_death', models.DateField(blank=True, null=True, verbose_name='Died')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid1, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid1, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255, unique=True)),
+                ('description', models.TextField(null=True)),
+                ('publish_date', models.DateField()),
+                ('authors', models.ManyToManyField(related_name='authors', to='books.author')),
+                ('genres', models.ManyToManyField(related_name='genres', to='books.genre')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(fields=('title',), name='unique_book_title'),
+        ),
+    ]
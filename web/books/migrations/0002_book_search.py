@@ -0,0 +1,58 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:17
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_INDEXES = [
+    ('books_book_search_vector_gin', 'books_book', 'search_vector'),
+    ('books_book_title_trgm', 'books_book', 'UPPER(title) gin_trgm_ops'),
+    ('books_author_name_trgm', 'books_author', 'UPPER(name) gin_trgm_ops'),
+    ('books_genre_name_trgm', 'books_genre', 'UPPER(name) gin_trgm_ops'),
+]
+
+FILL_SEARCH_VECTOR = """
+UPDATE books_book AS b SET search_vector =
+    setweight(to_tsvector('simple', COALESCE(b.title, '')), 'A')
+    || setweight(to_tsvector('simple', COALESCE((
+        SELECT string_agg(a.name, ' ') FROM books_book_authors ba
+        JOIN books_author a ON a.id = ba.author_id WHERE ba.book_id = b.id
+    ), '')), 'B')
+    || setweight(to_tsvector('simple', COALESCE((
+        SELECT string_agg(g.name, ' ') FROM books_book_genres bg
+        JOIN books_genre g ON g.id = bg.genre_id WHERE bg.book_id = b.id
+    ), '')), 'C')
+    || setweight(to_tsvector('simple', COALESCE(b.description, '')), 'D')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, expression in SEARCH_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expression})')
+    schema_editor.execute(FILL_SEARCH_VECTOR)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, expression in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='book',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publish_date', 'id'], name='book_publish_date_id_idx'),
+        ),
+    ]
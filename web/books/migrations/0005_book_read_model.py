@@ -0,0 +1,70 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+from rest_framework import serializers
+
+FILL_BATCH_SIZE = 1000
+
+
+def represent(obj):
+    # Повторяет вывод AuthorSerializer/GenreSerializer на момент миграции
+    item = {}
+    for field in obj._meta.concrete_fields:
+        value = getattr(obj, field.attname)
+        if value is None:
+            item[field.name] = None
+        elif isinstance(field, models.DateTimeField):
+            item[field.name] = serializers.DateTimeField().to_representation(value)
+        elif isinstance(field, models.DateField):
+            item[field.name] = serializers.DateField().to_representation(value)
+        elif isinstance(field, models.UUIDField):
+            item[field.name] = str(value)
+        else:
+            item[field.name] = value
+    return item
+
+
+def fill_read_models(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookReadModel = apps.get_model('books', 'BookReadModel')
+    using = schema_editor.connection.alias
+    books = Book.objects.using(using).order_by('id').prefetch_related('authors', 'genres')
+    batch = []
+    for book in books.iterator(chunk_size=FILL_BATCH_SIZE):
+        batch.append(BookReadModel(
+            book_id=book.id, title=book.title, description=book.description,
+            publish_date=book.publish_date, updated_at=book.updated_at,
+            authors=[represent(author) for author in book.authors.all()],
+            genres=[represent(genre) for genre in book.genres.all()],
+        ))
+        if len(batch) >= FILL_BATCH_SIZE:
+            BookReadModel.objects.using(using).bulk_create(batch)
+            batch = []
+    BookReadModel.objects.using(using).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookReadModel',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='read_model', serialize=False, to='books.book')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(null=True)),
+                ('publish_date', models.DateField()),
+                ('updated_at', models.DateTimeField()),
+                ('authors', models.JSONField(default=list)),
+                ('genres', models.JSONField(default=list)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['publish_date', 'book'], name='book_read_publish_date_idx')],
+            },
+        ),
+        migrations.RunPython(fill_read_models, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+# Промежуточные таблицы создаются Django автоматически, поэтому составные индексы
+# для выборки книг по автору и жанру (только по индексу) добавляются SQL
+RELATION_INDEXES = [
+    ('books_book_authors_author_book_idx', 'books_book_authors', 'author_id, book_id'),
+    ('books_book_genres_genre_book_idx', 'books_book_genres', 'genre_id, book_id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_read_model'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})',
+            f'DROP INDEX IF EXISTS {name}',
+        )
+        for name, table, columns in RELATION_INDEXES
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:37
+
+import uuid
+
+import books.ids
+from django.db import migrations, models
+
+# Таблица -> ссылающиеся на неё колонки. Внешние ключи Django создаёт отложенными
+# (DEFERRABLE INITIALLY DEFERRED), поэтому ключи и ссылки меняются в одной транзакции
+ID_REFERENCES = [
+    ('books', 'Author', [('books_book_authors', 'author_id')]),
+    ('books', 'Genre', [('books_book_genres', 'genre_id')]),
+    ('books', 'Book', [
+        ('books_book_authors', 'book_id'), ('books_book_genres', 'book_id'), ('books_bookreadmodel', 'book_id'),
+    ]),
+]
+MAP_TABLE = 'books_id_map'
+BATCH_SIZE = 10000
+
+
+def update_column(cursor, quote_name, table, column):
+    table, column = quote_name(table), quote_name(column)
+    cursor.execute(
+        f'UPDATE {table} SET {column} = (SELECT new_id FROM {MAP_TABLE} WHERE old_id = {table}.{column}) '
+        f'WHERE {column} IN (SELECT old_id FROM {MAP_TABLE})'
+    )
+
+
+def resolve_collisions(cursor, id_field, connection):
+    """
+    uuid1_to_uuid7 не взаимно однозначен (см. его описание): из UUID1 с одним
+    новым id первый сохраняет его, остальные получают id с тем же временем и
+    случайным хвостом. Возвращает {старый id: новый id} для переназначенных.
+    """
+    cursor.execute(
+        f'SELECT new_id, old_id FROM {MAP_TABLE} WHERE new_id IN '
+        f'(SELECT new_id FROM {MAP_TABLE} GROUP BY new_id HAVING COUNT(*) > 1) ORDER BY new_id, old_id'
+    )
+    overrides = {}
+    previous = None
+    for new_id, old_id in cursor.fetchall():
+        new_id, old_id = id_field.to_python(new_id), id_field.to_python(old_id)
+        if new_id == previous:
+            overrides[old_id] = books.ids.distinct_uuid7(new_id)
+        previous = new_id
+    for old_id, new_id in overrides.items():
+        cursor.execute(
+            f'UPDATE {MAP_TABLE} SET new_id = %s WHERE old_id = %s',
+            [id_field.get_db_prep_value(new_id, connection), id_field.get_db_prep_value(old_id, connection)],
+        )
+    return overrides
+
+
+def remap_ids(apps, schema_editor):
+    # Существующие UUID1 переводятся в UUIDv7 с тем же временем создания
+    connection = schema_editor.connection
+    quote_name = connection.ops.quote_name
+    id_field = models.UUIDField()
+    id_type = id_field.db_type(connection)
+    # Переназначенные при совпадениях id: они нужны и для ссылок в JSON проекции
+    overrides = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMPORARY TABLE {MAP_TABLE} (old_id {id_type} PRIMARY KEY, new_id {id_type} NOT NULL)')
+        for app_label, model_name, references in ID_REFERENCES:
+            model = apps.get_model(app_label, model_name)
+            cursor.execute(f'DELETE FROM {MAP_TABLE}')
+            batch = []
+            ids = model.objects.using(connection.alias).values_list('id', flat=True).iterator(chunk_size=BATCH_SIZE)
+            for old_id in ids:
+                new_id = books.ids.uuid1_to_uuid7(old_id)
+                if new_id != old_id:
+                    batch.append((id_field.get_db_prep_value(old_id, connection), id_field.get_db_prep_value(new_id, connection)))
+                if len(batch) >= BATCH_SIZE:
+                    cursor.executemany(f'INSERT INTO {MAP_TABLE} (old_id, new_id) VALUES (%s, %s)', batch)
+                    batch = []
+            if batch:
+                cursor.executemany(f'INSERT INTO {MAP_TABLE} (old_id, new_id) VALUES (%s, %s)', batch)
+            overrides.update(resolve_collisions(cursor, id_field, connection))
+            update_column(cursor, quote_name, model._meta.db_table, 'id')
+            for table, column in references:
+                update_column(cursor, quote_name, table, column)
+        cursor.execute(f'DROP TABLE {MAP_TABLE}')
+
+    # В проекции id авторов и жанров хранятся внутри JSON
+    BookReadModel = apps.get_model('books', 'BookReadModel')
+    changed = []
+    for read_model in BookReadModel.objects.using(connection.alias).iterator(chunk_size=BATCH_SIZE):
+        for related in read_model.authors + read_model.genres:
+            old_id = uuid.UUID(related['id'])
+            related['id'] = str(overrides.get(old_id) or books.ids.uuid1_to_uuid7(old_id))
+        changed.append(read_model)
+        if len(changed) >= BATCH_SIZE:
+            BookReadModel.objects.using(connection.alias).bulk_update(changed, ['authors', 'genres'])
+            changed = []
+    BookReadModel.objects.using(connection.alias).bulk_update(changed, ['authors', 'genres'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_relation_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='author',
+            name='id',
+            field=models.UUIDField(default=books.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='id',
+            field=models.UUIDField(default=books.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='id',
+            field=models.UUIDField(default=books.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        # Обратно не переводится: UUIDv7 остаются корректными ключами и для прежнего кода
+        migrations.RunPython(remap_ids, migrations.RunPython.noop),
+    ]
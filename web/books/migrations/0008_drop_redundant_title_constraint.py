@@ -0,0 +1,17 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_uuid7_ids'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='book',
+            name='unique_book_title',
+        ),
+    ]
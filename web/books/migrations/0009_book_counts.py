@@ -0,0 +1,46 @@
+# Generated by Django 4.2.6 on 2026-10-18 17:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_book_counts(apps, schema_editor):
+    using = schema_editor.connection.alias
+    Book = apps.get_model('books', 'Book')
+    for relation, target in (('authors', 'author_id'), ('genres', 'genre_id')):
+        m2m_field = Book._meta.get_field(relation)
+        through = m2m_field.remote_field.through
+        counts = through.objects.filter(**{target: OuterRef('pk')}).order_by().values(target).annotate(
+            total=Count('*'),
+        ).values('total')
+        m2m_field.related_model.objects.using(using).update(book_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_drop_redundant_title_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_book_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['-book_count', 'name'], name='author_book_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(fields=['-book_count', 'name'], name='genre_book_count_idx'),
+        ),
+    ]
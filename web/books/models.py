@@ -1,41 +1,86 @@
-import uuid
-
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from django.db.models import UniqueConstraint
+
+from .ids import uuid7
 
 
 class Author(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid1, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255, unique=True)
     date_of_birth = models.DateField(null=True, blank=True)
     date_of_death = models.DateField(null=True, blank=True, verbose_name='Died')
+    updated_at = models.DateTimeField(auto_now=True)
+    # Число книг автора, поддерживается books.counters
+    book_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # ?ordering=-book_count; по возрастанию индекс читается в обратном порядке
+            models.Index(fields=['-book_count', 'name'], name='author_book_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class Genre(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid1, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Число книг жанра, поддерживается books.counters
+    book_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-book_count', 'name'], name='genre_book_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class Book(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid1, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     title = models.CharField(max_length=255, unique=True)
     authors = models.ManyToManyField(Author, related_name='authors', blank=False)
     description = models.TextField(null=True)
     publish_date = models.DateField()
     genres = models.ManyToManyField(Genre, related_name='genres', blank=False)
+    # Заполняется books.search.update_search_vectors, используется только на PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Обновляется и при изменении связей с авторами и жанрами (books.signals)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        constraints = [
-            UniqueConstraint(fields=['title'], name='unique_book_title')
+        indexes = [
+            # Ключ курсорной пагинации списка книг
+            models.Index(fields=['publish_date', 'id'], name='book_publish_date_id_idx'),
         ]
 
     def __str__(self):
         authors = ", ".join([str(author) for author in self.authors.all()])
         genres = ", ".join([str(genre) for genre in self.genres.all()])
         return f'{self.title}, автор: {authors}, жанр: {genres}'
+
+
+class BookReadModel(models.Model):
+    """
+    Денормализованная проекция книги для чтения (books.read_model): одна строка
+    на книгу, авторы и жанры хранятся в JSON в том виде, в каком их отдаёт API.
+    """
+    book = models.OneToOneField(Book, primary_key=True, on_delete=models.CASCADE, related_name='read_model')
+    title = models.CharField(max_length=255)
+    description = models.TextField(null=True)
+    publish_date = models.DateField()
+    updated_at = models.DateTimeField()
+    authors = models.JSONField(default=list)
+    genres = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            # Порядок выгрузки каталога
+            models.Index(fields=['publish_date', 'book'], name='book_read_publish_date_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
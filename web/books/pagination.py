@@ -0,0 +1,102 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная пагинация по составному ключу ``view.keyset_ordering``.
+
+    В отличие от ``CursorPagination`` курсор хранит значения всех полей ключа,
+    поэтому дубликаты первого поля не превращаются в OFFSET, а COUNT(*) не нужен.
+    Поля с ``-`` сортируются по убыванию.
+    """
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(view.keyset_ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.model = queryset.model
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor.reverse if cursor else False
+        if cursor:
+            queryset = queryset.filter(self.keyset_filter(self.decode_position(cursor.position), reverse))
+
+        ordering = [flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        self.has_next = cursor is not None if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        return self.page
+
+    def keyset_filter(self, position, reverse):
+        # (a, b) > (x, y)  ->  a >= x AND (a > x OR (a = x AND b > y)); первое условие даёт диапазон по индексу
+        lookups = ['lt' if field.startswith('-') != reverse else 'gt' for field in self.ordering]
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            equal = {name: value for name, value in zip(self.fields[:i], position)}
+            condition |= Q(**equal, **{f'{field}__{lookups[i]}': position[i]})
+        return Q(**{f'{self.fields[0]}__{lookups[0]}e': position[0]}) & condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0])))
+
+    def encode_position(self, instance):
+        if isinstance(instance, dict):
+            return json.dumps([str(instance[field]) for field in self.fields])
+        return json.dumps([str(getattr(instance, field)) for field in self.fields])
+
+    def decode_position(self, position):
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [self.model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class KeysetPaginationMixin:
+    """
+    Включает KeysetPagination по ``?pagination=cursor`` или при наличии ``?cursor=``,
+    иначе используется ``pagination_class`` представления.
+    """
+    keyset_ordering = ('id',)
+    keyset_pagination_class = KeysetPagination
+
+    def use_keyset_pagination(self):
+        request = getattr(self, 'request', None)
+        if request is None:
+            return False
+        params = request.query_params
+        return params.get('pagination') == 'cursor' or self.keyset_pagination_class.cursor_query_param in params
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.use_keyset_pagination():
+            self._paginator = self.keyset_pagination_class()
+        return super().paginator
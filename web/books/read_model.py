@@ -0,0 +1,42 @@
+"""
+Проекция BookReadModel — денормализованное представление книг для чтения.
+
+Согласованность:
+
+* строки проекции пересчитываются в той же транзакции, что и изменение: сигналы
+  сохранения книги, изменения связей, переименования и удаления автора или жанра
+  (books.signals), а также массовые операции, которые сигналов не отправляют
+  (BookService.bulk_create_or_update_books, import_catalog);
+* удаление книги удаляет её строку каскадом;
+* изменения в обход ORM (SQL вручную, queryset.update() по названию или имени)
+  проекцию не обновляют — после них нужен ``manage.py rebuild_read_models``;
+* книга без строки проекции в списке строится из основных таблиц (ReadModelSerializer),
+  но в выгрузку каталога не попадает до перестроения.
+"""
+from .models import Book, BookReadModel
+from .serializers import BookSerializer, ValuesSerializer
+
+READ_MODEL_BATCH_SIZE = 1000
+READ_MODEL_FIELDS = ['title', 'description', 'publish_date', 'updated_at', 'authors', 'genres']
+
+
+def refresh_read_models(book_ids, using='default', batch_size=READ_MODEL_BATCH_SIZE):
+    # Представление строится тем же ValuesSerializer, что и ответ API, поэтому совпадает с ним
+    book_ids = list(book_ids)
+    values_serializer = ValuesSerializer(BookSerializer(), using=using)
+    refreshed = 0
+    for start in range(0, len(book_ids), batch_size):
+        rows = list(values_serializer.values(Book.objects.using(using).filter(pk__in=book_ids[start:start + batch_size])))
+        read_models = [
+            BookReadModel(
+                book_id=row['id'], title=row['title'], description=row['description'],
+                publish_date=row['publish_date'], updated_at=row['updated_at'],
+                authors=item['authors'], genres=item['genres'],
+            )
+            for row, item in zip(rows, values_serializer.to_representation(rows))
+        ]
+        BookReadModel.objects.using(using).bulk_create(
+            read_models, update_conflicts=True, unique_fields=['book'], update_fields=READ_MODEL_FIELDS,
+        )
+        refreshed += len(read_models)
+    return refreshed
@@ -0,0 +1,91 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connections
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Upper
+
+from .models import Author, Book, Genre
+
+# Каталог многоязычный, поэтому без стемминга конкретного языка
+SEARCH_CONFIG = 'simple'
+
+
+def book_search_vector():
+    author_names = Book.authors.through.objects.filter(book_id=OuterRef('pk')).values('book_id').annotate(
+        names=StringAgg('author__name', ' ')
+    ).values('names')
+    genre_names = Book.genres.through.objects.filter(book_id=OuterRef('pk')).values('book_id').annotate(
+        names=StringAgg('genre__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(author_names), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(genre_names), weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def search_vectors_enabled(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def update_search_vectors(book_ids, using='default'):
+    if not search_vectors_enabled(using):
+        return
+    Book.objects.using(using).filter(pk__in=book_ids).update(search_vector=book_search_vector())
+
+
+class SimpleSearchBackend:
+    """Поиск подстрокой по названию, описанию, авторам и жанрам (SQLite и прочие СУБД)."""
+
+    def search(self, queryset, query):
+        return queryset.filter(self.get_filter(query)).order_by('title')
+
+    def get_filter(self, query):
+        by_author = Book.authors.through.objects.filter(author__name__icontains=query).values('book_id')
+        by_genre = Book.genres.through.objects.filter(genre__name__icontains=query).values('book_id')
+        return (
+            Q(title__icontains=query) | Q(description__icontains=query)
+            | Q(pk__in=by_author) | Q(pk__in=by_genre)
+        )
+
+
+class PostgresSearchBackend(SimpleSearchBackend):
+    """
+    Полнотекстовый поиск по search_vector с ранжированием и нечёткое совпадение
+    по триграммам. Все условия обслуживаются GIN-индексами из миграции 0002.
+
+    Подходящие книги собираются в UNION из трёх веток: условия по самой книге
+    (BitmapOr по индексам названия и search_vector) и книги авторов и жанров,
+    найденных по их триграммным индексам. Подзапросы по связям в общем OR
+    PostgreSQL объединить с индексами не может и читает books_book целиком.
+    """
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return queryset.filter(pk__in=self.matching_ids(query, search_query)).annotate(
+            rank=SearchRank(F('search_vector'), search_query) + TrigramSimilarity(Upper('title'), query.upper())
+        ).order_by('-rank', 'title')
+
+    def get_filter(self, query):
+        return Q(pk__in=self.matching_ids(query, SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')))
+
+    def matching_ids(self, query, search_query):
+        by_book = Book.objects.filter(
+            Q(title__icontains=query) | TrigramSimilar(Upper('title'), query.upper()) | Q(search_vector=search_query)
+        ).values('pk')
+        authors = Author.objects.filter(self.name_filter(query)).values('pk')
+        genres = Genre.objects.filter(self.name_filter(query)).values('pk')
+        by_author = Book.authors.through.objects.filter(author_id__in=authors).values('book_id')
+        by_genre = Book.genres.through.objects.filter(genre_id__in=genres).values('book_id')
+        return by_book.union(by_author, by_genre)
+
+    def name_filter(self, query):
+        return Q(name__icontains=query) | TrigramSimilar(Upper('name'), query.upper())
+
+
+def get_search_backend(using='default'):
+    if search_vectors_enabled(using):
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
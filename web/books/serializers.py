@@ -1,23 +1,326 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Author, Book, Genre
 
+from library.instrumentation import timed
 
-class AuthorSerializer(serializers.ModelSerializer):
+from .models import Author, Book, BookReadModel, Genre
+
+
+class FieldSelection:
+    """
+    Разбор ``?fields=title,authors.name`` и ``?expand=authors`` для GET-запросов.
+
+    ``fields`` — None (все поля) или словарь поле -> набор вложенных полей (None — все);
+    ``expand`` — None (вкладывать все связи) или набор связей, выводимых объектами,
+    остальные связи выводятся списком id.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        params = request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+
+        fields = None
+        if 'fields' in params:
+            fields = {}
+            for token in params['fields'].split(','):
+                name, _, subfield = token.strip().partition('.')
+                if not name:
+                    continue
+                if not subfield:
+                    fields[name] = None
+                elif fields.get(name, set()) is not None:
+                    fields.setdefault(name, set()).add(subfield)
+        expand = None
+        if 'expand' in params:
+            expand = {name.strip() for name in params['expand'].split(',') if name.strip()}
+        return cls(fields, expand)
+
+    def includes(self, name):
+        return self.fields is None or name == 'id' or name in self.fields
+
+    def subfields(self, name):
+        return None if self.fields is None else self.fields.get(name)
+
+    def expands(self, name):
+        return self.expand is None or name in self.expand
+
+
+class TimedSerializerMixin:
+    # Время сериализации попадает в Server-Timing и метрики запроса (library.instrumentation)
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+class SparseFieldsMixin:
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - {'id'}:
+                self.fields.pop(name)
+
+
+class AuthorSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Author
         fields = '__all__'
+        # Счётчик ведут books.counters
+        read_only_fields = ('book_count',)
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Genre
         fields = '__all__'
+        read_only_fields = ('book_count',)
 
 
-class BookSerializer(serializers.ModelSerializer):
-    authors = AuthorSerializer(many=True, read_only=True)
-    genres = GenreSerializer(many=True, read_only=True)
+class BookAuthorSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Без счётчика книг: он меняется с каждой книгой автора и устаревал бы в проекциях (books.counters)
+    class Meta:
+        model = Author
+        exclude = ('book_count',)
+
+
+class BookGenreSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Genre
+        exclude = ('book_count',)
+
+
+class BookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    authors = BookAuthorSerializer(many=True, read_only=True)
+    genres = BookGenreSerializer(many=True, read_only=True)
+
+    relations = {'authors': (Author, BookAuthorSerializer), 'genres': (Genre, BookGenreSerializer)}
 
     class Meta:
         model = Book
-        fields = '__all__'
+        exclude = ('search_vector',)
+        # Уникальность названия проверяет БД при записи (BookService), без отдельного SELECT
+        extra_kwargs = {'title': {'validators': []}}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selection = FieldSelection.from_request(self.context.get('request'))
+        if selection is not None:
+            self.apply_selection(selection)
+
+    def apply_selection(self, selection):
+        for name in list(self.fields):
+            if not selection.includes(name):
+                self.fields.pop(name)
+        for name, (_, serializer_class) in self.relations.items():
+            if name not in self.fields:
+                continue
+            if not selection.expands(name):
+                self.fields[name] = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+            elif selection.subfields(name):
+                self.fields[name] = serializer_class(many=True, read_only=True, fields=selection.subfields(name))
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, selection=None):
+        # Вложенные авторы и жанры подгружаются одним запросом на связь, а не на каждую книгу
+        if selection is None:
+            return queryset.defer('search_vector').prefetch_related(*cls.relations)
+
+        if selection.fields is None:
+            queryset = queryset.defer('search_vector')
+        else:
+            # publish_date — ключ сортировки и курсорной пагинации, он нужен всегда
+            columns = [name for name in ('title', 'description', 'updated_at') if selection.includes(name)]
+            queryset = queryset.only('id', 'publish_date', *columns)
+
+        prefetches = []
+        for name, (model, _) in cls.relations.items():
+            if not selection.includes(name):
+                continue
+            if not selection.expands(name):
+                prefetches.append(Prefetch(name, queryset=model.objects.only('id')))
+            elif selection.subfields(name):
+                columns = {field.name for field in model._meta.concrete_fields} & selection.subfields(name)
+                prefetches.append(Prefetch(name, queryset=model.objects.only('id', *columns)))
+            else:
+                prefetches.append(name)
+        return queryset.prefetch_related(*prefetches)
+
+
+class ValuesSerializer:
+    """
+    Быстрое представление только для чтения: строится из строк ``values()`` теми же
+    полями DRF, что и у исходного сериализатора, без создания моделей. Связи
+    многие-ко-многим читаются одним запросом к промежуточной таблице на связь.
+    Структура и порядок ключей совпадают с ``serializer.to_representation``.
+    """
+
+    def __init__(self, serializer, extra_columns=(), using='default'):
+        # Колонки ключа сортировки могут приходить с признаком убывания
+        extra_columns = [column.lstrip('-') for column in extra_columns]
+        model = serializer.Meta.model
+        self.model = model
+        self.using = using
+        self.pk_name = model._meta.pk.name
+        self.fields = []
+        # Дополнительные колонки нужны, например, для ключа курсорной пагинации
+        self.columns = [self.pk_name, *(column for column in extra_columns if column != self.pk_name)]
+        self.key_columns = list(self.columns)
+        self.relations = {}
+        for name, field in serializer.fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                child_fields = [(child_name, child) for child_name, child in field.child.fields.items()]
+                self.relations[name] = (model._meta.get_field(field.source), child_fields)
+            elif isinstance(field, serializers.ManyRelatedField):
+                self.relations[name] = (model._meta.get_field(field.source), None)
+            elif field.source not in self.columns:
+                self.columns.append(field.source)
+            self.fields.append((name, field))
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, rows):
+        ids = [row[self.pk_name] for row in rows]
+        related = {
+            name: self.group_links(list(self.relation_links(ids, *relation)), relation[1])
+            for name, relation in self.relations.items()
+        }
+        return self.build(rows, related)
+
+    async def ato_representation(self, rows):
+        # То же, что to_representation, но запросы идут через асинхронный ORM
+        ids = [row[self.pk_name] for row in rows]
+        related = {}
+        for name, relation in self.relations.items():
+            links = [link async for link in self.relation_links(ids, *relation)]
+            related[name] = self.group_links(links, relation[1])
+        return self.build(rows, related)
+
+    def build(self, rows, related):
+        data = []
+        with timed('serialize'):
+            for row in rows:
+                item = {}
+                for name, field in self.fields:
+                    if name in related:
+                        item[name] = related[name].get(row[self.pk_name], [])
+                    else:
+                        value = row[field.source]
+                        item[name] = None if value is None else field.to_representation(value)
+                data.append(item)
+        return data
+
+    def relation_links(self, ids, m2m_field, child_fields):
+        through = m2m_field.remote_field.through
+        source, target = m2m_field.m2m_field_name(), m2m_field.m2m_reverse_field_name()
+        links = through.objects.using(self.using).filter(**{f'{source}_id__in': ids})
+        if child_fields is None:
+            return links.values_list(f'{source}_id', f'{target}_id')
+        return links.values_list(f'{source}_id', *(f'{target}__{child.source}' for _, child in child_fields))
+
+    def group_links(self, links, child_fields):
+        with timed('serialize'):
+            return self.group_rows(links, child_fields)
+
+    def group_rows(self, links, child_fields):
+        grouped = {}
+        if child_fields is None:
+            for owner_id, related_id in links:
+                grouped.setdefault(owner_id, []).append(related_id)
+            return grouped
+        for owner_id, *values in links:
+            grouped.setdefault(owner_id, []).append({
+                name: None if value is None else child.to_representation(value)
+                for (name, child), value in zip(child_fields, values)
+            })
+        return grouped
+
+
+class ReadModelSerializer(ValuesSerializer):
+    """
+    Представление книг из проекции BookReadModel. Страница выбирается по основной
+    таблице (только ключ и колонки сортировки), данные читаются одним запросом по
+    первичному ключу проекции. Книги, у которых строки проекции ещё нет, строятся
+    обычным ValuesSerializer, поэтому ответ совпадает с ним в любом случае.
+    """
+
+    def __init__(self, serializer, extra_columns=(), using='default'):
+        super().__init__(serializer, extra_columns, using)
+        # Без связей все колонки есть в основной таблице, проекция не нужна
+        self.use_read_model = bool(self.relations)
+        self.read_columns = [
+            name if name in self.relations else field.source
+            for name, field in self.fields if field.source != self.pk_name
+        ]
+
+    def values(self, queryset):
+        if not self.use_read_model:
+            return super().values(queryset)
+        return queryset.values(*self.key_columns)
+
+    def to_representation(self, rows):
+        if not self.use_read_model:
+            return super().to_representation(rows)
+        ids = [row[self.pk_name] for row in rows]
+        stored = {row['book_id']: row for row in self.stored_rows(ids)}
+        missing = [pk for pk in ids if pk not in stored]
+        fallback = {}
+        if missing:
+            missing_rows = list(self.missing_rows(missing))
+            fallback = dict(zip((row[self.pk_name] for row in missing_rows), super().to_representation(missing_rows)))
+        return self.merge(ids, stored, fallback)
+
+    async def ato_representation(self, rows):
+        if not self.use_read_model:
+            return await super().ato_representation(rows)
+        ids = [row[self.pk_name] for row in rows]
+        stored = {row['book_id']: row async for row in self.stored_rows(ids)}
+        missing = [pk for pk in ids if pk not in stored]
+        fallback = {}
+        if missing:
+            missing_rows = [row async for row in self.missing_rows(missing)]
+            fallback = dict(zip(
+                (row[self.pk_name] for row in missing_rows), await super().ato_representation(missing_rows)
+            ))
+        return self.merge(ids, stored, fallback)
+
+    def stored_rows(self, ids):
+        return BookReadModel.objects.using(self.using).filter(book_id__in=ids).values('book_id', *self.read_columns)
+
+    def missing_rows(self, ids):
+        return super().values(self.model.objects.using(self.using).filter(pk__in=ids))
+
+    def merge(self, ids, stored, fallback):
+        with timed('serialize'):
+            return [self.from_read_model(stored[pk]) if pk in stored else fallback[pk] for pk in ids]
+
+    def from_read_model(self, row):
+        item = {}
+        for name, field in self.fields:
+            if name in self.relations:
+                m2m_field, child_fields = self.relations[name]
+                if child_fields is None:
+                    # В JSON id хранятся строками, а PrimaryKeyRelatedField отдаёт значения ключа
+                    to_pk = m2m_field.related_model._meta.pk.to_python
+                    item[name] = [to_pk(related['id']) for related in row[name]]
+                else:
+                    item[name] = [{child_name: related[child_name] for child_name, _ in child_fields} for related in row[name]]
+            else:
+                value = row['book_id' if field.source == self.pk_name else field.source]
+                item[name] = None if value is None else field.to_representation(value)
+        return item
+
+
+class BookBulkItemSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(allow_null=True, required=False)
+    publish_date = serializers.DateField()
+    authors = serializers.ListField(child=serializers.CharField(max_length=255), required=False)
+    genres = serializers.ListField(child=serializers.CharField(max_length=255), required=False)
@@ -1,22 +1,76 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import UniqueConstraint
+from django.utils import timezone
+
+from .cache import BOOK_LIST, BOOK_SEARCH, book_tag, invalidate
+from .counters import change_book_counts, count_links
 from .models import Book, Author, Genre
+from .read_model import refresh_read_models
+from .search import update_search_vectors
+
+BULK_BATCH_SIZE = 1000
+# Повторы пакетной записи, если параллельный запрос успел создать книгу с тем же названием
+BULK_WRITE_ATTEMPTS = 3
+# SQLSTATE unique_violation
+UNIQUE_VIOLATION = '23505'
+
+
+def is_unique_constraint_of(constraint_name, model, field_name):
+    table, column = model._meta.db_table, model._meta.get_field(field_name).column
+    # unique=True: "books_author_name_key" при создании таблицы, "books_author_name_<хэш>_uniq" при AlterField
+    if constraint_name == f'{table}_{column}_key':
+        return True
+    if constraint_name.startswith(f'{table}_{column}_') and constraint_name.endswith('_uniq'):
+        return True
+    return any(
+        isinstance(constraint, UniqueConstraint) and constraint.name == constraint_name
+        and tuple(constraint.fields) == (field_name,)
+        for constraint in model._meta.constraints
+    )
+
+
+def is_unique_violation(exc, model, field_name):
+    # PostgreSQL: по SQLSTATE и имени ограничения — текст ошибки переводится согласно lc_messages.
+    # SQLite кодов не сообщает: "UNIQUE constraint failed: books_author.name"
+    cause = exc.__cause__
+    if getattr(cause, 'pgcode', None) is not None:
+        constraint_name = getattr(getattr(cause, 'diag', None), 'constraint_name', None) or ''
+        return cause.pgcode == UNIQUE_VIOLATION and is_unique_constraint_of(constraint_name, model, field_name)
+    column = model._meta.get_field(field_name).column
+    message = str(exc)
+    return 'unique constraint' in message.lower() and f'{model._meta.db_table}.{column}' in message
+
+
+def save_unique(save, model, field_name, error):
+    # Уникальность проверяет сама БД одним запросом: конфликт откатывается до точки
+    # сохранения и превращается в прежний ответ об ошибке
+    try:
+        with transaction.atomic():
+            return save(), None
+    except IntegrityError as exc:
+        if not is_unique_violation(exc, model, field_name):
+            raise
+        return None, error
 
 
 class AuthorService:
+    # Поля, которые можно задать через API; book_count ведут только books.counters
+    fields = ['name', 'date_of_birth', 'date_of_death']
+
     @classmethod
     def create_or_update_author(cls, instance, author_data):
-        name = author_data.get('name')
+        def save():
+            if instance:
+                for field in cls.fields:
+                    if field in author_data:
+                        setattr(instance, field, author_data[field])
+                instance.save()
+                return instance
+            return Author.objects.create(**{field: author_data[field] for field in cls.fields if field in author_data})
 
-        if Author.objects.filter(name=name).exclude(id=instance.id if instance else None).exists():
-            return None, {'detail': 'Автор с таким именем уже существует'}
-        if instance:
-            for field in ['name', 'date_of_birth', 'date_of_death']:
-                if field in author_data:
-                    setattr(instance, field, author_data[field])
-            instance.save()
-            author = instance
-        else:
-            author = Author.objects.create(**author_data)
-        return author, None
+        return save_unique(save, Author, 'name', {'detail': 'Автор с таким именем уже существует'})
 
 
 class GenreService:
@@ -24,65 +78,218 @@ class GenreService:
     def create_or_update_genre(cls, instance, genre_data):
         name = genre_data.get('name')
 
-        if Genre.objects.filter(name=name).exclude(id=instance.id if instance else None).exists():
-            return None, {'detail': 'Жанр с таким именем уже существует.'}
+        def save():
+            if instance:
+                instance.name = name
+                instance.save()
+                return instance
+            return Genre.objects.create(name=name)
 
-        if instance:
-            instance.name = name
-            instance.save()
-            genre = instance
-        else:
-            genre = Genre.objects.create(**genre_data)
-        return genre, None
+        return save_unique(save, Genre, 'name', {'detail': 'Жанр с таким именем уже существует.'})
 
 
 class BookService:
     @classmethod
     def create_or_update_book(cls, instance, book_data, authors, genres):
-        title = book_data.get('title')
-        if title:
-            if Book.objects.filter(title=title).exclude(id=instance.id if instance else None).exists():
-                return None, {'detail': 'Книга с таким названием уже существует'}
-
-        if instance:
-            for field in ['title', 'description', 'publish_date']:
-                if field in book_data:
-                    setattr(instance, field, book_data[field])
-            instance.save()
-            book = instance
-        else:
-            # Если это создание новой книги
-            book = Book.objects.create(**book_data)
-
-        author_errors, genre_errors = cls.validate_authors_and_genres(authors, genres)
-        if author_errors or genre_errors:
-            return None, {'detail': 'Ошибка валидации.', 'errors': {'authors': author_errors, 'genres': genre_errors}}
+        """
+        Создаёт или обновляет книгу в одной транзакции. Авторы и жанры проверяются
+        до записи. Переданные наборы (None — не менять) сравниваются с текущими
+        связями, и в промежуточные таблицы пишется только разница: не больше одного
+        DELETE и одного INSERT на связь независимо от числа авторов и жанров.
+        """
+        author_ids, genre_ids, error = cls.resolve_authors_and_genres(authors or [], genres or [])
+        if error:
+            return None, error
+
+        def save():
+            if instance:
+                for field in ['title', 'description', 'publish_date']:
+                    if field in book_data:
+                        setattr(instance, field, book_data[field])
+                book = instance
+            else:
+                # Если это создание новой книги
+                book = Book(**book_data)
+            # Поисковый вектор и проекцию обновляет не post_save, а сервис — один раз после записи связей
+            book._projection_deferred = True
+            try:
+                book.save(force_insert=instance is None)
+            finally:
+                book._projection_deferred = False
+            return book
 
-        for author_name in authors:
-            if author_name not in author_errors:
-                author = Author.objects.get(name=author_name)
-                book.authors.add(author)
+        with transaction.atomic():
+            book, error = save_unique(save, Book, 'title', {'detail': 'Книга с таким названием уже существует'})
+            if error:
+                return None, error
 
-        for genre_name in genres:
-            if genre_name not in author_errors:
-                genre = Genre.objects.get(name=genre_name)
-                book.genres.add(genre)
+            if instance and (authors is not None or genres is not None):
+                # Текущие связи читаются под блокировкой строки книги: параллельная запись
+                # той же книги ждёт коммита, и разница (а с ней счётчики) считается от
+                # зафиксированного набора, без двойного -1 и повторной вставки связи
+                Book.objects.select_for_update().only('pk').get(pk=book.pk)
+            if authors is not None:
+                cls.write_links_delta(book, 'authors', {author_ids[name] for name in authors}, instance is None)
+            if genres is not None:
+                cls.write_links_delta(book, 'genres', {genre_ids[name] for name in genres}, instance is None)
+
+            # Связи пишутся мимо m2m_changed, поэтому поисковый вектор и проекция обновляются
+            # здесь, один раз на операцию; кэш сбросил post_save (и сбросит ещё раз после коммита)
+            update_search_vectors([book.pk])
+            refresh_read_models([book.pk])
 
         return book, None
 
     @classmethod
-    def validate_authors_and_genres(cls, authors, genres):
-        author_errors = []
-        genre_errors = []
+    def write_links_delta(cls, book, relation, related_ids, created):
+        m2m_field = Book._meta.get_field(relation)
+        through = m2m_field.remote_field.through
+        source, target = f'{m2m_field.m2m_field_name()}_id', f'{m2m_field.m2m_reverse_field_name()}_id'
+        links = through.objects.filter(**{source: book.pk})
+
+        current = set() if created else set(links.values_list(target, flat=True))
+        stale, new = current - related_ids, related_ids - current
+        if stale:
+            links.filter(**{f'{target}__in': stale}).delete()
+        if new:
+            through.objects.bulk_create([through(**{source: book.pk, target: related_id}) for related_id in new])
+        change_book_counts(m2m_field.related_model, {**dict.fromkeys(stale, -1), **dict.fromkeys(new, 1)})
+        if stale or new:
+            # Как и add()/remove(), сбрасываем подгруженные prefetch_related связи
+            getattr(book, '_prefetched_objects_cache', {}).pop(relation, None)
+
+    @classmethod
+    def bulk_create_or_update_books(cls, books_data):
+        """
+        Создаёт или обновляет (по названию) пачку книг. Имена авторов и жанров разрешаются
+        одним запросом на модель, связи пишутся пакетной вставкой в промежуточные таблицы.
+        Возвращает список результатов и список ошибок по индексам элементов.
+        """
+        errors = {}
+        seen_titles = set()
+        for index, item in enumerate(books_data):
+            if item['title'] in seen_titles:
+                errors[index] = {'detail': 'Книга с таким названием уже встречается в запросе'}
+            seen_titles.add(item['title'])
+
+        author_ids = dict(Author.objects.filter(
+            name__in={name for item in books_data for name in item.get('authors', [])}
+        ).values_list('name', 'id'))
+        genre_ids = dict(Genre.objects.filter(
+            name__in={name for item in books_data for name in item.get('genres', [])}
+        ).values_list('name', 'id'))
+
+        for index, item in enumerate(books_data):
+            if index in errors:
+                continue
+            author_errors = [
+                f"Автор с именем '{name}' не найден в базе данных."
+                for name in item.get('authors', []) if name not in author_ids
+            ]
+            genre_errors = [
+                f"Жанр с именем '{name}' не найден в базе данных."
+                for name in item.get('genres', []) if name not in genre_ids
+            ]
+            if author_errors or genre_errors:
+                errors[index] = {
+                    'detail': 'Ошибка валидации.', 'errors': {'authors': author_errors, 'genres': genre_errors}
+                }
+
+        valid = [(index, item) for index, item in enumerate(books_data) if index not in errors]
+        for attempt in range(BULK_WRITE_ATTEMPTS):
+            try:
+                results = cls.write_books(valid, author_ids, genre_ids)
+                break
+            except IntegrityError as exc:
+                # Книгу с тем же названием создал параллельный запрос: перечитываем
+                # существующие книги, и на следующей попытке она будет обновлена
+                if attempt == BULK_WRITE_ATTEMPTS - 1 or not is_unique_violation(exc, Book, 'title'):
+                    raise
+
+        return results, [{'index': index, **error} for index, error in sorted(errors.items())]
+
+    @classmethod
+    def existing_books(cls, titles):
+        return Book.objects.filter(title__in=titles).only(
+            'id', 'title', 'description', 'publish_date'
+        ).in_bulk(field_name='title')
 
-        author_exists = Author.objects.filter(name__in=authors).values_list('name', flat=True)
-        for author_name in authors:
-            if author_name not in author_exists:
-                author_errors.append(f"Автор с именем '{author_name}' не найден в базе данных.")
+    @classmethod
+    def write_books(cls, valid, author_ids, genre_ids):
+        existing = cls.existing_books([item['title'] for _, item in valid])
 
-        genre_exists = Genre.objects.filter(name__in=genres).values_list('name', flat=True)
-        for genre_name in genres:
-            if genre_name not in genre_exists:
-                genre_errors.append(f"Жанр с именем '{genre_name}' не найден в базе данных.")
+        results = []
+        books = []
+        to_create, to_update = [], []
+        for index, item in valid:
+            book = existing.get(item['title'])
+            created = book is None
+            if created:
+                book = Book(**{field: item[field] for field in ['title', 'description', 'publish_date'] if field in item})
+                to_create.append(book)
+            else:
+                for field in ['description', 'publish_date']:
+                    if field in item:
+                        setattr(book, field, item[field])
+                # bulk_update не заполняет auto_now поля
+                book.updated_at = timezone.now()
+                to_update.append(book)
+            books.append(book)
+            results.append({'index': index, 'id': book.id, 'created': created})
 
-        return author_errors, genre_errors
+        with transaction.atomic():
+            Book.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+            Book.objects.bulk_update(
+                to_update, ['description', 'publish_date', 'updated_at'], batch_size=BULK_BATCH_SIZE
+            )
+
+            # Набор авторов или жанров обновлённой книги заменяется целиком, только если
+            # он передан в элементе: отсутствующий ключ, как и в create_or_update_book, — не менять
+            updated_ids = {book.id for book in to_update}
+            for relation, model, ids in (('authors', Author, author_ids), ('genres', Genre, genre_ids)):
+                through = getattr(Book, relation).through
+                target = f'{model._meta.model_name}_id'
+                deltas = Counter()
+                replaced_ids = [
+                    book.id for book, (_, item) in zip(books, valid) if book.id in updated_ids and relation in item
+                ]
+                if replaced_ids:
+                    old_links = through.objects.filter(book_id__in=replaced_ids)
+                    deltas = count_links(old_links.values_list('book_id', target))
+                    old_links.delete()
+                new_links = [
+                    through(**{'book_id': book.id, target: ids[name]})
+                    for book, (_, item) in zip(books, valid) for name in set(item.get(relation, []))
+                ]
+                through.objects.bulk_create(new_links, batch_size=BULK_BATCH_SIZE)
+                # Счётчики меняются на разницу: у автора, оставшегося при книге, приращение нулевое
+                deltas.subtract(getattr(link, target) for link in new_links)
+                change_book_counts(model, {pk: -delta for pk, delta in deltas.items()})
+
+            # bulk_create и bulk_update не отправляют сигналы, поэтому поисковый вектор
+            # и проекция для чтения обновляются явно
+            update_search_vectors([book.id for book in books])
+            refresh_read_models([book.id for book in books])
+            invalidate(BOOK_LIST, BOOK_SEARCH, *(book_tag(book.id) for book in to_update))
+
+        return results
+
+    @classmethod
+    def resolve_authors_and_genres(cls, authors, genres):
+        # Один запрос на модель: имена -> id и ошибки для ненайденных
+        author_ids = dict(Author.objects.filter(name__in=authors).values_list('name', 'id')) if authors else {}
+        genre_ids = dict(Genre.objects.filter(name__in=genres).values_list('name', 'id')) if genres else {}
+
+        author_errors = [
+            f"Автор с именем '{author_name}' не найден в базе данных." for author_name in authors
+            if author_name not in author_ids
+        ]
+        genre_errors = [
+            f"Жанр с именем '{genre_name}' не найден в базе данных." for genre_name in genres
+            if genre_name not in genre_ids
+        ]
+        if author_errors or genre_errors:
+            return None, None, {
+                'detail': 'Ошибка валидации.', 'errors': {'authors': author_errors, 'genres': genre_errors}
+            }
+        return author_ids, genre_ids, None
@@ -0,0 +1,133 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import AUTHOR_LIST, BOOK_LIST, BOOK_SEARCH, GENRE_LIST, author_tag, book_tag, genre_tag, invalidate
+from .counters import change_book_counts
+from .models import Author, Book, Genre
+from .read_model import refresh_read_models
+from .search import update_search_vectors
+
+
+def link_columns(sender, reverse):
+    # (колонка instance, колонка связанных объектов) в промежуточной таблице
+    related = 'author_id' if sender is Book.authors.through else 'genre_id'
+    return (related, 'book_id') if reverse else ('book_id', related)
+
+
+def linked_ids(sender, instance, reverse, pk_set=None):
+    # remove() передаёт в pk_set и несвязанные объекты, счётчики меняются только по существующим связям
+    source, target = link_columns(sender, reverse)
+    links = sender.objects.filter(**{source: instance.pk})
+    if pk_set is not None:
+        links = links.filter(**{f'{target}__in': pk_set})
+    return list(links.values_list(target, flat=True))
+
+
+def change_link_counts(sender, instance, reverse, ids, sign, using):
+    model = Author if sender is Book.authors.through else Genre
+    if reverse:
+        change_book_counts(model, {instance.pk: sign * len(ids)}, using)
+    else:
+        change_book_counts(model, dict.fromkeys(ids, sign), using)
+
+
+def linked_book_ids(instance):
+    if isinstance(instance, Author):
+        links = Book.authors.through.objects.filter(author_id=instance.pk)
+    else:
+        links = Book.genres.through.objects.filter(genre_id=instance.pk)
+    return list(links.values_list('book_id', flat=True))
+
+
+def touch_books(book_ids, using):
+    # Изменение связей меняет представление книги, поэтому сдвигаем её updated_at
+    if book_ids:
+        Book.objects.using(using).filter(pk__in=book_ids).update(updated_at=timezone.now())
+
+
+def books_changed(book_ids, using):
+    update_search_vectors(book_ids, using=using)
+    refresh_read_models(book_ids, using=using)
+
+
+def name_tags(instance):
+    if isinstance(instance, Author):
+        return AUTHOR_LIST, author_tag(instance.pk)
+    return GENRE_LIST, genre_tag(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, using, **kwargs):
+    # BookService.create_or_update_book обновит проекцию сам после записи связей
+    if not getattr(instance, '_projection_deferred', False):
+        books_changed([instance.pk], using)
+    invalidate(BOOK_LIST, BOOK_SEARCH, book_tag(instance.pk))
+
+
+@receiver(pre_delete, sender=Book)
+def book_deleting(sender, instance, using, **kwargs):
+    # Связи удаляются каскадом без m2m_changed, поэтому запоминаем их до удаления
+    instance._linked_author_ids = linked_ids(Book.authors.through, instance, False)
+    instance._linked_genre_ids = linked_ids(Book.genres.through, instance, False)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, using, **kwargs):
+    change_book_counts(Author, dict.fromkeys(getattr(instance, '_linked_author_ids', []), -1), using)
+    change_book_counts(Genre, dict.fromkeys(getattr(instance, '_linked_genre_ids', []), -1), using)
+    invalidate(BOOK_LIST, BOOK_SEARCH, book_tag(instance.pk))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def name_saved(sender, instance, created, using, **kwargs):
+    list_tag, tag = name_tags(instance)
+    if created:
+        invalidate(list_tag)
+        return
+    # Тег автора или жанра есть у всех закэшированных страниц книг, где он выводится
+    invalidate(list_tag, tag, BOOK_SEARCH)
+    # Имя и даты автора или жанра хранятся в проекциях связанных книг
+    books_changed(linked_book_ids(instance), using)
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+def name_deleting(sender, instance, using, **kwargs):
+    # После каскадного удаления связей узнать затронутые книги уже нельзя
+    instance._linked_book_ids = linked_book_ids(instance)
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def name_deleted(sender, instance, using, **kwargs):
+    book_ids = getattr(instance, '_linked_book_ids', [])
+    invalidate(*name_tags(instance), BOOK_SEARCH, *map(book_tag, book_ids))
+    touch_books(book_ids, using)
+    books_changed(book_ids, using)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.genres.through)
+def book_relations_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action == 'pre_remove':
+        instance._unlinked_ids = linked_ids(sender, instance, reverse, pk_set)
+        return
+    if action == 'pre_clear':
+        instance._unlinked_ids = linked_ids(sender, instance, reverse)
+        return
+    if action == 'post_add':
+        changed_ids = pk_set
+        change_link_counts(sender, instance, reverse, changed_ids, 1, using)
+    elif action in ('post_remove', 'post_clear'):
+        changed_ids = getattr(instance, '_unlinked_ids', [])
+        change_link_counts(sender, instance, reverse, changed_ids, -1, using)
+    else:
+        return
+
+    # Для прямой связи changed_ids — авторы или жанры, для обратной — книги
+    book_ids = changed_ids if reverse else [instance.pk]
+    touch_books(book_ids, using)
+    books_changed(book_ids, using)
+    invalidate(BOOK_SEARCH, *map(book_tag, book_ids))
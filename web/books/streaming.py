@@ -0,0 +1,36 @@
+import itertools
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+# Размер порции для серверного курсора и prefetch_related при выгрузке
+STREAM_CHUNK_SIZE = 500
+
+
+def dumps(row):
+    return json.dumps(row, cls=JSONEncoder, ensure_ascii=False)
+
+
+def represent_in_chunks(values_serializer, rows, chunk_size=STREAM_CHUNK_SIZE):
+    # Строки values() представляются порциями: один запрос за связями на порцию
+    while chunk := list(itertools.islice(rows, chunk_size)):
+        yield from values_serializer.to_representation(chunk)
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield dumps(row) + '\n'
+
+
+def stream_json_array(rows):
+    separator = '['
+    for row in rows:
+        yield separator + dumps(row)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+STREAM_FORMATS = {
+    'ndjson': ('application/x-ndjson', stream_ndjson),
+    'json': ('application/json', stream_json_array),
+}
@@ -1,9 +1,54 @@
-from django.test import TestCase
+import csv
+import datetime
+import decimal
+import gzip
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.apps import apps as global_apps
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError, IntegrityError, connection, connections
+from django.db.models import QuerySet
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
 from rest_framework.test import APIClient
 
-from .models import Author, Genre, Book
+from library.boot import first_request, memory_usage
+from library.db.base import DatabaseWrapper as PooledDatabaseWrapper
+from library.db.pool import ConnectionPool, PoolTimeout, get_pool
+from library.instrumentation import install_query_recorder, request_histograms
+from library.metrics import worker_metrics
+from library.schema import build_schema, schema_store
+
+from .admin import EXACT_COUNT_LIMIT, EstimatedCountPaginator
+from .benchmark import compare_results
+from .cache import BOOK_LIST, invalidate, response_cache
+from .counters import reconcile_book_counts
+from .filters import BookFilter
+from .ids import UUID1_EPOCH_OFFSET, uuid1_to_uuid7, uuid7
+from .models import Author, Genre, Book, BookReadModel
+from .renderers import FastJSONRenderer
+from .search import SEARCH_CONFIG, PostgresSearchBackend, SimpleSearchBackend, get_search_backend
+from .serializers import AuthorSerializer, BookSerializer
+from .services import AuthorService, BookService, is_unique_violation
 
 
 class AuthorTests(TestCase):
@@ -158,3 +203,1669 @@ class BookTests(TestCase):
 
         with self.assertRaises(Book.DoesNotExist):
             Book.objects.get(id=book.id)
+
+
+class BookQueryCountTests(TestCase):
+    # Список: COUNT + ключи страницы + проекция BookReadModel, независимо от размера страницы
+    MAX_LIST_QUERIES = 3
+
+    def setUp(self):
+        self.client = APIClient()
+        self.authors = [Author.objects.create(name=f'Author {i}') for i in range(3)]
+        self.genres = [Genre.objects.create(name=f'Genre {i}') for i in range(3)]
+
+    def create_books(self, count, prefix='Book'):
+        for i in range(count):
+            book = Book.objects.create(title=f'{prefix} {i}', publish_date='2023-10-19')
+            book.authors.add(*self.authors)
+            book.genres.add(*self.genres)
+
+    def test_list_query_count_does_not_grow_with_page(self):
+        url = reverse('book-list')
+        self.create_books(2)
+        with self.assertNumQueries(self.MAX_LIST_QUERIES):
+            self.client.get(url)
+
+        self.create_books(10, prefix='Another Book')
+        with self.assertNumQueries(self.MAX_LIST_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(response.data['results'][0]['authors']), 3)
+
+    def test_title_search_query_count(self):
+        self.create_books(15)
+        with self.assertNumQueries(self.MAX_LIST_QUERIES):
+            response = self.client.get(reverse('book-list'), {'title': 'Book'})
+        self.assertEqual(response.data['count'], 15)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_stream_query_count(self):
+        self.create_books(25)
+        response = self.client.get(reverse('book-list'), {'stream': 'ndjson'})
+        with self.assertNumQueries(self.MAX_LIST_QUERIES - 1):
+            lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 25)
+
+    def test_detail_query_count(self):
+        self.create_books(1)
+        book = Book.objects.get()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('book-detail', args=[book.id]))
+        self.assertEqual(len(response.data['genres']), 3)
+
+
+class BookSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('book-list')
+        tolkien = Author.objects.create(name='John Tolkien')
+        fantasy = Genre.objects.create(name='Fantasy')
+        self.hobbit = Book.objects.create(
+            title='The Hobbit', description='There and back again', publish_date='1937-09-21',
+        )
+        self.hobbit.authors.add(tolkien)
+        self.hobbit.genres.add(fantasy)
+        other = Book.objects.create(title='Dune', description='Desert planet', publish_date='1965-08-01')
+        other.authors.add(Author.objects.create(name='Frank Herbert'))
+        other.genres.add(Genre.objects.create(name='Science Fiction'))
+
+    def search(self, query):
+        response = self.client.get(self.url, {'title': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+
+    def test_backend_matches_database(self):
+        expected = PostgresSearchBackend if connection.vendor == 'postgresql' else SimpleSearchBackend
+        self.assertIsInstance(get_search_backend(), expected)
+
+    def test_search_by_title(self):
+        self.assertEqual(self.search('hobbit'), ['The Hobbit'])
+
+    def test_search_by_author_and_genre(self):
+        self.assertEqual(self.search('Tolkien'), ['The Hobbit'])
+        self.assertEqual(self.search('science'), ['Dune'])
+
+    def test_search_by_description(self):
+        self.assertEqual(self.search('desert'), ['Dune'])
+
+    def test_search_param_alias(self):
+        response = self.client.get(self.url, {'search': 'hobbit'})
+        self.assertEqual([book['title'] for book in response.data['results']], ['The Hobbit'])
+        self.assertNotIn('search_vector', response.data['results'][0])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Триграммы и tsvector доступны только в PostgreSQL')
+    def test_search_is_typo_tolerant(self):
+        self.assertEqual(self.search('Tolkein'), ['The Hobbit'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Триграммы и tsvector доступны только в PostgreSQL')
+    def test_search_vector_follows_author_rename(self):
+        author = Author.objects.get(name='John Tolkien')
+        author.name = 'Ronald Reuel'
+        author.save()
+        query = SearchQuery('reuel', config=SEARCH_CONFIG)
+        self.assertEqual(list(Book.objects.filter(search_vector=query)), [self.hobbit])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Планы запросов проверяются только на PostgreSQL')
+    def test_search_uses_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = PostgresSearchBackend().search(Book.objects.all(), 'Tolkien').explain()
+        self.assertNotIn('Seq Scan', plan)
+        for index in ('books_book_title_trgm', 'books_book_search_vector_gin',
+                      'books_author_name_trgm', 'books_genre_name_trgm'):
+            self.assertIn(index, plan)
+
+
+class BookStreamTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('book-list')
+        author = Author.objects.create(name='Author Name')
+        for i in range(12):
+            book = Book.objects.create(title=f'Book {i}', publish_date='2023-10-19')
+            book.authors.add(author)
+
+    def test_stream_ndjson(self):
+        response = self.client.get(self.url, {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[0]['authors'][0]['name'], 'Author Name')
+
+    def test_stream_json_array_with_search(self):
+        response = self.client.get(self.url, {'stream': 'json', 'title': 'Book 1'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(sorted(row['title'] for row in rows), ['Book 1', 'Book 10', 'Book 11'])
+
+    def test_stream_empty_json_array(self):
+        response = self.client.get(self.url, {'stream': 'json', 'title': 'missing'})
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+    def test_stream_unknown_format(self):
+        response = self.client.get(self.url, {'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url, params):
+        items, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            items.extend(response.data['results'])
+            pages += 1
+            if not response.data['next']:
+                return items, pages, response
+            response = self.client.get(response.data['next'])
+
+    def test_authors_cursor_walk(self):
+        for i in range(25):
+            Author.objects.create(name=f'Author {i:02}')
+        items, pages, last = self.walk(reverse('author-list'), {'pagination': 'cursor'})
+        self.assertEqual([item['name'] for item in items], [f'Author {i:02}' for i in range(25)])
+        self.assertEqual(pages, 3)
+
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual(
+            [item['name'] for item in previous.data['results']], [f'Author {i:02}' for i in range(10, 20)]
+        )
+
+    def test_genre_page_has_no_count_query(self):
+        for i in range(15):
+            Genre.objects.create(name=f'Genre {i:02}')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('genre-list'), {'pagination': 'cursor'})
+        with self.assertNumQueries(1):
+            self.client.get(response.data['next'])
+
+    def test_books_with_same_publish_date(self):
+        for i in range(23):
+            Book.objects.create(title=f'Book {i}', publish_date='2023-10-19' if i % 2 else '2020-01-01')
+        items, pages, _ = self.walk(reverse('book-list'), {'pagination': 'cursor'})
+        expected = list(Book.objects.order_by('publish_date', 'id').values_list('title', flat=True))
+        self.assertEqual([item['title'] for item in items], expected)
+        self.assertEqual(pages, 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('book-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_by_default(self):
+        Author.objects.create(name='Author')
+        response = self.client.get(reverse('author-list'))
+        self.assertEqual(response.data['count'], 1)
+
+
+class BookBulkTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('book-bulk')
+        self.authors = [Author.objects.create(name=f'Author {i}') for i in range(5)]
+        self.genres = [Genre.objects.create(name=f'Genre {i}') for i in range(3)]
+
+    def payload(self, count, prefix='Book'):
+        return [
+            {
+                'title': f'{prefix} {i}',
+                'description': 'Bulk description',
+                'publish_date': '2023-10-19',
+                'authors': [self.authors[i % 5].name, self.authors[(i + 1) % 5].name],
+                'genres': [self.genres[i % 3].name],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        response = self.client.post(self.url, self.payload(50), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 50)
+        self.assertEqual(response.data['errors'], [])
+        self.assertEqual(Book.objects.count(), 50)
+        self.assertEqual(Book.authors.through.objects.count(), 100)
+        book = Book.objects.get(title='Book 7')
+        self.assertEqual(sorted(book.authors.values_list('name', flat=True)), ['Author 2', 'Author 3'])
+
+    def test_bulk_query_count_does_not_grow_with_batch(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, self.payload(5), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, self.payload(50, prefix='Other'), format='json')
+        self.assertEqual(len(small), len(large))
+        # Включая по одному UPDATE счётчиков книг у авторов и жанров
+        self.assertLessEqual(len(large), 14)
+
+    def test_bulk_update_replaces_links(self):
+        self.client.post(self.url, self.payload(3), format='json')
+        items = self.payload(3)
+        items[0]['authors'] = [self.authors[4].name]
+        items[0]['description'] = 'Updated'
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.data['updated'], 3)
+        book = Book.objects.get(title='Book 0')
+        self.assertEqual(book.description, 'Updated')
+        self.assertEqual(list(book.authors.values_list('name', flat=True)), ['Author 4'])
+
+    def test_bulk_update_keeps_links_without_keys(self):
+        self.client.post(self.url, self.payload(3), format='json')
+        items = [{'title': 'Book 1', 'description': 'Updated', 'publish_date': '2024-01-01'}]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.data['updated'], 1)
+        book = Book.objects.get(title='Book 1')
+        self.assertEqual(book.description, 'Updated')
+        self.assertEqual(sorted(book.authors.values_list('name', flat=True)), ['Author 1', 'Author 2'])
+        self.assertEqual(list(book.genres.values_list('name', flat=True)), ['Genre 1'])
+        self.assertEqual(Author.objects.get(name='Author 1').book_count, 2)
+
+    def test_bulk_per_item_errors(self):
+        items = self.payload(4)
+        items[1]['authors'] = ['Unknown Author']
+        items[2] = {'title': 'No date'}
+        items[3]['title'] = items[0]['title']
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2, 3])
+        self.assertIn('publish_date', response.data['errors'][1]['errors'])
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_bulk_rejects_non_list(self):
+        response = self.client.post(self.url, {'title': 'Book'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportCatalogTests(TestCase):
+    def write_file(self, suffix, content):
+        handle = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8')
+        with handle:
+            handle.write(content)
+        self.addCleanup(os.remove, handle.name)
+        return handle.name
+
+    def test_import_csv(self):
+        Author.objects.create(name='Existing Author')
+        path = self.write_file('.csv', (
+            'title,description,publish_date,authors,genres\n'
+            'Book 1,First,2001-01-01,Existing Author|New Author,Fantasy\n'
+            'Book 2,,2002-02-02,New Author,Fantasy|Horror\n'
+            'Book 3,Bad date,not-a-date,New Author,Fantasy\n'
+            'Book 1,Duplicate,2001-01-01,New Author,Fantasy\n'
+        ))
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_catalog', path, batch_size=2, stdout=out, stderr=err)
+
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Author.objects.count(), 2)
+        self.assertEqual(sorted(Genre.objects.values_list('name', flat=True)), ['Fantasy', 'Horror'])
+        book = Book.objects.get(title='Book 1')
+        self.assertEqual(sorted(book.authors.values_list('name', flat=True)), ['Existing Author', 'New Author'])
+        self.assertIsNone(Book.objects.get(title='Book 2').description)
+        self.assertIn('Строка 4', err.getvalue())
+        self.assertIn('импортировано 2, пропущено 1', out.getvalue())
+
+    def test_import_jsonl(self):
+        rows = [
+            {'title': f'Book {i}', 'publish_date': '2020-05-05', 'authors': ['Author'], 'genres': ['Genre']}
+            for i in range(5)
+        ]
+        path = self.write_file('.jsonl', '\n'.join(json.dumps(row) for row in rows) + '\n{broken\n')
+        err = io.StringIO()
+        call_command('import_catalog', path, stdout=io.StringIO(), stderr=err)
+
+        self.assertEqual(Book.objects.count(), 5)
+        self.assertEqual(Book.genres.through.objects.count(), 5)
+        self.assertIn('Строка 6', err.getvalue())
+
+    def test_import_skips_rows_with_bad_names(self):
+        rows = [
+            {'title': 'Good', 'publish_date': '2020-05-05', 'authors': ['Author'], 'genres': ['Genre']},
+            {'title': 'Long author', 'publish_date': '2020-05-05', 'authors': ['A' * 256], 'genres': []},
+            {'title': 'Not a list', 'publish_date': '2020-05-05', 'authors': 'Author', 'genres': []},
+            {'title': 'Not a string', 'publish_date': '2020-05-05', 'authors': [], 'genres': [42]},
+        ]
+        path = self.write_file('.jsonl', '\n'.join(json.dumps(row) for row in rows))
+        err = io.StringIO()
+        call_command('import_catalog', path, stdout=io.StringIO(), stderr=err)
+
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['Good'])
+        self.assertEqual(list(Author.objects.values_list('name', flat=True)), ['Author'])
+        for line_number in (2, 3, 4):
+            self.assertIn(f'Строка {line_number}', err.getvalue())
+
+    def test_unknown_format(self):
+        path = self.write_file('.txt', '')
+        with self.assertRaises(CommandError):
+            call_command('import_catalog', path)
+
+
+class ExportCatalogTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('book-export')
+        authors = [Author.objects.create(name=name) for name in ('Bravo', 'Alpha')]
+        genre = Genre.objects.create(name='Fantasy')
+        for i in range(3):
+            book = Book.objects.create(title=f'Book {i}', description='Text', publish_date=f'200{i}-01-01')
+            book.authors.add(*authors)
+            book.genres.add(genre)
+
+    def read(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_books_without_projection_are_exported(self):
+        BookReadModel.objects.filter(book__title='Book 1').delete()
+        rows = [json.loads(line) for line in self.read(self.client.get(self.url)).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Book 0', 'Book 1', 'Book 2'])
+        self.assertEqual(rows[1]['authors'], ['Alpha', 'Bravo'])
+        self.assertEqual(rows[1]['genres'], ['Fantasy'])
+
+    def test_long_requests_lift_harakiri(self):
+        # Под uWSGI каждый запрос ставит себе лимит, а выгрузки и пакетная запись его снимают
+        with mock.patch('library.harakiri.uwsgi') as uwsgi:
+            self.read(self.client.get(self.url))
+            self.assertEqual(uwsgi.set_user_harakiri.call_args_list, [mock.call(30), mock.call(0)])
+
+            uwsgi.reset_mock()
+            self.read(self.client.get(reverse('book-list'), {'stream': 'ndjson'}))
+            self.assertEqual(uwsgi.set_user_harakiri.call_args_list, [mock.call(30), mock.call(0)])
+
+            uwsgi.reset_mock()
+            self.client.get(reverse('book-list'))
+            self.assertEqual(uwsgi.set_user_harakiri.call_args_list, [mock.call(30)])
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Book 0', 'Book 1', 'Book 2'])
+        self.assertEqual(rows[0]['authors'], ['Alpha', 'Bravo'])
+        self.assertEqual(rows[0]['genres'], ['Fantasy'])
+
+    def test_export_csv_gzip(self):
+        response = self.client.get(self.url, {'output': 'csv', 'compress': 'gzip'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('catalog.csv.gz', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(self.read(response)).decode('utf-8'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[2]['authors'], 'Alpha|Bravo')
+
+    def test_export_query_count(self):
+        # Имена авторов и жанров берутся из проекции, без обращения к связям
+        with self.assertNumQueries(1):
+            self.read(self.client.get(self.url))
+
+    def test_unknown_output(self):
+        response = self.client.get(self.url, {'output': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_round_trips_through_import(self):
+        path = os.path.join(tempfile.mkdtemp(), 'catalog.csv.gz')
+        self.addCleanup(os.remove, path)
+        call_command('export_catalog', path, format='csv', stderr=io.StringIO())
+        Book.objects.all().delete()
+        call_command('import_catalog', path, stdout=io.StringIO())
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(Book.objects.get(title='Book 1').authors.count(), 2)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.author = Author.objects.create(name='Cached Author')
+        self.other_author = Author.objects.create(name='Other Author')
+        self.genre = Genre.objects.create(name='Cached Genre')
+        self.book = Book.objects.create(title='Cached Book', publish_date='2023-10-19')
+        self.book.authors.add(self.author)
+        self.book.genres.add(self.genre)
+        self.other_book = Book.objects.create(title='Other Book', publish_date='2023-10-20')
+        self.other_book.authors.add(self.other_author)
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_detail_hit_skips_database(self):
+        url = reverse('author-detail', args=[self.author.id])
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['name'], 'Cached Author')
+
+    def test_author_rename_evicts_only_its_books(self):
+        book_url = reverse('book-detail', args=[self.book.id])
+        other_url = reverse('book-detail', args=[self.other_book.id])
+        list_url = reverse('book-list')
+        for url in (book_url, other_url, list_url):
+            self.get(url)
+
+        self.client.put(reverse('author-detail', args=[self.author.id]), {'name': 'Renamed'}, format='json')
+
+        response = self.get(book_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['authors'][0]['name'], 'Renamed')
+        self.assertEqual(self.get(list_url)['X-Cache'], 'MISS')
+        self.assertEqual(self.get(other_url)['X-Cache'], 'HIT')
+
+    def test_book_creation_evicts_list(self):
+        url = reverse('book-list')
+        self.assertEqual(self.get(url).data['count'], 2)
+        self.client.post(url, {
+            'title': 'New Book', 'publish_date': '2023-10-21',
+            'authors': [self.author.name], 'genres': [self.genre.name],
+        }, format='json')
+        self.assertEqual(self.get(url).data['count'], 3)
+
+    def test_genre_rename_evicts_search(self):
+        url = reverse('book-list')
+        self.assertEqual(self.get(url, {'title': 'Mystery'}).data['count'], 0)
+        self.client.put(reverse('genre-detail', args=[self.genre.id]), {'name': 'Mystery'}, format='json')
+        self.assertEqual(self.get(url, {'title': 'Mystery'}).data['count'], 1)
+
+    def test_query_params_are_part_of_key(self):
+        url = reverse('author-list')
+        self.get(url)
+        self.assertEqual(self.get(url, {'pagination': 'cursor'})['X-Cache'], 'MISS')
+
+    def test_write_during_render_is_not_cached(self):
+        url = reverse('book-list')
+        store = response_cache.set
+
+        def set_after_write(*args):
+            # Запись завершилась после чтения данных, но до сохранения ответа
+            invalidate(BOOK_LIST)
+            store(*args)
+
+        with mock.patch.object(response_cache, 'set', side_effect=set_after_write):
+            self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.get(url)['X-Cache'], 'HIT')
+
+    def test_delete_evicts_detail(self):
+        url = reverse('genre-detail', args=[self.genre.id])
+        self.get(url)
+        self.client.delete(url)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.author = Author.objects.create(name='Author Name')
+        self.genre = Genre.objects.create(name='Genre Name')
+        self.book = Book.objects.create(title='Test Book', publish_date='2023-10-19')
+        self.book.authors.add(self.author)
+        self.book.genres.add(self.genre)
+        self.url = reverse('book-detail', args=[self.book.id])
+
+    def test_etag_not_modified_without_queries(self):
+        response = self.client.get(self.url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_related_author(self):
+        etag = self.client.get(self.url)['ETag']
+        self.author.name = 'Renamed'
+        self.author.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_m2m_change_bumps_book(self):
+        updated_at = Book.objects.get(pk=self.book.pk).updated_at
+        self.book.genres.add(Genre.objects.create(name='Another Genre'))
+        self.assertGreater(Book.objects.get(pk=self.book.pk).updated_at, updated_at)
+
+    def test_author_delete_bumps_book(self):
+        updated_at = Book.objects.get(pk=self.book.pk).updated_at
+        self.author.delete()
+        self.assertGreater(Book.objects.get(pk=self.book.pk).updated_at, updated_at)
+
+    def test_book_count_change_bumps_author(self):
+        url = reverse('author-detail', args=[self.author.id])
+        # Секундная точность Last-Modified: первый ответ закэширован минутой раньше
+        with mock.patch('books.cache.timezone.now', return_value=timezone.now() - datetime.timedelta(minutes=1)):
+            last_modified = self.client.get(url)['Last-Modified']
+        Book.objects.create(title='Second Book', publish_date='2023-10-20').authors.add(self.author)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['book_count'], 2)
+
+    def test_list_etag(self):
+        url = reverse('genre-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        Genre.objects.create(name='New Genre')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('book-list')
+        self.author = Author.objects.create(name='Author Name', date_of_birth='1900-01-01')
+        self.genre = Genre.objects.create(name='Genre Name')
+        for i in range(3):
+            book = Book.objects.create(title=f'Book {i}', description='Long text', publish_date='2023-10-19')
+            book.authors.add(self.author)
+            book.genres.add(self.genre)
+
+    def test_fields_limits_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'title'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title'})
+        # COUNT и выборка книг, без запросов за авторами и жанрами и без описания
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('description', queries[1]['sql'])
+
+    def test_nested_subfields(self):
+        response = self.client.get(self.url, {'fields': 'title,authors.name'})
+        book = response.data['results'][0]
+        self.assertEqual(set(book), {'id', 'title', 'authors'})
+        self.assertEqual(book['authors'], [{'id': str(self.author.id), 'name': 'Author Name'}])
+
+    def test_expand_without_nesting(self):
+        response = self.client.get(self.url, {'expand': 'genres'})
+        book = response.data['results'][0]
+        self.assertEqual(book['authors'], [self.author.id])
+        self.assertEqual(book['genres'][0]['name'], 'Genre Name')
+        self.assertIn('description', book)
+
+    def test_detail_fields(self):
+        book = Book.objects.first()
+        response = self.client.get(reverse('book-detail', args=[book.id]), {'fields': 'publish_date', 'expand': ''})
+        self.assertEqual(response.data, {'id': str(book.id), 'publish_date': '2023-10-19'})
+
+    def test_unknown_fields_are_ignored(self):
+        response = self.client.get(self.url, {'fields': 'title,authors.unknown,missing'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['authors'], [{'id': str(self.author.id)}])
+
+    def test_cursor_pagination_with_fields(self):
+        for i in range(10):
+            Book.objects.create(title=f'More {i}', publish_date='2023-10-20')
+        # Ключ курсора берётся из загруженных полей, без дозагрузки отложенных
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'fields': 'title', 'pagination': 'cursor'})
+        self.assertIsNotNone(response.data['next'])
+
+
+class FastRenderingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        authors = [
+            Author.objects.create(name='Лев Толстой', date_of_birth='1828-09-09', date_of_death='1910-11-20'),
+            Author.objects.create(name='Author Two'),
+        ]
+        genre = Genre.objects.create(name='Роман')
+        for i in range(12):
+            book = Book.objects.create(title=f'Книга {i}', description=None if i % 2 else 'Текст', publish_date='2001-02-03')
+            book.authors.add(authors[i % 2])
+            book.genres.add(genre)
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'text': 'Юникод     "quotes"', 'uuid': uuid.uuid1(), 'date': datetime.date(2020, 1, 2),
+            'datetime': datetime.datetime(2020, 1, 2, 3, 4, 5, 678901, tzinfo=datetime.timezone.utc),
+            'decimal': decimal.Decimal('1.50'), 'nested': [{'a': None, 'b': True, 'c': 1.5}], 1: 'int key',
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parser_reads_json_body(self):
+        response = self.client.post(
+            reverse('genre-list'), data='{"name": "Жанр"}'.encode(), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], 'Жанр')
+
+    def assertListMatchesModelSerializer(self, url_name, serializer_class, queryset, params=None):
+        response = self.client.get(reverse(url_name), params)
+        request = Request(response.wsgi_request)
+        expected = serializer_class(queryset[:10], many=True, context={'request': request}).data
+        self.assertEqual(
+            JSONRenderer().render(response.data['results']), JSONRenderer().render(expected)
+        )
+        self.assertEqual(response.content, FastJSONRenderer().render(response.data))
+
+    def test_book_list_matches_model_serializer(self):
+        queryset = BookSerializer.setup_eager_loading(Book.objects.order_by('publish_date', 'id'))
+        self.assertListMatchesModelSerializer('book-list', BookSerializer, queryset)
+
+    def test_sparse_book_list_matches_model_serializer(self):
+        queryset = Book.objects.order_by('publish_date', 'id')
+        self.assertListMatchesModelSerializer(
+            'book-list', BookSerializer, queryset, {'fields': 'title,authors.name,genres', 'expand': 'authors'}
+        )
+
+    def test_author_list_matches_model_serializer(self):
+        self.assertListMatchesModelSerializer('author-list', AuthorSerializer, Author.objects.order_by('name'))
+
+    def test_book_list_does_not_instantiate_models(self):
+        with mock.patch.object(Book, 'from_db', side_effect=AssertionError('model instantiated')):
+            response = self.client.get(reverse('book-list'))
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class BookReadModelTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.authors = [Author.objects.create(name=f'Author {i}') for i in range(3)]
+        self.genres = [Genre.objects.create(name=f'Genre {i}') for i in range(2)]
+        self.book = Book.objects.create(title='Book', description='Text', publish_date='2023-10-19')
+        self.book.authors.add(*self.authors[:2])
+        self.book.genres.add(self.genres[0])
+
+    def assertReadModelsConsistent(self):
+        # Каждая книга имеет строку проекции, совпадающую с выводом BookSerializer
+        self.assertEqual(BookReadModel.objects.count(), Book.objects.count())
+        for book in Book.objects.all():
+            expected = BookSerializer(book).data
+            read_model = BookReadModel.objects.get(book=book)
+            self.assertEqual(read_model.title, expected['title'])
+            self.assertEqual(read_model.description, expected['description'])
+            self.assertEqual(read_model.updated_at, book.updated_at)
+            for name in ('authors', 'genres'):
+                self.assertEqual(
+                    sorted(getattr(read_model, name), key=lambda item: item['id']),
+                    sorted(expected[name], key=lambda item: item['id']),
+                )
+
+    def test_api_create_and_update(self):
+        response = self.client.post(reverse('book-list'), {
+            'title': 'New Book', 'publish_date': '2023-10-19',
+            'authors': [self.authors[2].name], 'genres': [self.genres[1].name],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.put(reverse('book-detail', args=[self.book.id]), {
+            'title': 'Renamed Book', 'publish_date': '2023-10-20',
+            'authors': [self.authors[2].name], 'genres': [self.genres[1].name],
+        }, format='json')
+        self.assertReadModelsConsistent()
+        self.assertEqual(BookReadModel.objects.get(book=self.book).title, 'Renamed Book')
+
+    def test_author_rename_and_genre_delete(self):
+        self.authors[0].name = 'Renamed Author'
+        self.authors[0].save()
+        self.genres[0].delete()
+        self.assertReadModelsConsistent()
+        self.assertEqual(BookReadModel.objects.get(book=self.book).genres, [])
+
+    def test_reverse_relation_changes(self):
+        self.authors[2].authors.add(self.book)
+        self.authors[0].authors.clear()
+        self.assertReadModelsConsistent()
+
+    def test_bulk_and_import(self):
+        self.client.post(reverse('book-bulk'), [
+            {'title': 'Book', 'publish_date': '2023-10-19', 'authors': [self.authors[2].name]},
+            {'title': 'Bulk Book', 'publish_date': '2023-10-19', 'genres': [self.genres[1].name]},
+        ], format='json')
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        with handle:
+            handle.write('title,description,publish_date,authors,genres\nImported,,2001-01-01,Author 1,Genre 1\n')
+        self.addCleanup(os.remove, handle.name)
+        call_command('import_catalog', handle.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertReadModelsConsistent()
+
+    def test_book_delete_cascades(self):
+        self.book.delete()
+        self.assertFalse(BookReadModel.objects.exists())
+
+    def test_list_falls_back_without_projection_and_rebuild_restores_it(self):
+        BookReadModel.objects.all().delete()
+        expected = BookSerializer(self.book).data
+        response = self.client.get(reverse('book-list'))
+        self.assertEqual(response.data['results'][0]['authors'], expected['authors'])
+
+        out = io.StringIO()
+        call_command('rebuild_read_models', stdout=out)
+        self.assertIn('Перестроено 1', out.getvalue())
+        self.assertReadModelsConsistent()
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('book-list')).data['results'][0]['authors'], expected['authors'])
+
+
+class BookFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('book-list')
+        self.tolkien = Author.objects.create(name='Tolkien')
+        self.lewis = Author.objects.create(name='Lewis')
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.essay = Genre.objects.create(name='Essay')
+        for i, (author, genre) in enumerate([
+            (self.tolkien, self.fantasy), (self.tolkien, self.essay),
+            (self.lewis, self.fantasy), (self.lewis, self.essay),
+        ] * 3):
+            book = Book.objects.create(title=f'Book {i:02}', publish_date=datetime.date(1995 + i * 2, 1, 1))
+            book.authors.add(author)
+            book.genres.add(genre)
+
+    def titles(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [book['title'] for book in response.data['results']]
+
+    def count(self, params):
+        return self.client.get(self.url, params).data['count']
+
+    def test_author_by_name_and_id(self):
+        by_name = self.titles({'author': 'Tolkien'})
+        self.assertEqual(len(by_name), 6)
+        self.assertEqual(self.titles({'author': str(self.tolkien.id)}), by_name)
+        self.assertEqual(self.count({'author': f'Tolkien,{self.lewis.id}'}), 12)
+
+    def test_filters_are_combined(self):
+        titles = self.titles({
+            'author': 'Tolkien', 'genre': 'Fantasy', 'publish_date_from': '2000-01-01', 'publish_date_to': '2011-12-31',
+        })
+        self.assertEqual(titles, ['Book 04', 'Book 08'])
+
+    def test_ordering(self):
+        self.assertEqual(self.titles({'ordering': '-publish_date'})[:2], ['Book 11', 'Book 10'])
+        self.assertEqual(self.titles({'ordering': '-title', 'genre': 'Essay'})[:2], ['Book 11', 'Book 09'])
+
+    def test_invalid_params(self):
+        for params in ({'ordering': 'description'}, {'publish_date_from': '2000-13-01'}, {'publish_date_to': 'soon'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('detail', response.data)
+
+    def test_descending_cursor_walk(self):
+        items, response = [], self.client.get(self.url, {'pagination': 'cursor', 'ordering': '-publish_date'})
+        while True:
+            items.extend(book['title'] for book in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(items, [f'Book {i:02}' for i in range(11, -1, -1)])
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEqual([book['title'] for book in previous.data['results']], items[:10])
+
+    def test_filtered_list_cache_follows_relations(self):
+        self.assertEqual(self.count({'author': 'Lewis', 'genre': 'Fantasy'}), 3)
+        Book.objects.get(title='Book 00').authors.add(self.lewis)
+        self.assertEqual(self.count({'author': 'Lewis', 'genre': 'Fantasy'}), 4)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Планы запросов проверяются только на PostgreSQL')
+    def test_filters_use_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        selection = BookFilter(authors=['Tolkien'], genres=[str(self.fantasy.id)], date_from=datetime.date(2000, 1, 1))
+        plan = selection.filter(Book.objects.order_by(*selection.order_by)).values('id').explain()
+        self.assertNotIn('Seq Scan', plan)
+        self.assertIn('books_book_authors_author_book_idx', plan)
+        self.assertIn('books_book_genres_genre_book_idx', plan)
+
+
+class BookFacetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('book-facets')
+        self.authors = [Author.objects.create(name=f'Author {i}') for i in range(3)]
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.essay = Genre.objects.create(name='Essay')
+        for i, year in enumerate([1985, 1991, 1999, 2004, 2005]):
+            book = Book.objects.create(title=f'Book {i}', publish_date=datetime.date(year, 1, 1))
+            book.authors.add(*self.authors[:1 + i % 3])
+            book.genres.add(self.fantasy if year < 2000 else self.essay)
+
+    def test_counts(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(
+            [(genre['name'], genre['count']) for genre in response.data['genres']], [('Fantasy', 3), ('Essay', 2)]
+        )
+        self.assertEqual(response.data['decades'], [
+            {'decade': 1980, 'count': 1}, {'decade': 1990, 'count': 2}, {'decade': 2000, 'count': 2},
+        ])
+        self.assertEqual(len(response.data['years']), 5)
+        self.assertEqual(response.data['authors'][0], {'id': self.authors[0].id, 'name': 'Author 0', 'count': 5})
+
+    def test_counts_follow_filters_and_search(self):
+        response = self.client.get(self.url, {'genre': 'Essay', 'top_authors': 1, 'facets': 'authors,decades'})
+        self.assertEqual(set(response.data), {'count', 'authors', 'decades'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['authors'], [{'id': self.authors[0].id, 'name': 'Author 0', 'count': 2}])
+        self.assertEqual(self.client.get(self.url, {'search': 'Book 4'}).data['count'], 1)
+
+    def test_one_query_per_facet(self):
+        with self.assertNumQueries(5):
+            self.client.get(self.url, {'author': 'Author 1', 'publish_date_from': '1990-01-01'})
+
+    def test_cached_per_filter_signature(self):
+        first = self.client.get(self.url, {'author': 'Author 1,Author 2', 'ordering': 'title'})
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {'author': 'Author 2,Author 1'})
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+        Book.objects.get(title='Book 0').authors.add(self.authors[1])
+        third = self.client.get(self.url, {'author': 'Author 1,Author 2'})
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.data['count'], first.data['count'] + 1)
+
+    def test_invalid_params(self):
+        for params in ({'facets': 'genres,publishers'}, {'top_authors': 0}, {'publish_date_to': 'never'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UUID7Tests(TestCase):
+    def test_new_ids_are_time_ordered(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertTrue(all(value.version == 7 for value in ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        author = Author.objects.create(name='Author')
+        self.assertEqual(author.id.version, 7)
+        self.assertEqual(self.client.get(reverse('author-detail', args=[author.id])).status_code, status.HTTP_200_OK)
+
+    def test_uuid1_conversion_keeps_time_and_order(self):
+        old = [uuid.uuid1() for _ in range(1000)]
+        new = [uuid1_to_uuid7(value) for value in old]
+        self.assertEqual(len(set(new)), len(old))
+        self.assertEqual(new, sorted(new))
+        unix_ms = (old[0].time - UUID1_EPOCH_OFFSET) // 10_000
+        self.assertEqual(new[0].int >> 80, unix_ms)
+        self.assertEqual(uuid1_to_uuid7(new[0]), new[0])
+
+    def test_data_migration_remaps_keys_and_relations(self):
+        migration = importlib.import_module('books.migrations.0007_uuid7_ids')
+        author = Author.objects.create(id=uuid.uuid1(), name='Author')
+        genre = Genre.objects.create(id=uuid.uuid1(), name='Genre')
+        book = Book.objects.create(id=uuid.uuid1(), title='Book', publish_date='2023-10-19')
+        book.authors.add(author)
+        book.genres.add(genre)
+
+        migration.remap_ids(global_apps, mock.Mock(connection=connection))
+
+        book = Book.objects.get(title='Book')
+        self.assertEqual(book.id.version, 7)
+        self.assertEqual(book.authors.get().id, uuid1_to_uuid7(author.id))
+        self.assertEqual(book.genres.get().id, uuid1_to_uuid7(genre.id))
+        read_model = BookReadModel.objects.get(book=book)
+        self.assertEqual(read_model.authors[0]['id'], str(uuid1_to_uuid7(author.id)))
+        self.assertFalse(Author.objects.filter(id=author.id).exists())
+
+    def test_data_migration_separates_colliding_ids(self):
+        migration = importlib.import_module('books.migrations.0007_uuid7_ids')
+        # Одно время и узел, clock_seq различается только старшими двумя битами
+        first = uuid.uuid1(node=0x0123456789AB, clock_seq=0x0155)
+        second = uuid.UUID(fields=first.fields[:3] + (first.clock_seq_hi_variant | 0x20,) + first.fields[4:])
+        self.assertNotEqual(first, second)
+        self.assertEqual(uuid1_to_uuid7(first), uuid1_to_uuid7(second))
+        authors = [Author.objects.create(id=first, name='First'), Author.objects.create(id=second, name='Second')]
+        book = Book.objects.create(id=uuid.uuid1(), title='Book', publish_date='2023-10-19')
+        book.authors.add(*authors)
+
+        migration.remap_ids(global_apps, mock.Mock(connection=connection))
+
+        new_ids = set(Author.objects.values_list('id', flat=True))
+        self.assertEqual(len(new_ids), 2)
+        self.assertEqual({value.int >> 64 for value in new_ids}, {uuid1_to_uuid7(first).int >> 64})
+        book = Book.objects.get(title='Book')
+        self.assertEqual(set(book.authors.values_list('id', flat=True)), new_ids)
+        read_model = BookReadModel.objects.get(book=book)
+        self.assertEqual({uuid.UUID(author['id']) for author in read_model.authors}, new_ids)
+
+
+class UniquenessTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.author = Author.objects.create(name='Author')
+        self.genre = Genre.objects.create(name='Genre')
+
+    def assertNoExistsQueries(self, queries):
+        self.assertFalse([query['sql'] for query in queries if 'SELECT 1 AS "a"' in query['sql']])
+
+    def test_conflicts_map_to_error_responses(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('author-list'), {'name': 'Author'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': 'Автор с таким именем уже существует'})
+        self.assertNoExistsQueries(queries)
+
+        response = self.client.post(reverse('genre-list'), {'name': 'Genre'}, format='json')
+        self.assertEqual(response.data, {'detail': 'Жанр с таким именем уже существует.'})
+
+        Book.objects.create(title='Book', publish_date='2023-10-19')
+        response = self.client.post(reverse('book-list'), {
+            'title': 'Book', 'publish_date': '2023-10-19', 'authors': ['Author'], 'genres': ['Genre'],
+        }, format='json')
+        self.assertEqual(response.data, {'detail': 'Книга с таким названием уже существует'})
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_rename_conflict_keeps_row(self):
+        other = Author.objects.create(name='Other')
+        response = self.client.put(reverse('author-detail', args=[other.id]), {'name': 'Author'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        other.refresh_from_db()
+        self.assertEqual(other.name, 'Other')
+        # Точка сохранения откатилась, транзакция пригодна для дальнейшей работы
+        self.assertEqual(Author.objects.count(), 2)
+
+    def test_other_integrity_errors_are_raised(self):
+        with self.assertRaises(IntegrityError):
+            AuthorService.create_or_update_author(None, {'name': None})
+
+    def test_postgres_violation_detected_by_code_not_message(self):
+        def postgres_error(pgcode, constraint_name):
+            # Текст ошибки на языке сервера (lc_messages = 'ru_RU')
+            exc = IntegrityError('повторяющееся значение ключа нарушает ограничение уникальности')
+            exc.__cause__ = Exception()
+            exc.__cause__.pgcode = pgcode
+            exc.__cause__.diag = mock.Mock(constraint_name=constraint_name)
+            return exc
+
+        self.assertTrue(is_unique_violation(postgres_error('23505', 'books_author_name_key'), Author, 'name'))
+        self.assertTrue(is_unique_violation(postgres_error('23505', 'books_book_title_3c0e4f1a_uniq'), Book, 'title'))
+        self.assertFalse(is_unique_violation(postgres_error('23505', 'books_genre_name_key'), Author, 'name'))
+        self.assertFalse(is_unique_violation(postgres_error('23502', 'books_author_name_key'), Author, 'name'))
+
+    def test_bulk_retries_after_concurrent_create(self):
+        Book.objects.create(title='Raced', publish_date='2023-10-19')
+        original = BookService.existing_books.__func__
+        calls = []
+
+        def stale_then_fresh(cls, titles):
+            # Первое чтение «не видит» книгу, созданную параллельным запросом
+            calls.append(titles)
+            return {} if len(calls) == 1 else original(cls, titles)
+
+        with mock.patch.object(BookService, 'existing_books', classmethod(stale_then_fresh)):
+            results, errors = BookService.bulk_create_or_update_books([
+                {'title': 'Raced', 'description': 'Updated', 'publish_date': datetime.date(2023, 10, 19)},
+            ])
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(results[0]['created'])
+        self.assertEqual(Book.objects.get(title='Raced').description, 'Updated')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Параллельные писатели требуют PostgreSQL')
+class ConcurrentUniquenessTests(TransactionTestCase):
+    WRITERS = 8
+
+    def run_parallel(self, func):
+        barrier = threading.Barrier(self.WRITERS)
+        results, failures = [], []
+
+        def worker():
+            try:
+                barrier.wait()
+                results.append(func())
+            except Exception as exc:
+                failures.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+        return results
+
+    def test_parallel_author_creates(self):
+        for round_number in range(5):
+            results = self.run_parallel(
+                lambda: AuthorService.create_or_update_author(None, {'name': f'Racer {round_number}'})
+            )
+            self.assertEqual(sum(error is None for _, error in results), 1)
+            self.assertTrue(all(
+                error == {'detail': 'Автор с таким именем уже существует'} for _, error in results if error
+            ))
+        self.assertEqual(Author.objects.count(), 5)
+
+    def test_parallel_bulk_upserts(self):
+        items = [{'title': f'Bulk {i}', 'publish_date': datetime.date(2023, 10, 19)} for i in range(20)]
+        results = self.run_parallel(lambda: BookService.bulk_create_or_update_books(items))
+        self.assertTrue(all(errors == [] for _, errors in results))
+        self.assertEqual(Book.objects.count(), 20)
+
+
+class BookServiceUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.authors = Author.objects.bulk_create([Author(name=f'Author {i:03}') for i in range(300)])
+        self.genres = Genre.objects.bulk_create([Genre(name=f'Genre {i}') for i in range(3)])
+        self.book = Book.objects.create(title='Anthology', publish_date='2023-10-19')
+        self.book.authors.add(*self.authors[:2])
+        self.book.genres.add(self.genres[0])
+        self.url = reverse('book-detail', args=[self.book.id])
+
+    def put(self, **data):
+        return self.client.put(self.url, {'title': 'Anthology', 'publish_date': '2023-10-19', **data}, format='json')
+
+    def test_validation_happens_before_write(self):
+        response = self.put(title='Changed', authors=['Missing author'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors']['authors'], ["Автор с именем 'Missing author' не найден в базе данных."])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, 'Anthology')
+
+    def test_only_delta_is_written(self):
+        kept_link = Book.authors.through.objects.get(book=self.book, author=self.authors[1])
+        response = self.put(authors=['Author 001', 'Author 002'], genres=[])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(author['name'] for author in response.data['authors']), ['Author 001', 'Author 002'])
+        self.assertEqual(response.data['genres'], [])
+        self.assertTrue(Book.authors.through.objects.filter(pk=kept_link.pk).exists())
+        self.assertEqual(len(BookReadModel.objects.get(book=self.book).authors), 2)
+
+    def test_omitted_relations_are_kept(self):
+        self.client.put(self.url, {'title': 'Anthology', 'publish_date': '2023-10-20'}, format='json')
+        self.assertEqual(self.book.authors.count(), 2)
+        self.assertEqual(self.book.genres.count(), 1)
+
+    def test_query_count_does_not_depend_on_cardinality(self):
+        data = {'title': 'Anthology', 'publish_date': '2023-10-19'}
+        with CaptureQueriesContext(connection) as small:
+            BookService.create_or_update_book(self.book, data, [a.name for a in self.authors[2:5]], ['Genre 1'])
+        with CaptureQueriesContext(connection) as large:
+            BookService.create_or_update_book(self.book, data, [a.name for a in self.authors[5:300]], ['Genre 2'])
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(self.book.authors.count(), 295)
+
+    def test_links_are_read_under_book_lock(self):
+        data = {'title': 'Anthology', 'publish_date': '2023-10-19'}
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True,
+                               side_effect=QuerySet.select_for_update) as lock:
+            BookService.create_or_update_book(self.book, data, ['Author 001'], None)
+            self.assertEqual(lock.call_args.args[0].model, Book)
+            lock.reset_mock()
+            # Новой книги никто другой ещё не видит — блокировать нечего
+            BookService.create_or_update_book(None, {**data, 'title': 'New Book'}, ['Author 001'], None)
+            lock.assert_not_called()
+        self.assertEqual(Author.objects.get(name='Author 001').book_count, 2)
+
+    def test_projection_is_refreshed_once(self):
+        data = {'title': 'New Book', 'publish_date': '2023-10-19'}
+        with mock.patch('books.signals.refresh_read_models') as by_signal, \
+                mock.patch('books.services.refresh_read_models') as by_service:
+            book, error = BookService.create_or_update_book(None, data, ['Author 001'], ['Genre 1'])
+            BookService.create_or_update_book(book, {**data, 'description': 'Updated'}, None, None)
+        self.assertIsNone(error)
+        by_signal.assert_not_called()
+        self.assertEqual(by_service.call_count, 2)
+        book.description = 'Saved directly'
+        book.save()
+        self.assertEqual(BookReadModel.objects.get(book=book).description, 'Saved directly')
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.async_client = AsyncClient()
+        tolkien = Author.objects.create(name='Tolkien')
+        lewis = Author.objects.create(name='Lewis')
+        fantasy = Genre.objects.create(name='Fantasy')
+        for i in range(12):
+            book = Book.objects.create(title=f'Book {i:02}', publish_date=datetime.date(2000 + i, 1, 1))
+            book.authors.add(tolkien if i % 2 else lewis)
+            book.genres.add(fantasy)
+        self.book = book
+
+    async def get_both(self, name, params=None, args=None):
+        sync_response = await sync_to_async(self.client.get)(reverse(name, args=args), params)
+        async_response = await self.async_client.get(reverse(f'async-{name}', args=args), params or {})
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        return sync_response, async_response
+
+    async def test_lists_match_sync_views(self):
+        for name, params in [
+            ('book-list', None), ('book-list', {'page': 2}), ('book-list', {'fields': 'title,authors.name'}),
+            ('book-list', {'expand': 'genres', 'author': 'Tolkien', 'ordering': '-title'}),
+            ('book-list', {'search': 'Book 1'}), ('author-list', None), ('genre-list', None),
+        ]:
+            sync_response, async_response = await self.get_both(name, params)
+            data, expected = json.loads(async_response.content), json.loads(sync_response.content)
+            self.assertEqual(data['count'], expected['count'])
+            self.assertEqual(data['results'], expected['results'])
+
+    async def test_detail_matches_sync_view(self):
+        sync_response, async_response = await self.get_both('book-detail', args=[self.book.id])
+        self.assertEqual(async_response.content, sync_response.content)
+
+    async def test_page_links_point_to_async_endpoint(self):
+        data = json.loads((await self.async_client.get(reverse('async-book-list'))).content)
+        self.assertEqual(data['next'], 'http://testserver/api/v1/async/books/?page=2')
+        self.assertIsNone(data['previous'])
+
+    async def test_errors(self):
+        response = await self.async_client.get(reverse('async-book-detail', args=[uuid7()]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn('detail', json.loads(response.content))
+        for params in ({'page': 5}, {'ordering': 'description'}):
+            _, async_response = await self.get_both('book-list', params)
+            self.assertIn('detail', json.loads(async_response.content))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(TestCase):
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(size=2, timeout=1)
+        first = pool.acquire(FakeConnection, lambda conn: True)
+        pool.release(first, lambda conn: True)
+        self.assertIs(pool.acquire(FakeConnection, lambda conn: True), first)
+        stats = pool.stats()
+        self.assertEqual((stats['checkouts'], stats['created'], stats['in_use'], stats['utilization']), (2, 1, 1, 0.5))
+
+    def test_broken_connections_are_replaced(self):
+        pool = ConnectionPool(size=1, timeout=1)
+        broken = pool.acquire(FakeConnection, lambda conn: True)
+        pool.release(broken, lambda conn: True)
+        replacement = pool.acquire(FakeConnection, lambda conn: False)
+        self.assertIsNot(replacement, broken)
+        self.assertTrue(broken.closed)
+        pool.release(replacement, lambda conn: False)
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['discarded'], 2)
+
+    def test_waits_for_free_connection(self):
+        pool = ConnectionPool(size=1, timeout=0.05)
+        connection = pool.acquire(FakeConnection, lambda conn: True)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection, lambda conn: True)
+
+        timer = threading.Timer(0.02, pool.release, [connection, lambda conn: True])
+        timer.start()
+        self.assertIs(pool.acquire(FakeConnection, lambda conn: True), connection)
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['waits']), (1, 1))
+        self.assertGreater(stats['wait_time_max'], 0)
+
+    def test_pool_per_process(self):
+        pool = get_pool('pool-test', 1, 1)
+        self.assertIs(get_pool('pool-test', 1, 1), pool)
+        with mock.patch('library.db.pool.os.getpid', return_value=-1):
+            self.assertIsNot(get_pool('pool-test', 1, 1), pool)
+
+    def test_reset_rolls_back_open_transaction(self):
+        connection = mock.Mock(closed=0, autocommit=False)
+        connection.info.transaction_status = 3  # TRANSACTION_STATUS_INERROR
+        self.assertTrue(PooledDatabaseWrapper.reset_pooled(connection))
+        connection.rollback.assert_called_once()
+        self.assertTrue(connection.autocommit)
+        self.assertFalse(PooledDatabaseWrapper.reset_pooled(mock.Mock(closed=1)))
+
+    def test_wsgi_pool_fits_all_threads(self):
+        environ = {'SERVER_MODE': 'wsgi', 'DB_POOL': 'on', 'DB_POOL_SIZE': '1', 'WEB_THREADS': '2'}
+        with mock.patch.dict(os.environ, environ):
+            project_settings = importlib.reload(importlib.import_module('library.settings'))
+        self.addCleanup(importlib.reload, project_settings)
+        pool_settings = project_settings.DATABASES['default']['POOL']
+        self.assertEqual(pool_settings['SIZE'], 2)
+
+        # Оба потока воркера uWSGI держат соединение одновременно
+        pool = ConnectionPool(size=pool_settings['SIZE'], timeout=0.05)
+        checked_out = []
+        threads = [
+            threading.Thread(target=lambda: checked_out.append(pool.acquire(FakeConnection, lambda conn: True)))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(checked_out), 2)
+        self.assertEqual(pool.stats()['timeouts'], 0)
+
+    def test_metrics_endpoint(self):
+        get_pool('metrics-test', 3, 1)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        response = client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['db_pool']['metrics-test']['size'], 3)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        request_histograms.reset()
+        self.client = APIClient()
+        author = Author.objects.create(name='Tolkien')
+        for i in range(3):
+            Book.objects.create(title=f'Book {i}', publish_date='2000-01-01').authors.add(author)
+
+    def server_timing(self, response):
+        return dict(
+            (part.split(';')[0], part.split(';', 1)[1]) for part in response['Server-Timing'].split(', ')
+        )
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('book-list'))
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'app', 'db', 'serialize', 'render'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+
+    def metrics(self):
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_histograms_by_view(self):
+        self.client.get(reverse('book-list'))
+        self.client.get(reverse('book-list'), {'page': 2})
+        stats = self.metrics()['requests']['GET book-list']
+        self.assertEqual(stats['latency_ms']['count'], 2)
+        self.assertEqual(stats['queries']['buckets']['+Inf'], 2)
+        self.assertEqual(stats['over_query_budget'], 0)
+
+    def test_metrics_are_not_public(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_sum_all_workers(self):
+        self.client.get(reverse('book-list'))
+        # Снимок другого воркера того же хоста, опубликованный в общий кэш
+        other = {
+            'db_pool': {'default': {'size': 2, 'in_use': 1, 'idle': 1, 'checkouts': 5, 'created': 2, 'discarded': 0,
+                                    'waits': 1, 'timeouts': 0, 'wait_time_total': 0.5, 'wait_time_max': 0.5,
+                                    'peak_in_use': 2}},
+            'requests': {'GET book-list': request_histograms.snapshot()['GET book-list']},
+        }
+        worker_metrics.publish(force=True)
+        cache.set(worker_metrics.worker_key(-1), other)
+        cache.set(worker_metrics.workers_key(), {**cache.get(worker_metrics.workers_key()), -1: time.time()})
+
+        data = self.metrics()
+        self.assertEqual(data['workers'], [-1, os.getpid()])
+        self.assertEqual(data['requests']['GET book-list']['latency_ms']['count'], 2)
+        self.assertEqual(data['db_pool']['default']['wait_time_max'], 0.5)
+
+    @override_settings(QUERY_BUDGET=1)
+    def test_query_budget(self):
+        with self.assertLogs('library.performance', 'WARNING') as logs:
+            self.client.get(reverse('book-list'))
+        self.assertIn('/api/v1/books/', logs.output[0])
+        self.assertEqual(request_histograms.snapshot()['GET book-list']['over_query_budget'], 1)
+
+    def test_writes_fit_their_budgets(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('book-list')))
+        data = {'title': 'New Book', 'publish_date': '2023-10-19', 'authors': ['Tolkien'], 'genres': []}
+        with mock.patch('library.instrumentation.logger') as log:
+            url = reverse('book-detail', args=[self.client.post(reverse('book-list'), data, format='json').data['id']])
+            self.client.put(url, {**data, 'title': 'Renamed'}, format='json')
+            self.client.delete(url)
+        log.warning.assert_not_called()
+        self.assertEqual(request_histograms.snapshot()['POST book-list']['over_query_budget'], 0)
+
+        with override_settings(QUERY_BUDGETS={'GET book-list': 1}), self.assertLogs('library.performance', 'WARNING'):
+            APIClient().get(reverse('book-list'))
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    async def test_async_views_are_measured(self):
+        # AsyncClient шлёт request_started не в том потоке, где работает ORM, в отличие от ASGIHandler
+        await sync_to_async(install_query_recorder)(None)
+        response = await AsyncClient().get(reverse('async-book-list'))
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+
+class BookCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.authors = Author.objects.bulk_create([Author(name=f'Author {i}') for i in range(3)])
+        self.genres = Genre.objects.bulk_create([Genre(name=f'Genre {i}') for i in range(2)])
+
+    def counts(self, model):
+        return dict(model.objects.order_by('name').values_list('name', 'book_count'))
+
+    def assertCountsConsistent(self):
+        self.assertEqual(reconcile_book_counts(Author, fix=False), [])
+        self.assertEqual(reconcile_book_counts(Genre, fix=False), [])
+
+    def create_book(self, title, authors, genres):
+        return self.client.post(reverse('book-list'), {
+            'title': title, 'publish_date': '2023-10-19', 'authors': authors, 'genres': genres,
+        }, format='json')
+
+    def test_counter_is_not_writable_through_api(self):
+        response = self.client.post(reverse('author-list'), {'name': 'New Author', 'book_count': 500}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['book_count'], 0)
+        response = self.client.post(reverse('genre-list'), {'name': 'New Genre', 'book_count': 500}, format='json')
+        self.assertEqual(response.data['book_count'], 0)
+        self.client.put(reverse('author-detail', args=[self.authors[0].id]), {'name': 'Author 0', 'book_count': 7},
+                        format='json')
+        self.assertCountsConsistent()
+
+    def test_api_create_update_delete(self):
+        book_id = self.create_book('Book', ['Author 0', 'Author 1'], ['Genre 0']).data['id']
+        self.create_book('Other', ['Author 1'], ['Genre 0'])
+        self.assertEqual(self.counts(Author), {'Author 0': 1, 'Author 1': 2, 'Author 2': 0})
+        self.assertEqual(self.counts(Genre), {'Genre 0': 2, 'Genre 1': 0})
+
+        self.client.put(reverse('book-detail', args=[book_id]), {
+            'title': 'Book', 'publish_date': '2023-10-19', 'authors': ['Author 1', 'Author 2'], 'genres': ['Genre 1'],
+        }, format='json')
+        self.assertEqual(self.counts(Author), {'Author 0': 0, 'Author 1': 2, 'Author 2': 1})
+        self.assertEqual(self.counts(Genre), {'Genre 0': 1, 'Genre 1': 1})
+
+        self.client.delete(reverse('book-detail', args=[book_id]))
+        self.assertEqual(self.counts(Author), {'Author 0': 0, 'Author 1': 1, 'Author 2': 0})
+        self.assertCountsConsistent()
+
+    def test_m2m_signals(self):
+        book = Book.objects.create(title='Book', publish_date='2023-10-19')
+        book.authors.add(*self.authors)
+        book.authors.add(self.authors[0])
+        # Несвязанный объект в remove() счётчик не уменьшает
+        book.genres.remove(self.genres[0])
+        book.genres.set([self.genres[0]])
+        book.authors.remove(self.authors[0])
+        self.assertEqual(self.counts(Author), {'Author 0': 0, 'Author 1': 1, 'Author 2': 1})
+        self.assertEqual(self.counts(Genre), {'Genre 0': 1, 'Genre 1': 0})
+
+        self.authors[1].authors.clear()
+        self.genres[1].genres.add(book)
+        book.authors.clear()
+        self.assertEqual(self.counts(Author), {'Author 0': 0, 'Author 1': 0, 'Author 2': 0})
+        self.assertEqual(self.counts(Genre), {'Genre 0': 1, 'Genre 1': 1})
+        self.assertCountsConsistent()
+
+    def test_bulk_and_import(self):
+        items = [
+            {'title': f'Book {i}', 'publish_date': '2023-10-19', 'authors': ['Author 0'], 'genres': ['Genre 0']}
+            for i in range(3)
+        ]
+        self.client.post(reverse('book-bulk'), items, format='json')
+        items[0]['authors'] = ['Author 1']
+        self.client.post(reverse('book-bulk'), items, format='json')
+        self.assertEqual(self.counts(Author), {'Author 0': 2, 'Author 1': 1, 'Author 2': 0})
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write(json.dumps({'title': 'Imported', 'publish_date': '2023-10-19', 'authors': ['Author 2', 'New'], 'genres': ['Genre 1']}))
+        self.addCleanup(os.unlink, handle.name)
+        call_command('import_catalog', handle.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Author.objects.get(name='New').book_count, 1)
+        self.assertCountsConsistent()
+
+    def test_ordering_by_book_count(self):
+        for i, author in enumerate(self.authors):
+            self.create_book(f'Book {i}', [a.name for a in self.authors[:i + 1]], ['Genre 0'])
+        url = reverse('author-list')
+        response = self.client.get(url, {'ordering': '-book_count'})
+        self.assertEqual([(a['name'], a['book_count']) for a in response.data['results']], [
+            ('Author 0', 3), ('Author 1', 2), ('Author 2', 1),
+        ])
+        with mock.patch('books.pagination.KeysetPagination.page_size', 2):
+            response = self.client.get(url, {'ordering': 'book_count', 'pagination': 'cursor'})
+            self.assertEqual([a['name'] for a in response.data['results']], ['Author 2', 'Author 1'])
+            response = self.client.get(response.data['next'])
+            self.assertEqual([a['name'] for a in response.data['results']], ['Author 0'])
+        response = self.client.get(reverse('genre-list'), {'ordering': '-book_count'})
+        self.assertEqual([g['name'] for g in response.data['results']], ['Genre 0', 'Genre 1'])
+        self.assertEqual(self.client.get(url, {'ordering': 'date_of_birth'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_book_representation_has_no_counts(self):
+        book_id = self.create_book('Book', ['Author 0'], ['Genre 0']).data['id']
+        for response in (self.client.get(reverse('book-detail', args=[book_id])), self.client.get(reverse('book-list'))):
+            self.assertNotIn('book_count', response.content.decode())
+
+    def test_reconcile_command(self):
+        self.create_book('Book', ['Author 0'], ['Genre 0'])
+        Author.objects.filter(name='Author 0').update(book_count=5)
+        Genre.objects.filter(name='Genre 1').update(book_count=2)
+        out = io.StringIO()
+        call_command('reconcile_book_counts', dry_run=True, stdout=out)
+        self.assertIn('5 -> 1', out.getvalue())
+        self.assertEqual(Author.objects.get(name='Author 0').book_count, 5)
+        call_command('reconcile_book_counts', stdout=io.StringIO())
+        self.assertCountsConsistent()
+        self.assertEqual(self.counts(Genre), {'Genre 0': 1, 'Genre 1': 0})
+
+
+class BenchmarkSuiteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, **options):
+        call_command('seed_catalog', stdout=io.StringIO(), **options)
+
+    def test_seed_catalog(self):
+        self.seed(books=50, authors=5, genres=3, authors_per_book=2, genres_per_book=1, batch_size=20)
+        self.assertEqual((Book.objects.count(), Author.objects.count(), Genre.objects.count()), (50, 5, 3))
+        self.assertEqual(BookReadModel.objects.count(), 50)
+        author_links = Book.authors.through.objects.count()
+        self.assertTrue(50 <= author_links <= 150)
+        self.assertEqual(Book.genres.through.objects.count(), 50)
+
+    def test_seed_is_reproducible(self):
+        self.seed(books=20, authors=5, genres=3, seed=7)
+        first = list(Book.objects.order_by('title').values_list('title', 'publish_date', 'description'))
+        self.seed(books=20, authors=5, genres=3, seed=7, clear=True)
+        self.assertEqual(list(Book.objects.order_by('title').values_list('title', 'publish_date', 'description')), first)
+        with self.assertRaises(CommandError):
+            self.seed(books=20, authors=5, genres=3)
+
+    def test_benchmark_results_and_comparison(self):
+        self.seed(books=30, authors=5, genres=3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            call_command('benchmark_api', requests=3, warmup=1, output=path, stdout=io.StringIO())
+            with open(path, encoding='utf-8') as source:
+                results = json.load(source)
+        self.assertEqual(set(results['scenarios']), {'list', 'detail', 'search', 'create'})
+        self.assertEqual(results['catalog']['books'], 30)
+        self.assertEqual(Book.objects.count(), 30)
+        for summary in results['scenarios'].values():
+            self.assertEqual((summary['requests'], summary['errors']), (3, 0))
+            self.assertGreater(summary['queries'], 0)
+
+        slower = json.loads(json.dumps(results))
+        slower['scenarios']['list']['p50_ms'] = results['scenarios']['list']['p50_ms'] * 2 + 1
+        slower['scenarios']['detail']['queries'] += 1
+        self.assertEqual(compare_results(results, results, 0.2), [])
+        self.assertEqual([line.split(':')[0] for line in compare_results(results, slower, 0.2)], ['list', 'detail'])
+
+
+class BookAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.author = Author.objects.create(name='Tolkien')
+        self.genre = Genre.objects.create(name='Fantasy')
+
+    def create_books(self, count, start=0):
+        for i in range(start, start + count):
+            book = Book.objects.create(title=f'Book {i}', publish_date='2000-01-01')
+            book.authors.add(self.author)
+            book.genres.add(self.genre)
+
+    def changelist_queries(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:books_book_changelist'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_changelist_query_count_does_not_depend_on_rows(self):
+        self.create_books(2)
+        response, few = self.changelist_queries()
+        self.assertContains(response, 'Tolkien')
+        self.assertContains(response, 'Fantasy')
+        self.create_books(20, start=2)
+        self.assertEqual(self.changelist_queries()[1], few)
+        self.assertEqual(self.changelist_queries({'q': 'Book 1'})[1], few)
+
+    def test_edit_page_uses_autocomplete(self):
+        self.create_books(1)
+        response = self.client.get(reverse('admin:books_book_change', args=[Book.objects.get().pk]))
+        self.assertContains(response, 'admin-autocomplete')
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'Tol', 'app_label': 'books', 'model_name': 'book', 'field_name': 'authors',
+        })
+        self.assertEqual(response.json()['results'], [{'id': str(self.author.pk), 'text': 'Tolkien'}])
+
+    def test_estimated_count_for_unfiltered_list(self):
+        self.create_books(3)
+        with mock.patch('books.admin.estimated_count', return_value=EXACT_COUNT_LIMIT + 1):
+            self.assertEqual(EstimatedCountPaginator(Book.objects.order_by('pk'), 10).count, EXACT_COUNT_LIMIT + 1)
+            self.assertEqual(EstimatedCountPaginator(Book.objects.filter(title='Book 1').order_by('pk'), 10).count, 1)
+        self.assertEqual(EstimatedCountPaginator(Book.objects.order_by('pk'), 10).count, 3)
+
+
+class ServerBootTests(TestCase):
+    def test_liveness_and_readiness(self):
+        self.assertEqual(self.client.get(reverse('health-live')).json(), {'status': 'ok'})
+        response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['checks'], {'database': 'ok', 'cache': 'ok'})
+
+    def test_readiness_fails_without_database(self):
+        with mock.patch('library.health.connection.cursor', side_effect=DatabaseError('connection refused')):
+            response = self.client.get(reverse('health-ready'))
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['checks']['database'], 'connection refused')
+
+    def test_prepare_server_skips_unchanged_steps(self):
+        with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+            out = io.StringIO()
+            call_command('prepare_server', stdout=out)
+            self.assertIn('Миграции: изменений нет', out.getvalue())
+            self.assertIn('Статика собрана', out.getvalue())
+            self.assertTrue(os.path.exists(os.path.join(static_root, 'admin', 'css', 'base.css')))
+
+            out = io.StringIO()
+            with mock.patch('books.management.commands.prepare_server.call_command') as command:
+                call_command('prepare_server', stdout=out)
+            command.assert_not_called()
+            self.assertIn('Статика: изменений нет', out.getvalue())
+
+    def test_first_request_probe(self):
+        self.assertEqual(first_request(get_wsgi_application(), '/health/live/'), 200)
+        usage = memory_usage()
+        if os.path.exists('/proc/self/smaps_rollup'):
+            self.assertGreater(usage['private_kb'], 0)
+            self.assertGreaterEqual(usage['rss_kb'], usage['private_kb'])
+
+
+class OpenAPISchemaTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'openapi.json')
+        settings_override = override_settings(OPENAPI_SCHEMA_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema_store.reset()
+        self.addCleanup(schema_store.reset)
+
+    def test_schema_is_built_once_and_stored(self):
+        with mock.patch('library.schema.build_schema', wraps=build_schema) as build:
+            for _ in range(3):
+                response = self.client.get('/swagger.json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('/api/v1/books/', response.json()['paths'])
+            self.assertEqual(build.call_count, 1)
+            self.assertTrue(os.path.exists(self.path))
+
+            # Новый процесс читает схему из файла, пока код не изменился
+            schema_store.reset()
+            self.client.get('/swagger.yaml')
+            self.assertEqual(build.call_count, 1)
+
+            schema_store.reset()
+            with mock.patch('library.schema.code_fingerprint', return_value='changed'):
+                self.client.get('/swagger.json')
+            self.assertEqual(build.call_count, 2)
+
+    def test_etag_and_compression(self):
+        plain = self.client.get('/swagger.json')
+        self.assertEqual(plain['Cache-Control'], 'no-cache')
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        compressed = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+        for refused in ('gzip;q=0', 'br, gzip; q=0.0', 'identity'):
+            response = self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING=refused)
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(response.content, plain.content)
+        self.assertEqual(self.client.get('/swagger.json', HTTP_ACCEPT_ENCODING='*;q=0.5')['Content-Encoding'], 'gzip')
+
+        response = self.client.get('/swagger.json', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_ui_pages_use_stored_schema(self):
+        response = self.client.get('/swagger/', {'format': 'openapi'})
+        self.assertEqual(response['Content-Type'], 'application/openapi+json')
+        self.assertEqual(response.content, self.client.get('/swagger.json').content)
+        self.assertEqual(self.client.get('/swagger/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/redoc/').status_code, status.HTTP_200_OK)
+
+    def test_ui_pages_do_not_build_schema(self):
+        schema_store.load()
+        with mock.patch('drf_yasg.generators.OpenAPISchemaGenerator.get_schema') as get_schema:
+            for path in ('/swagger/', '/redoc/'):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertContains(response, '<title>Library API</title>')
+                self.client.get(path, {'format': 'openapi'})
+        get_schema.assert_not_called()
+
+    def test_api_url_from_settings(self):
+        self.assertNotIn('host', self.client.get('/swagger.json').json())
+
+        schema_store.reset()
+        with override_settings(SWAGGER_SETTINGS={'DEFAULT_API_URL': 'https://library.example.com'}):
+            schema = self.client.get('/swagger.json').json()
+        self.assertEqual(schema['host'], 'library.example.com')
+        self.assertEqual(schema['schemes'], ['https'])
+        self.assertEqual(list(schema)[:4], ['swagger', 'info', 'host', 'schemes'])
+
+    def test_drift_check(self):
+        call_command('generate_schema', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('generate_schema', check=True, stdout=out)
+        self.assertIn('совпадает', out.getvalue())
+
+        with open(self.path) as stored:
+            data = json.load(stored)
+        del data['schema']['paths']['/api/v1/books/']
+        with open(self.path, 'w') as stored:
+            json.dump(data, stored)
+        with self.assertRaisesMessage(CommandError, 'paths: добавлено /api/v1/books/'):
+            call_command('generate_schema', check=True, stdout=io.StringIO())
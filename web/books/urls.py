@@ -1,8 +1,9 @@
 from django.urls import path
 
+from .async_views import AsyncAuthorView, AsyncBookView, AsyncGenreView
 from .views import (
     AuthorListCreateView, AuthorDetailView, GenreListCreateView, GenreDetailView,
-    BookListCreateView, BookDetailView,
+    BookListCreateView, BookDetailView, BookBulkView, BookExportView, BookFacetsView,
 )
 
 urlpatterns = [
@@ -12,4 +13,14 @@ urlpatterns = [
     path('genres/<uuid:pk>/', GenreDetailView.as_view(), name='genre-detail'),
     path('books/', BookListCreateView.as_view(), name='book-list'),
     path('books/<uuid:pk>/', BookDetailView.as_view(), name='book-detail'),
+    path('books/bulk/', BookBulkView.as_view(), name='book-bulk'),
+    path('books/export/', BookExportView.as_view(), name='book-export'),
+    path('books/facets/', BookFacetsView.as_view(), name='book-facets'),
+    # Те же данные через асинхронные представления (режим ASGI)
+    path('async/authors/', AsyncAuthorView.as_view(), name='async-author-list'),
+    path('async/authors/<uuid:pk>/', AsyncAuthorView.as_view(), name='async-author-detail'),
+    path('async/genres/', AsyncGenreView.as_view(), name='async-genre-list'),
+    path('async/genres/<uuid:pk>/', AsyncGenreView.as_view(), name='async-genre-detail'),
+    path('async/books/', AsyncBookView.as_view(), name='async-book-list'),
+    path('async/books/<uuid:pk>/', AsyncBookView.as_view(), name='async-book-detail'),
 ]
@@ -1,15 +1,112 @@
+from django.http import StreamingHttpResponse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-
+from rest_framework.views import APIView
+
+from .cache import (
+    AUTHOR_LIST, BOOK_LIST, BOOK_SEARCH, GENRE_LIST, CachedResponseMixin, author_tag, book_tag, genre_tag,
+    response_cache,
+)
+from .export import EXPORT_FORMATS, export_catalog
+from .facets import FACETS, MAX_TOP_AUTHORS, TOP_AUTHORS, book_facets
+from .filters import DEFAULT_NAME_ORDERING, FILTER_PARAMS, NAME_ORDERINGS, BookFilter, parse_ordering
 from .models import Author, Book, Genre
-from .serializers import AuthorSerializer, BookSerializer, GenreSerializer
+from .pagination import KeysetPaginationMixin
+from .search import get_search_backend
+from .serializers import (
+    AuthorSerializer, BookBulkItemSerializer, BookSerializer, FieldSelection, GenreSerializer, ReadModelSerializer,
+    ValuesSerializer,
+)
 from .services import BookService, AuthorService, GenreService
+from .streaming import STREAM_CHUNK_SIZE, STREAM_FORMATS, represent_in_chunks
 
 
-class AuthorListCreateView(ListCreateAPIView):
-    queryset = Author.objects.all()
+class ValuesListMixin:
+    """Список строится ValuesSerializer из values(), без моделей и ModelSerializer."""
+    values_serializer_class = ValuesSerializer
+
+    def list(self, request, *args, **kwargs):
+        extra_columns = getattr(self, 'keyset_ordering', ())
+        values_serializer = self.values_serializer_class(self.get_serializer(), extra_columns=extra_columns)
+        queryset = values_serializer.values(self.filter_queryset(self.queryset.all()))
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(values_serializer.to_representation(list(queryset)))
+        return self.get_paginated_response(values_serializer.to_representation(page))
+
+
+class NameOrderingMixin:
+    """``?ordering=`` списков авторов и жанров: по имени или по числу книг."""
+
+    @property
+    def keyset_ordering(self):
+        request = getattr(self, 'request', None)
+        params = request.query_params if request is not None else {}
+        return NAME_ORDERINGS[parse_ordering(params, NAME_ORDERINGS, DEFAULT_NAME_ORDERING)]
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(queryset).order_by(*self.keyset_ordering)
+
+
+def filter_books(queryset, params, book_filter):
+    """Фильтры, поиск и сортировка списка книг (общие для синхронного и асинхронного списка)."""
+    queryset = book_filter.filter(queryset)
+    query = params.get('search') or params.get('title')
+    if query:
+        queryset = get_search_backend().search(queryset, query)
+    # Явная сортировка важнее ранжирования поиска
+    if not query or 'ordering' in params:
+        queryset = queryset.order_by(*book_filter.order_by)
+    return queryset
+
+
+def related_id(value):
+    return value['id'] if isinstance(value, dict) else value
+
+
+class AuthorCacheMixin(CachedResponseMixin):
+    cache_list_tags = (AUTHOR_LIST,)
+    # book_count меняется без updated_at (books.counters), поэтому Last-Modified — время записи в кэш
+    last_modified_from_data = False
+
+    def get_item_cache_tags(self, item):
+        return {author_tag(item['id'])}
+
+
+class GenreCacheMixin(CachedResponseMixin):
+    cache_list_tags = (GENRE_LIST,)
+    # Как у авторов: book_count меняется без updated_at
+    last_modified_from_data = False
+
+    def get_item_cache_tags(self, item):
+        return {genre_tag(item['id'])}
+
+
+class BookCacheMixin(CachedResponseMixin):
+    cache_list_tags = (BOOK_LIST,)
+
+    def get_list_cache_tags(self):
+        tags = super().get_list_cache_tags()
+        params = self.request.query_params
+        # Состав отфильтрованной выборки меняется вместе со связями и именами, как и у поиска
+        if params.get('search') or params.get('title') or any(params.get(name) for name in FILTER_PARAMS):
+            tags.add(BOOK_SEARCH)
+        return tags
+
+    def get_item_cache_tags(self, item):
+        # При ?expand= связи выводятся списком id, при ?fields= могут отсутствовать
+        return (
+            {book_tag(item['id'])}
+            | {author_tag(related_id(author)) for author in item.get('authors', [])}
+            | {genre_tag(related_id(genre)) for genre in item.get('genres', [])}
+        )
+
+
+class AuthorListCreateView(AuthorCacheMixin, NameOrderingMixin, KeysetPaginationMixin, ValuesListMixin, ListCreateAPIView):
+    queryset = Author.objects.order_by('name')
     serializer_class = AuthorSerializer
     pagination_class = PageNumberPagination
 
@@ -32,7 +129,7 @@ class AuthorListCreateView(ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class AuthorDetailView(RetrieveUpdateDestroyAPIView):
+class AuthorDetailView(AuthorCacheMixin, RetrieveUpdateDestroyAPIView):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
 
@@ -47,8 +144,8 @@ class AuthorDetailView(RetrieveUpdateDestroyAPIView):
         return Response(serializer.data)
 
 
-class GenreListCreateView(ListCreateAPIView):
-    queryset = Genre.objects.all()
+class GenreListCreateView(GenreCacheMixin, NameOrderingMixin, KeysetPaginationMixin, ValuesListMixin, ListCreateAPIView):
+    queryset = Genre.objects.order_by('name')
     serializer_class = GenreSerializer
     pagination_class = PageNumberPagination
 
@@ -71,7 +168,7 @@ class GenreListCreateView(ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class GenreDetailView(RetrieveUpdateDestroyAPIView):
+class GenreDetailView(GenreCacheMixin, RetrieveUpdateDestroyAPIView):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
@@ -86,11 +183,26 @@ class GenreDetailView(RetrieveUpdateDestroyAPIView):
         return Response(serializer.data)
 
 
-class BookListCreateView(ListCreateAPIView):
-    queryset = Book.objects.all()
+class BookListCreateView(BookCacheMixin, KeysetPaginationMixin, ValuesListMixin, ListCreateAPIView):
+    queryset = Book.objects.order_by('publish_date', 'id')
     serializer_class = BookSerializer
+    values_serializer_class = ReadModelSerializer
     pagination_class = PageNumberPagination
 
+    @property
+    def book_filter(self):
+        if not hasattr(self, '_book_filter'):
+            self._book_filter = BookFilter.from_request(self.request)
+        return self._book_filter
+
+    @property
+    def keyset_ordering(self):
+        return self.book_filter.order_by
+
+    def get_queryset(self):
+        selection = FieldSelection.from_request(self.request)
+        return BookSerializer.setup_eager_loading(super().get_queryset(), selection)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
@@ -108,24 +220,41 @@ class BookListCreateView(ListCreateAPIView):
             return Response(book_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def list(self, request, *args, **kwargs):
-        title = request.query_params.get('title')
-        if title:
-            books = Book.objects.filter(title__icontains=title)
-            serializer = self.get_serializer(books, many=True)
-            return Response(serializer.data)
+    def filter_queryset(self, queryset):
+        return filter_books(super().filter_queryset(queryset), self.request.query_params, self.book_filter)
 
+    def list(self, request, *args, **kwargs):
+        stream_format = request.query_params.get('stream')
+        if stream_format:
+            return self.stream(stream_format)
         return super().list(request, *args, **kwargs)
 
+    def stream(self, stream_format):
+        if stream_format not in STREAM_FORMATS:
+            return Response(
+                {'detail': f'Неизвестный формат выгрузки. Допустимые: {", ".join(STREAM_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        content_type, render = STREAM_FORMATS[stream_format]
+        values_serializer = self.values_serializer_class(self.get_serializer(), extra_columns=self.keyset_ordering)
+        queryset = values_serializer.values(self.filter_queryset(self.queryset.all()))
+        rows = represent_in_chunks(values_serializer, queryset.iterator(chunk_size=STREAM_CHUNK_SIZE))
+        return StreamingHttpResponse(render(rows), content_type=content_type)
+
 
-class BookDetailView(RetrieveUpdateDestroyAPIView):
+class BookDetailView(BookCacheMixin, RetrieveUpdateDestroyAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
 
+    def get_queryset(self):
+        selection = FieldSelection.from_request(self.request)
+        return BookSerializer.setup_eager_loading(super().get_queryset(), selection)
+
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
-        authors_data = request.data.get('authors', [])
-        genres_data = request.data.get('genres', [])
+        # Отсутствующий список оставляет связи как есть, переданный — заменяет их
+        authors_data = request.data.get('authors')
+        genres_data = request.data.get('genres')
 
         book, error_response = BookService.create_or_update_book(
             instance, request.data, authors_data, genres_data
@@ -136,3 +265,108 @@ class BookDetailView(RetrieveUpdateDestroyAPIView):
 
         serializer = self.get_serializer(book)
         return Response(serializer.data)
+
+
+class BookBulkView(APIView):
+    max_books = 5000
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return Response({'detail': 'Ожидается список книг'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.max_books:
+            return Response(
+                {'detail': f'За один запрос можно передать не более {self.max_books} книг'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        valid_items, indexes, errors = [], [], []
+        for index, item in enumerate(request.data):
+            serializer = BookBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid_items.append(serializer.validated_data)
+                indexes.append(index)
+            else:
+                errors.append({'index': index, 'detail': 'Ошибка валидации.', 'errors': serializer.errors})
+
+        results, service_errors = BookService.bulk_create_or_update_books(valid_items)
+        for result in results:
+            result['index'] = indexes[result['index']]
+        for error in service_errors:
+            error['index'] = indexes[error['index']]
+        errors = sorted(errors + service_errors, key=lambda error: error['index'])
+
+        return Response({
+            'created': sum(result['created'] for result in results),
+            'updated': sum(not result['created'] for result in results),
+            'results': results,
+            'errors': errors,
+        })
+
+
+class BookExportView(APIView):
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'detail': f'Неизвестный формат выгрузки. Допустимые: {", ".join(EXPORT_FORMATS)}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        compress = request.query_params.get('compress') == 'gzip'
+        content_type, _ = EXPORT_FORMATS[export_format]
+        filename = f'catalog.{export_format}'
+        if compress:
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(export_catalog(export_format, compress), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class BookFacetsView(CachedResponseMixin, APIView):
+    """
+    Счётчики книг по жанрам, авторам, десятилетиям и годам для тех же фильтров
+    и поиска, что у списка книг. Кэшируется по нормализованной сигнатуре фильтров,
+    поэтому порядок параметров и ?ordering= не порождают новых записей.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return self.cached_response(request, self.facets_response, request, many=False)
+
+    def get_selected_facets(self, request):
+        if 'facets' not in request.query_params:
+            return FACETS
+        facets = tuple(name.strip() for name in request.query_params['facets'].split(',') if name.strip())
+        unknown = set(facets) - set(FACETS)
+        if unknown:
+            raise ValidationError({'detail': f'Неизвестные фасеты. Допустимые: {", ".join(FACETS)}'})
+        return facets
+
+    def get_top_authors(self, request):
+        try:
+            top_authors = int(request.query_params.get('top_authors', TOP_AUTHORS))
+        except ValueError:
+            top_authors = 0
+        if not 0 < top_authors <= MAX_TOP_AUTHORS:
+            raise ValidationError({'detail': f'Параметр "top_authors" должен быть от 1 до {MAX_TOP_AUTHORS}'})
+        return top_authors
+
+    def get_cache_key(self, request):
+        signature = (
+            BookFilter.from_request(request).signature(),
+            request.query_params.get('search') or request.query_params.get('title'),
+            sorted(self.get_selected_facets(request)),
+            self.get_top_authors(request),
+        )
+        return response_cache.make_key('facets', repr(signature))
+
+    def get_item_cache_tags(self, item):
+        # Счётчики меняются при любом изменении книг, связей и имён
+        return {BOOK_LIST, BOOK_SEARCH}
+
+    def facets_response(self, request):
+        books = BookFilter.from_request(request).filter(Book.objects.all())
+        query = request.query_params.get('search') or request.query_params.get('title')
+        if query:
+            books = get_search_backend().search(books, query)
+        return Response(book_facets(books, self.get_selected_facets(request), self.get_top_authors(request)))
@@ -1,19 +1,25 @@
 #!/bin/sh
+set -e
 
 if [ -f .env ]; then
     echo "Loading environment variables from .env file"
     export $(cat .env | xargs)
 fi
 
-python manage.py makemigrations
-
-python manage.py migrate
-
-python manage.py collectstatic --noinput
+# Воркеры и потоки по числу ядер, если не заданы явно
+CPUS=$(nproc)
+export WEB_WORKERS=${WEB_WORKERS:-$((CPUS * 2))}
+export WEB_THREADS=${WEB_THREADS:-2}
+export ASGI_WORKERS=${ASGI_WORKERS:-$CPUS}
 
+# Миграции и статику готовит основной контейнер, ASGI-контейнер только обслуживает запросы.
+# migrate и collectstatic запускаются, только если есть что применять (manage.py prepare_server)
+if [ "$SERVER_MODE" != "asgi" ]; then
+    python manage.py prepare_server
+fi
 
-echo "from django.contrib.auth.models import User; User.objects.create_superuser(
-    '$DJANGO_SUPERUSER_USERNAME', '$DJANGO_SUPERUSER_EMAIL', '$DJANGO_SUPERUSER_PASSWORD'
-    )  if not User.objects.filter(username='$DJANGO_SUPERUSER_USERNAME').exists() else pass"
+if [ "$SERVER_MODE" = "asgi" ]; then
+    exec gunicorn library.asgi:application -c /app/library.gunicorn.py
+fi
 
-uwsgi --ini /app/library.uwsgi.ini
+exec uwsgi --ini /app/library.uwsgi.ini
@@ -0,0 +1,13 @@
+# Режим ASGI (SERVER_MODE=asgi): gunicorn управляет воркерами uvicorn, каждый
+# обслуживает много соединений в одном event loop
+import os
+
+bind = 'unix:/tmp/uwsgi/library-asgi.sock'
+umask = 0o111
+workers = int(os.environ.get('ASGI_WORKERS') or os.cpu_count() or 1)
+worker_class = 'uvicorn.workers.UvicornWorker'
+# Как у uWSGI: приложение импортируется в мастере, воркеры получают его через fork
+preload_app = True
+max_requests = 5000
+max_requests_jitter = 500
+graceful_timeout = 30
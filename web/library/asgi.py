@@ -11,6 +11,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from library.boot import preload, preload_enabled
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library.settings')
 
 application = get_asgi_application()
+
+# Мастер uWSGI/gunicorn импортирует URLconf до fork, воркеры получают его готовым
+if preload_enabled():
+    preload()
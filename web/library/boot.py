@@ -0,0 +1,128 @@
+"""
+Запуск воркеров: предзагрузка приложения в мастере и замеры старта.
+
+uWSGI (и gunicorn с ``preload_app``) импортирует приложение в мастере и затем
+форкает воркеры. Django при этом настраивает приложения и middleware, но URLconf
+со всеми представлениями, сериализаторами и drf_yasg импортируется лениво, на
+первом запросе — отдельно в каждом воркере. ``preload()`` импортирует его в
+мастере, и воркеры получают готовые модули через fork (copy-on-write), а
+``gc.freeze()`` убирает предзагруженные объекты из обхода сборщика мусора,
+чтобы он не копировал их страницы в каждый воркер. Там же загружается
+заранее построенная схема OpenAPI (library.schema).
+
+``python -m library.boot`` замеряет время до первого ответа и память воркеров,
+форкнутых от мастера с предзагрузкой и без (см. ``manage.py measure_boot``).
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+PRELOAD_ENV = 'PRELOAD_APP'
+
+
+def preload_enabled():
+    return (os.environ.get(PRELOAD_ENV) or 'on') == 'on'
+
+
+def preload():
+    from django.urls import get_resolver
+
+    from library.schema import schema_store
+
+    # url_patterns импортирует URLconf, а с ним все представления
+    get_resolver().url_patterns
+    # Схема OpenAPI читается из файла (или строится) один раз в мастере
+    schema_store.load()
+    gc.collect()
+    gc.freeze()
+
+
+def memory_usage(pid='self'):
+    """RSS и собственная (не разделяемая с мастером) память процесса в КБ по /proc (только Linux)."""
+    usage = {'rss_kb': None, 'private_kb': None}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as rollup:
+            lines = list(rollup)
+    except OSError:
+        return usage
+    kb = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        if value.strip().endswith('kB'):
+            kb[name] = int(value.split()[0])
+    usage['rss_kb'] = kb.get('Rss')
+    usage['private_kb'] = kb.get('Private_Clean', 0) + kb.get('Private_Dirty', 0)
+    return usage
+
+
+def first_request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    path, _, query = path.partition('?')
+    environ = {'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_ACCEPT': 'application/json'}
+    setup_testing_defaults(environ)
+    status = []
+    body = application(environ, lambda code, headers, exc_info=None: status.append(code))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(status[0].split()[0])
+
+
+def fork_workers(application, path, workers):
+    # Каждый воркер, как у uWSGI, отвечает на свой первый запрос сразу после fork
+    results = []
+    for _ in range(workers):
+        read_fd, write_fd = os.pipe()
+        forked = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                status = first_request(application, path)
+                result = {'status': status, 'first_request_ms': round((time.perf_counter() - forked) * 1000, 1)}
+                result.update(memory_usage())
+            except Exception as exc:
+                # Ошибку нужно передать мастеру, а не потерять в дочернем процессе
+                result = {'error': repr(exc)}
+            with os.fdopen(write_fd, 'w') as pipe:
+                json.dump(result, pipe)
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            results.append(json.loads(pipe.read() or '{}'))
+        os.waitpid(pid, 0)
+    return results
+
+
+def probe(path, workers, preload_app):
+    started = time.perf_counter()
+    os.environ[PRELOAD_ENV] = 'on' if preload_app else 'off'
+    from library.wsgi import application
+
+    master_ready_ms = round((time.perf_counter() - started) * 1000, 1)
+    return {
+        'preload': preload_app,
+        'master_ready_ms': master_ready_ms,
+        'master': memory_usage(),
+        'workers': fork_workers(application, path, workers),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Замер старта воркеров WSGI')
+    parser.add_argument('--path', default='/api/v1/books/')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--preload', choices=('on', 'off'), default='on')
+    args = parser.parse_args(argv)
+    json.dump(probe(args.path, args.workers, args.preload == 'on'), sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
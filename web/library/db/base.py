@@ -0,0 +1,59 @@
+"""
+Бэкенд PostgreSQL с пулом соединений (DB_POOL=on).
+
+Настройки пула — ключ ``POOL`` в описании базы: ``SIZE`` (соединений на процесс)
+и ``TIMEOUT`` (сколько ждать свободное соединение, секунд). При
+``CONN_HEALTH_CHECKS`` соединение из пула проверяется ``SELECT 1`` перед выдачей.
+"""
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from .pool import PoolTimeout, get_pool
+
+Database = base.Database
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        options = self.settings_dict.get('POOL') or {}
+        return get_pool(self.alias, options.get('SIZE', 1), options.get('TIMEOUT', 10))
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire(
+                lambda: super(DatabaseWrapper, self).get_new_connection(conn_params), self.check_pooled,
+            )
+        except PoolTimeout as exc:
+            raise Database.OperationalError(str(exc)) from exc
+
+    def check_pooled(self, connection):
+        if connection.closed:
+            return False
+        if not self.settings_dict['CONN_HEALTH_CHECKS']:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except Database.Error:
+            return False
+
+    @staticmethod
+    def reset_pooled(connection):
+        # Незавершённая транзакция (например, после ошибки) не должна перейти к следующему запросу
+        if connection.closed:
+            return False
+        try:
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            # Проверка SELECT 1 при выдаче не должна открывать транзакцию
+            connection.autocommit = True
+            return True
+        except Database.Error:
+            return False
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection, self.reset_pooled)
@@ -0,0 +1,120 @@
+"""
+Пул соединений с БД внутри процесса.
+
+Соединение берётся из пула при первом запросе к БД и возвращается, когда Django
+закрывает его в конце HTTP-запроса (CONN_MAX_AGE=0), поэтому каждый запрос
+пропускает установку соединения и аутентификацию в PostgreSQL. Когда все
+``size`` соединений заняты, поток ждёт свободное не дольше ``timeout`` секунд.
+"""
+import os
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self.idle = []
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.counters = {
+            'checkouts': 0, 'created': 0, 'discarded': 0, 'waits': 0, 'timeouts': 0,
+            'wait_time_total': 0.0, 'wait_time_max': 0.0, 'peak_in_use': 0,
+        }
+
+    def acquire(self, connect, check):
+        """
+        Свободное соединение, прошедшее ``check(connection)``, или новое от ``connect()``.
+        Непрошедшие проверку соединения закрываются.
+        """
+        started = time.monotonic()
+        with self.condition:
+            while not self.idle and self.in_use >= self.size:
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.counters['timeouts'] += 1
+                    raise PoolTimeout(f'Нет свободных соединений в пуле за {self.timeout} с (размер пула {self.size})')
+                self.condition.wait(remaining)
+            self.record_checkout(time.monotonic() - started)
+            connection = self.idle.pop() if self.idle else None
+
+        try:
+            if connection is not None and not check(connection):
+                self.discard(connection)
+                connection = None
+            if connection is None:
+                connection = connect()
+                with self.condition:
+                    self.counters['created'] += 1
+        except BaseException:
+            self.checkin()
+            raise
+        return connection
+
+    def release(self, connection, reset):
+        """Возвращает соединение в пул, если ``reset(connection)`` вернул True, иначе закрывает его."""
+        reusable = False
+        try:
+            reusable = reset(connection)
+        finally:
+            if not reusable:
+                self.discard(connection)
+            self.checkin(connection if reusable else None)
+
+    def record_checkout(self, waited):
+        self.in_use += 1
+        self.counters['checkouts'] += 1
+        self.counters['peak_in_use'] = max(self.counters['peak_in_use'], self.in_use)
+        if waited > 0.001:
+            self.counters['waits'] += 1
+            self.counters['wait_time_total'] += waited
+            self.counters['wait_time_max'] = max(self.counters['wait_time_max'], waited)
+
+    def checkin(self, connection=None):
+        with self.condition:
+            self.in_use -= 1
+            if connection is not None:
+                self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        with self.condition:
+            self.counters['discarded'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self.condition:
+            counters = dict(self.counters)
+            data = {'pid': self.pid, 'size': self.size, 'in_use': self.in_use, 'idle': len(self.idle)}
+        data['utilization'] = round(data['in_use'] / self.size, 3) if self.size else 0
+        data.update(counters)
+        data['wait_time_avg'] = counters['wait_time_total'] / counters['waits'] if counters['waits'] else 0.0
+        return data
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, size, timeout):
+    # После fork (воркеры uWSGI, gunicorn) соединения родителя не используются: у процесса свой пул
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[alias] = ConnectionPool(size, timeout)
+        return pool
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = {alias: pool for alias, pool in _pools.items() if pool.pid == os.getpid()}
+    return {alias: pool.stats() for alias, pool in pools.items()}
@@ -0,0 +1,44 @@
+"""
+Лимит времени запроса в воркерах uWSGI.
+
+Общий ``harakiri`` в library.uwsgi.ini убивал бы и долгие, но исправные запросы:
+потоковую выгрузку каталога, список книг с ``?stream=`` и пакетную запись
+книг. Поэтому лимит ставит себе каждый запрос — ``uwsgi.set_user_harakiri``
+на ``REQUEST_TIMEOUT`` секунд, — а представления из ``LONG_REQUEST_VIEWS``
+снимают его, как только URL разрешён. Таймер uWSGI действует на поток
+(ядро) воркера, поэтому соседние потоки его не сбрасывают.
+
+Вне uWSGI (runserver, ASGI, тесты) модуля ``uwsgi`` нет и middleware отключается.
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+
+class HarakiriMiddleware:
+    def __init__(self, get_response):
+        if uwsgi is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.timeout = getattr(settings, 'REQUEST_TIMEOUT', 30)
+        self.long_views = getattr(settings, 'LONG_REQUEST_VIEWS', {})
+
+    def __call__(self, request):
+        uwsgi.set_user_harakiri(self.timeout)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_long(request):
+            # 0 снимает таймер: ответ передаётся столько, сколько его читает клиент
+            uwsgi.set_user_harakiri(0)
+
+    def is_long(self, request):
+        match = request.resolver_match
+        if match is None or match.view_name not in self.long_views:
+            return False
+        parameter = self.long_views[match.view_name]
+        return parameter is None or parameter in request.GET
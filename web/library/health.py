@@ -0,0 +1,33 @@
+"""
+Проверки для оркестратора и балансировщика.
+
+``/health/live/`` отвечает, пока процесс обслуживает запросы, и ничего не
+проверяет: перезапуск контейнера из-за недоступной БД не поможет. ``/health/ready/``
+проверяет БД и кэш; пока он отвечает 503, на воркер не стоит направлять трафик.
+"""
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.http import JsonResponse
+
+
+def live(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def ready(request):
+    checks = {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        checks['database'] = 'ok'
+    except DatabaseError as exc:
+        checks['database'] = str(exc)
+    try:
+        # Кэш — Redis или локальная память процесса, ошибка соединения зависит от бэкенда
+        cache.get('health:ready')
+        checks['cache'] = 'ok'
+    except Exception as exc:
+        checks['cache'] = str(exc)
+
+    ok = all(value == 'ok' for value in checks.values())
+    return JsonResponse({'status': 'ok' if ok else 'unavailable', 'checks': checks}, status=200 if ok else 503)
@@ -0,0 +1,211 @@
+"""
+Замеры производительности запросов: время ответа, число и время SQL-запросов,
+время сериализации и рендеринга.
+
+PerformanceMiddleware заводит на время запроса RequestMetrics в contextvar;
+обёртка курсора (``execute_wrappers``) и ``timed()`` дописывают в него замеры.
+contextvar копируется в потоки sync_to_async, поэтому замеры асинхронных
+представлений тоже попадают в свой запрос. Итоги уходят в заголовок
+``Server-Timing`` и в гистограммы процесса, которые отдаёт ``/metrics/``.
+Запросы, сделавшие больше SQL-запросов, чем бюджет представления (``QUERY_BUDGETS``,
+по умолчанию ``QUERY_BUDGET``), пишутся в лог ``library.performance`` и считаются
+в метриках.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+
+logger = logging.getLogger('library.performance')
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_time', 'timings', 'timing')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = {}
+        # Вложенные замеры (сериализатор внутри сериализатора) не суммируются повторно
+        self.timing = False
+
+
+class timed:
+    """Добавляет время блока к замеру ``name`` текущего запроса; вне запроса ничего не делает."""
+    __slots__ = ('name', 'metrics', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        metrics = _current.get()
+        if metrics is None or metrics.timing:
+            self.metrics = None
+            return
+        metrics.timing = True
+        self.metrics = metrics
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.timings[self.name] = metrics.timings.get(self.name, 0.0) + time.perf_counter() - self.started
+            metrics.timing = False
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(sender, **kwargs):
+    # Соединения живут в потоке запроса (под ASGI это поток sync_to_async), туда же
+    # приходит request_started, поэтому обёртка ставится на соединения именно этого потока
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def snapshot(self):
+        # Накопительные корзины «не больше границы», как у гистограмм Prometheus
+        buckets, cumulative = {}, 0
+        for bound, count in zip((*self.bounds, '+Inf'), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'count': cumulative, 'sum': round(self.total, 3), 'buckets': buckets}
+
+
+class ViewStats:
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.db_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.serialize_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.over_query_budget = 0
+        self.server_errors = 0
+
+    def snapshot(self):
+        return {
+            'latency_ms': self.latency_ms.snapshot(),
+            'db_ms': self.db_ms.snapshot(),
+            'serialize_ms': self.serialize_ms.snapshot(),
+            'queries': self.queries.snapshot(),
+            'over_query_budget': self.over_query_budget,
+            'server_errors': self.server_errors,
+        }
+
+
+class RequestHistograms:
+    """Гистограммы по представлениям (``метод имя-маршрута``) в пределах процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def observe(self, view, elapsed, metrics, status_code, over_budget):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            stats.latency_ms.observe(elapsed * 1000)
+            stats.db_ms.observe(metrics.db_time * 1000)
+            stats.serialize_ms.observe(metrics.timings.get('serialize', 0.0) * 1000)
+            stats.queries.observe(metrics.queries)
+            stats.over_query_budget += over_budget
+            stats.server_errors += status_code >= 500
+
+    def snapshot(self):
+        with self.lock:
+            return {view: stats.snapshot() for view, stats in sorted(self.views.items())}
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+request_histograms = RequestHistograms()
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.query_budget = getattr(settings, 'QUERY_BUDGET', None)
+        self.query_budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        self.server_timing = getattr(settings, 'SERVER_TIMING_HEADER', False)
+        request_started.connect(install_query_recorder, dispatch_uid='library.instrumentation')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        elapsed = time.perf_counter() - metrics.started
+        match = request.resolver_match
+        view = f'{request.method} {match.view_name if match else "unresolved"}'
+        budget = self.query_budgets.get(view, self.query_budget)
+        over_budget = budget is not None and metrics.queries > budget
+        if over_budget:
+            logger.warning(
+                'Превышен бюджет SQL-запросов: %s %s — %d запросов (бюджет %d), %.1f мс в БД',
+                request.method, request.get_full_path(), metrics.queries, budget, metrics.db_time * 1000,
+            )
+        request_histograms.observe(view, elapsed, metrics, response.status_code, over_budget)
+
+        if self.server_timing:
+            timings = [
+                f'app;dur={elapsed * 1000:.1f}', f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+            ]
+            timings.extend(f'{name};dur={value * 1000:.1f}' for name, value in metrics.timings.items())
+            response['Server-Timing'] = ', '.join(timings)
+        return response
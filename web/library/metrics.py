@@ -0,0 +1,166 @@
+"""
+Метрики воркеров для ``/metrics/``.
+
+Гистограммы запросов (library.instrumentation) и пулы соединений (library.db.pool)
+живут в памяти процесса, а uWSGI держит несколько воркеров, и запрос метрик
+попадает к любому из них. Поэтому каждый воркер по окончании запроса, не чаще
+раза в ``METRICS_PUBLISH_INTERVAL`` секунд, кладёт свой снимок в общий кэш
+(``METRICS_CACHE_ALIAS``), а ``/metrics/`` складывает снимки воркеров хоста,
+отчитавшихся за последние ``METRICS_WORKER_TTL`` секунд. Данные воркера, который
+перезапустился или давно не обслуживал запросов, из суммы выпадают.
+
+С кэшем в памяти процесса (LocMemCache, без REDIS_URL) общего хранилища нет и
+видны только метрики ответившего воркера — об этом говорит поле ``scope``.
+"""
+import copy
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_finished
+from django.utils.crypto import constant_time_compare
+from rest_framework.permissions import BasePermission
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from library.db.pool import pool_stats
+from library.instrumentation import request_histograms
+
+logger = logging.getLogger(__name__)
+
+# Для пиков и максимального ожидания сумма по воркерам не имеет смысла
+POOL_MAXIMA = {'peak_in_use', 'wait_time_max'}
+POOL_DERIVED = {'pid', 'utilization', 'wait_time_avg'}
+
+
+def merge_requests(snapshots):
+    merged = {}
+    for requests in snapshots:
+        for view, stats in requests.items():
+            target = merged.get(view)
+            if target is None:
+                merged[view] = copy.deepcopy(stats)
+                continue
+            for name, value in stats.items():
+                if isinstance(value, dict):
+                    histogram = target[name]
+                    histogram['count'] += value['count']
+                    histogram['sum'] = round(histogram['sum'] + value['sum'], 3)
+                    for bound, count in value['buckets'].items():
+                        histogram['buckets'][bound] += count
+                else:
+                    target[name] += value
+    return dict(sorted(merged.items()))
+
+
+def merge_pools(snapshots):
+    merged = {}
+    for pools in snapshots:
+        for alias, stats in pools.items():
+            target = merged.setdefault(alias, {})
+            for name, value in stats.items():
+                if name in POOL_MAXIMA:
+                    target[name] = max(target.get(name, 0), value)
+                elif name not in POOL_DERIVED:
+                    target[name] = target.get(name, 0) + value
+    for stats in merged.values():
+        stats['utilization'] = round(stats['in_use'] / stats['size'], 3) if stats['size'] else 0
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+    return merged
+
+
+class WorkerMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published = None
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'METRICS_CACHE_ALIAS', 'default')]
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'METRICS_WORKER_TTL', 600)
+
+    def shared(self):
+        return not isinstance(self.cache, LocMemCache)
+
+    def workers_key(self):
+        return f'metrics:workers:{socket.gethostname()}'
+
+    def worker_key(self, pid):
+        return f'metrics:worker:{socket.gethostname()}:{pid}'
+
+    def publish(self, force=False):
+        now = time.monotonic()
+        with self.lock:
+            interval = getattr(settings, 'METRICS_PUBLISH_INTERVAL', 5)
+            if not force and self.published is not None and now - self.published < interval:
+                return
+            self.published = now
+        pid = os.getpid()
+        self.cache.set(self.worker_key(pid), {'db_pool': pool_stats(), 'requests': request_histograms.snapshot()},
+                       timeout=self.ttl)
+        # Реестр воркеров перезаписывается без блокировки: затёртая параллельным
+        # воркером отметка восстановится при его следующей публикации
+        deadline = time.time() - self.ttl
+        workers = {
+            worker: seen for worker, seen in (self.cache.get(self.workers_key()) or {}).items() if seen > deadline
+        }
+        workers[pid] = time.time()
+        self.cache.set(self.workers_key(), workers, timeout=None)
+
+    def collect(self):
+        self.publish(force=True)
+        workers = self.cache.get(self.workers_key()) or {}
+        snapshots = self.cache.get_many([self.worker_key(pid) for pid in workers])
+        published = [pid for pid in sorted(workers) if self.worker_key(pid) in snapshots]
+        return {
+            'scope': 'host' if self.shared() else 'worker',
+            'pid': os.getpid(),
+            'workers': published,
+            'db_pool': merge_pools(snapshots[self.worker_key(pid)]['db_pool'] for pid in published),
+            'requests': merge_requests(snapshots[self.worker_key(pid)]['requests'] for pid in published),
+        }
+
+
+worker_metrics = WorkerMetrics()
+
+
+def publish_after_request(sender, **kwargs):
+    # Метрики не должны ломать ответ: недоступный кэш только пишется в лог
+    try:
+        worker_metrics.publish()
+    except Exception as exc:
+        logger.warning('Не удалось опубликовать метрики воркера: %s', exc)
+
+
+request_finished.connect(publish_after_request, dispatch_uid='library.metrics')
+
+
+class MetricsPermission(BasePermission):
+    """Сотрудники (is_staff) или заголовок ``Authorization: Bearer <METRICS_TOKEN>``."""
+
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+            return True
+        return bool(request.user and request.user.is_staff)
+
+
+class MetricsView(APIView):
+    """
+    Метрики воркеров хоста (см. описание модуля): заполнение пулов соединений с БД
+    (in_use/size, пик) и ожидание свободного соединения (число ожиданий, суммарное,
+    среднее и максимальное время в секундах, таймауты), а также гистограммы времени
+    ответа, времени в БД и сериализации и числа SQL-запросов по представлениям.
+    """
+    permission_classes = [MetricsPermission]
+
+    def get(self, request, *args, **kwargs):
+        return Response(worker_metrics.collect())
@@ -0,0 +1,175 @@
+"""
+Заранее построенная схема OpenAPI.
+
+drf_yasg обходит все представления и сериализаторы при каждом запросе схемы.
+Здесь схема строится один раз и хранится в файле ``OPENAPI_SCHEMA_PATH`` вместе
+с отпечатком кода (исходники проекта и версии Django, DRF и drf_yasg). Процесс
+читает файл один раз и держит в памяти готовые JSON и YAML, в том числе сжатые
+gzip. Если отпечаток не совпадает, то есть код изменился, схема строится заново
+и файл перезаписывается.
+
+Адрес API (``host`` и ``schemes``) от окружения зависит, а от кода нет, поэтому
+в файл он не пишется: схема строится без запроса и без адреса, а адрес из
+``SWAGGER_SETTINGS['DEFAULT_API_URL']`` добавляется при загрузке. Без него
+``host`` в схеме нет, и Swagger UI отправляет запросы туда, откуда получил схему.
+
+Файл собирается при сборке образа (``manage.py generate_schema``), а
+``manage.py generate_schema --check`` завершается ошибкой, если сохранённая
+схема расходится с текущими представлениями.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import django
+import drf_yasg
+import rest_framework
+from django.conf import settings
+from drf_yasg.app_settings import swagger_settings
+from drf_yasg.codecs import OpenAPICodecJson, yaml_sane_dump
+
+logger = logging.getLogger(__name__)
+
+# Формат drf_yasg -> тип содержимого; openapi запрашивают Swagger UI и ReDoc
+SCHEMA_FORMATS = {
+    '.json': 'application/json',
+    'openapi': 'application/openapi+json',
+    '.yaml': 'application/yaml',
+}
+SKIPPED_DIRS = {'__pycache__', 'static', 'media'}
+
+
+def schema_path():
+    return getattr(settings, 'OPENAPI_SCHEMA_PATH', os.path.join(settings.BASE_DIR, 'openapi.json'))
+
+
+def code_fingerprint():
+    digest = hashlib.sha1()
+    for name, module in (('django', django), ('rest_framework', rest_framework), ('drf_yasg', drf_yasg)):
+        digest.update(f'{name}=={module.__version__}\n'.encode())
+    base_dir = str(settings.BASE_DIR)
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = sorted(name for name in dirs if name not in SKIPPED_DIRS and not name.startswith('.'))
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, base_dir).encode())
+                with open(path, 'rb') as source:
+                    digest.update(hashlib.sha1(source.read()).digest())
+    return digest.hexdigest()
+
+
+def build_schema():
+    """Схема по текущим представлениям в виде словаря, как её отдаёт drf_yasg."""
+    from library.swagger import api_info, schema_view
+
+    # url='' — без host и schemes, их добавляет with_api_url
+    generator = schema_view.generator_class(api_info, url='')
+    swagger = generator.get_schema(request=None, public=True)
+    spec = OpenAPICodecJson(validators=[]).generate_swagger_object(swagger)
+    # Через JSON, чтобы свежая и прочитанная из файла схемы сравнивались и сериализовались одинаково
+    return json.loads(json.dumps(spec, ensure_ascii=False), object_pairs_hook=OrderedDict)
+
+
+def with_api_url(spec):
+    """Схема с host и schemes из DEFAULT_API_URL, на их обычном месте после info."""
+    url = swagger_settings.DEFAULT_API_URL
+    if not url:
+        return spec
+    parts = urlsplit(url)
+    result = OrderedDict()
+    for key, value in spec.items():
+        if key not in ('host', 'schemes'):
+            result[key] = value
+        if key == 'info':
+            result['host'], result['schemes'] = parts.netloc, [parts.scheme]
+    return result
+
+
+def read_stored():
+    try:
+        with open(schema_path(), encoding='utf-8') as stored:
+            return json.load(stored, object_pairs_hook=OrderedDict)
+    except (OSError, ValueError):
+        return None
+
+
+def write_stored(fingerprint, spec):
+    path = schema_path()
+    # Запись через временный файл: параллельно стартующие процессы не прочитают половину
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as stored:
+        json.dump({'fingerprint': fingerprint, 'schema': spec}, stored, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+class SchemaDocument:
+    """Готовые представления схемы: тело, тело в gzip и ETag для каждого формата."""
+
+    def __init__(self, spec):
+        body = json.dumps(spec, ensure_ascii=False).encode()
+        bodies = {'.json': body, 'openapi': body, '.yaml': yaml_sane_dump(spec, binary=True)}
+        self.representations = {}
+        for schema_format, content in bodies.items():
+            tag = hashlib.sha1(content).hexdigest()[:16]
+            self.representations[schema_format] = {
+                'identity': (content, f'"{tag}"'),
+                'gzip': (gzip.compress(content, mtime=0), f'"{tag}-gzip"'),
+            }
+
+    def get(self, schema_format, encoding):
+        return self.representations[schema_format][encoding]
+
+
+class SchemaStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.document = None
+
+    def load(self):
+        """Возвращает схему процесса; при первом вызове читает файл или строит схему заново."""
+        if self.document is None:
+            with self.lock:
+                if self.document is None:
+                    self.document = SchemaDocument(with_api_url(self.stored_or_built()))
+        return self.document
+
+    def stored_or_built(self):
+        fingerprint = code_fingerprint()
+        stored = read_stored()
+        if stored is not None and stored.get('fingerprint') == fingerprint:
+            return stored['schema']
+        spec = build_schema()
+        try:
+            write_stored(fingerprint, spec)
+        except OSError as exc:
+            # Например, каталог приложения только для чтения: схема останется в памяти процесса
+            logger.warning('Не удалось сохранить схему OpenAPI в %s: %s', schema_path(), exc)
+        return spec
+
+    def reset(self):
+        with self.lock:
+            self.document = None
+
+
+schema_store = SchemaStore()
+
+
+def schema_drift(stored, current):
+    """Описания расхождений сохранённой схемы с текущей; пустой список — схемы совпадают."""
+    drift = []
+    for section in ('paths', 'definitions'):
+        before, after = stored.get(section, {}), current.get(section, {})
+        drift.extend(f'{section}: добавлено {name}' for name in sorted(after.keys() - before.keys()))
+        drift.extend(f'{section}: удалено {name}' for name in sorted(before.keys() - after.keys()))
+        drift.extend(
+            f'{section}: изменено {name}' for name in sorted(before.keys() & after.keys()) if before[name] != after[name]
+        )
+    rest = {key for key in stored.keys() | current.keys() if key not in ('paths', 'definitions')}
+    drift.extend(f'изменено {key}' for key in sorted(rest) if stored.get(key) != current.get(key))
+    return drift
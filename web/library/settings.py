@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'drf_yasg',
     #apps
@@ -49,9 +50,20 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'books.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'books.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 MIDDLEWARE = [
+    'library.instrumentation.PerformanceMiddleware',
+    'library.harakiri.HarakiriMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,12 +73,46 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Лимит времени запроса под uWSGI (library.harakiri). Представления из LONG_REQUEST_VIEWS
+# работают без лимита: всегда (None) или если в запросе есть указанный параметр
+REQUEST_TIMEOUT = int(os.environ.get('REQUEST_TIMEOUT') or 30)
+LONG_REQUEST_VIEWS = {
+    'book-export': None,
+    'book-bulk': None,
+    'book-list': 'stream',
+}
+
+# Замеры запросов (library.instrumentation): запросы больше чем с QUERY_BUDGET
+# SQL-запросами пишутся в лог library.performance. QUERY_BUDGET рассчитан на чтение;
+# запись делает больше запросов, и её бюджеты заданы по представлениям ("<метод> <имя
+# маршрута>", как в /metrics/) с запасом над замерами: POST книги — 17 запросов,
+# PUT — до 26, DELETE — 11, пакетная запись — 17 и ещё несколько на каждые BULK_BATCH_SIZE книг
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET') or 10)
+QUERY_BUDGETS = {
+    'POST book-list': 20,
+    'PUT book-detail': 30,
+    'PATCH book-detail': 30,
+    'DELETE book-detail': 15,
+    'POST book-bulk': 50,
+    'GET admin:books_book_change': 20,
+}
+# Заголовок Server-Timing с числом и временем SQL-запросов видит любой клиент, поэтому
+# по умолчанию он выключен; метрики без него доступны через /metrics/
+SERVER_TIMING_HEADER = (os.environ.get('SERVER_TIMING_HEADER') or 'off') == 'on'
+# /metrics/ (library.metrics) доступен сотрудникам и по заголовку "Authorization: Bearer <METRICS_TOKEN>";
+# воркеры публикуют снимки в общий кэш не чаще раза в METRICS_PUBLISH_INTERVAL секунд
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or ''
+METRICS_PUBLISH_INTERVAL = float(os.environ.get('METRICS_PUBLISH_INTERVAL') or 5)
+METRICS_WORKER_TTL = int(os.environ.get('METRICS_WORKER_TTL') or 600)
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL') or 'INFO'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
         'file': {
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'class': 'logging.FileHandler',
             'filename': 'myapp.log',
         },
@@ -74,9 +120,14 @@ LOGGING = {
     'loggers': {
         'django': {
             'handlers': ['file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': True,
         },
+        'library.performance': {
+            'handlers': ['file'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
@@ -104,18 +155,62 @@ WSGI_APPLICATION = 'library.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Режим обслуживания: uWSGI (процессы по WEB_THREADS потоков) или ASGI (SERVER_MODE=asgi, поток на запрос)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')
+# Потоков в воркере uWSGI; entrypoint.sh по умолчанию задаёт 2
+WEB_THREADS = int(os.environ.get('WEB_THREADS') or 2)
+
+# Под uWSGI каждому потоку хватает одного постоянного соединения (CONN_MAX_AGE). Под ASGI у
+# каждого запроса свой поток и своё соединение, поэтому по умолчанию включён пул
+# (library.db): соединение возвращается в него в конце запроса. Суммарно
+# воркеры * DB_POOL_SIZE не должны превышать max_connections PostgreSQL.
+DB_POOL = (os.environ.get('DB_POOL') or ('on' if SERVER_MODE == 'asgi' else 'off')) == 'on'
+# Под uWSGI поток держит соединение весь запрос: с пулом меньше числа потоков лишний
+# поток ждал бы DB_POOL_TIMEOUT и падал с OperationalError
+if SERVER_MODE == 'asgi':
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+else:
+    DB_POOL_SIZE = max(int(os.environ.get('DB_POOL_SIZE') or 0), WEB_THREADS)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'library.db' if DB_POOL else 'django.db.backends.postgresql_psycopg2',
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE') or 60),
+        'CONN_HEALTH_CHECKS': (os.environ.get('DB_CONN_HEALTH_CHECKS') or 'on') == 'on',
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT') or 10),
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Время жизни закэшированных ответов API в секундах, 0 отключает кэш
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -153,6 +248,13 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+# Заранее построенная схема OpenAPI (library.schema, manage.py generate_schema)
+OPENAPI_SCHEMA_PATH = os.environ.get('OPENAPI_SCHEMA_PATH') or os.path.join(BASE_DIR, 'openapi.json')
+# Адрес API для host и schemes в схеме, например https://library.example.com; без него host не указывается
+SWAGGER_SETTINGS = {
+    'DEFAULT_API_URL': os.environ.get('API_URL') or None,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
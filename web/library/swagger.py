@@ -1,21 +1,91 @@
+from django.http import HttpResponse
 from django.urls import re_path
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.views import View
 from drf_yasg import openapi
+from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
+from library.schema import SCHEMA_FORMATS, schema_store
+
+
+def accepts_gzip(accept_encoding):
+    """Разрешает ли Accept-Encoding gzip — явно или через ``*``; ``q=0`` означает отказ."""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality > 0
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in accepted:
+            return accepted[coding]
+    return False
+
+
+api_info = openapi.Info(
+    title="Library API",
+    default_version='v1',
+    description="This API for library project",
+    contact=openapi.Contact(email="evtushenkodev@gmail.com"),
+)
+
 schema_view = get_schema_view(
-    openapi.Info(
-        title="Library API",
-        default_version='v1',
-        description="This API for library project",
-        contact=openapi.Contact(email="evtushenkodev@gmail.com"),
-    ),
+    api_info,
     public=True,
     permission_classes=[permissions.AllowAny],
 )
 
+
+def schema_response(request, schema_format):
+    # Схема построена заранее (library.schema): ответ — готовые байты, сжатые заранее же
+    encoding = 'gzip' if accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', '')) else 'identity'
+    content, etag = schema_store.load().get(schema_format, encoding)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type=SCHEMA_FORMATS[schema_format])
+        if encoding == 'gzip':
+            response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    # Схема меняется только с кодом: клиент перепроверяет её по ETag и получает 304
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+class SchemaView(View):
+    def get(self, request, format):
+        return schema_response(request, format)
+
+
+class SchemaUIView(View):
+    """
+    Swagger UI и ReDoc. Страница не содержит схему — её ?format=openapi отдаётся
+    заранее построенной, — поэтому страница рисуется шаблоном drf_yasg без
+    SchemaView drf_yasg, который строил бы схему на каждый запрос.
+    """
+    renderers = {'swagger': SwaggerUIRenderer, 'redoc': ReDocRenderer}
+    renderer = None
+
+    def get(self, request):
+        if request.GET.get('format') == 'openapi':
+            return schema_response(request, 'openapi')
+        renderer = self.renderers[self.renderer]()
+        # Шаблону из схемы нужны только заголовок и версия API
+        swagger = openapi.Swagger(info=api_info, _prefix='/', paths=openapi.Paths(paths={}))
+        content = renderer.render(swagger, renderer.media_type, {'request': request})
+        return HttpResponse(content, content_type=f'{renderer.media_type}; charset={renderer.charset}')
+
+
 urlpatterns = [
-    re_path('^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    re_path('^swagger/$', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    re_path('^redoc/$', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    re_path('^swagger(?P<format>\.json|\.yaml)$', SchemaView.as_view(), name='schema-json'),
+    re_path('^swagger/$', SchemaUIView.as_view(renderer='swagger'), name='schema-swagger-ui'),
+    re_path('^redoc/$', SchemaUIView.as_view(renderer='redoc'), name='schema-redoc'),
 ]
@@ -11,6 +11,12 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from library.boot import preload, preload_enabled
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'library.settings')
 
 application = get_wsgi_application()
+
+# Мастер uWSGI/gunicorn импортирует URLconf до fork, воркеры получают его готовым
+if preload_enabled():
+    preload()